@@ -9,10 +9,15 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from datetime import datetime, timedelta
-from main import app, Base, get_db, User
+from main import app, get_db, User, password_hasher
+from common.db import Base
 import os
 
+from common.user_cache import user_cache
+
 # =================================================================
 # CONFIGURACIÓN
 # =================================================================
@@ -23,12 +28,14 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 
 Base.metadata.create_all(bind=engine)
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+# La app usa sesiones async; los fixtures siguen usando la sesión sync sobre el mismo archivo
+# NullPool: TestClient puede ejecutar cada request en un event loop distinto
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_auth.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 app.dependency_overrides[get_db] = override_get_db
 client = TestClient(app)
@@ -45,6 +52,8 @@ def cleanup_database():
     db.query(User).delete()
     db.commit()
     db.close()
+    # Los ids de SQLite se reutilizan entre tests
+    user_cache.clear()
 
 @pytest.fixture
 def sample_user():
@@ -368,6 +377,30 @@ def test_password_not_stored_plaintext(sample_user):
     
     db.close()
 
+def test_login_rejected_when_hash_queue_full(sample_user):
+    """Test backpressure: con la cola de hashing llena se responde 503"""
+    original_limit = password_hasher.max_pending
+    password_hasher.max_pending = 0
+    try:
+        response = client.post("/login", json={
+            "email": "existing@example.com",
+            "password": "ExistingPass123!"
+        })
+    finally:
+        password_hasher.max_pending = original_limit
+    
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_hash_queue_released_after_request(sample_user):
+    """Test que las operaciones pendientes vuelven a cero tras cada request"""
+    client.post("/login", json={
+        "email": "existing@example.com",
+        "password": "WrongPassword123!"
+    })
+    
+    assert password_hasher.pending == 0
+
 # =================================================================
 # RESUMEN
 # =================================================================
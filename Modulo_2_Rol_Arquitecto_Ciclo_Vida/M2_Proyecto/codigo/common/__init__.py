@@ -0,0 +1,24 @@
+"""
+Common - Código compartido entre microservicios
+================================================
+Paquete importado por auth, users, spaces y reservations service.
+
+Módulos:
+- app: create_app con CORS y /health
+- auth: verificación de JWT con caché de payloads, get_current_user
+- cache: caché en memoria con TTL y expulsión LRU
+- config: variables de entorno comunes
+- counters: contadores de reservas por usuario y su reconciliación
+- db: engine async y get_db (inicialización perezosa)
+- freebusy: intervalos ocupados por espacio y su caché por día en Redis
+- interval_index: índice en memoria de reservas activas y su change feed
+- models: modelos ORM completos
+- pagination: cursores opacos para paginación keyset
+- partitions: particiones mensuales de reservations (creación y archivo)
+- pubsub: suscripción y publicación de eventos vía Redis pub/sub
+- redis_client: cliente Redis compartido (inicialización perezosa)
+- reporting: vistas materializadas de reporting y su refresco
+- space_cache: caché de espacios en memoria + Redis (cache-aside con single-flight)
+- user_cache: caché de usuarios activos para las dependencias de autenticación
+- user_stats: conteo de reservas por usuario y su caché en Redis
+"""
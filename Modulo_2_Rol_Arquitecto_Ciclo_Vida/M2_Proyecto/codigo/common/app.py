@@ -0,0 +1,88 @@
+"""
+Aplicación FastAPI base
+========================
+create_app arma la app con el middleware CORS y el endpoint /health que
+antes se repetían en cada servicio, y cierra el pool de BD y el cliente
+Redis al apagar.
+"""
+
+from datetime import datetime
+from typing import Callable, Dict, Optional
+import logging
+
+from fastapi import Depends, FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common import config
+from common.auth import token_cache_stats
+from common.db import dispose_engine, get_db
+from common.redis_client import close_redis, redis_status
+
+logger = logging.getLogger(__name__)
+
+
+def create_app(
+    service_name: str,
+    health_extras: Optional[Dict[str, Callable[[], dict]]] = None,
+    **fastapi_kwargs
+) -> FastAPI:
+    """
+    Crear la app de un servicio
+
+    - service_name: nombre reportado en /health
+    - health_extras: secciones adicionales del health check (nombre -> función)
+    """
+    app = FastAPI(**fastapi_kwargs)
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=config.ALLOWED_ORIGINS,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    extras = {"token_cache": token_cache_stats}
+    extras.update(health_extras or {})
+
+    # Se registra antes que las rutas del servicio: "/health" no debe caer en "/{id}"
+    @app.get("/health")
+    async def health_check(db: AsyncSession = Depends(get_db)):
+        """
+        Health check endpoint
+        Verifica conectividad a base de datos y redis
+        """
+        health_status = {
+            "status": "healthy",
+            "service": service_name,
+            "timestamp": datetime.utcnow().isoformat(),
+            "environment": config.ENVIRONMENT
+        }
+
+        # Verificar DB
+        try:
+            await db.execute(text("SELECT 1"))
+            health_status["database"] = "connected"
+        except Exception as e:
+            health_status["database"] = "disconnected"
+            health_status["status"] = "unhealthy"
+            logger.error(f"Database health check failed: {e}")
+
+        # Verificar Redis
+        cache = redis_status()
+        if cache is not None:
+            health_status["cache"] = cache
+
+        for name, stats in extras.items():
+            health_status[name] = stats()
+
+        return health_status
+
+    @app.on_event("shutdown")
+    async def close_connections():
+        close_redis()
+        await dispose_engine()
+
+    return app
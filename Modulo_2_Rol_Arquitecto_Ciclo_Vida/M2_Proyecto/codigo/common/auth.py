@@ -0,0 +1,250 @@
+"""
+Autenticación compartida
+=========================
+Verificación de JWT y dependency get_current_user para los cuatro servicios.
+
+Los clientes reutilizan el mismo bearer token miles de veces; verificar la
+firma HMAC y parsear el JSON en cada request es trabajo repetido. Los
+payloads ya verificados se guardan por digest SHA-256 del token hasta su
+claim "exp".
+"""
+
+from datetime import datetime
+from typing import Optional
+import hashlib
+import logging
+import os
+import time
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from jose import JWTError, jwt
+from pydantic import BaseModel
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common import config
+from common.cache import TTLLRUCache
+from common.db import get_db
+from common.models import User
+from common.redis_client import get_redis
+from common.user_cache import cache_user, get_cached_user
+
+logger = logging.getLogger(__name__)
+
+JWT_SECRET = os.getenv("JWT_SECRET", "your-secret-key-change-in-production")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Cota superior de vida en caché; la expiración real la define el claim exp
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "3600"))
+
+token_cache = TTLLRUCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_MAX_TTL)
+
+
+def token_digest(token: str) -> str:
+    """No se guarda el token en claro como clave"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def _normalize_claims(payload: dict) -> dict:
+    # Tokens emitidos con "sub" numérico; las consultas esperan un entero
+    sub = payload.get("sub")
+    if isinstance(sub, str) and sub.isdigit():
+        payload["sub"] = int(sub)
+    return payload
+
+
+def decode_token(token: str) -> dict:
+    """
+    Decodificar y validar JWT token
+    
+    Retorna una copia del payload; lanza 401 si el token es inválido o expiró.
+    """
+    key = token_digest(token)
+    cached = token_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    try:
+        # verify_sub=False: aceptar tokens antiguos con "sub" entero
+        payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM], options={"verify_sub": False})
+    except JWTError as e:
+        logger.warning(f"JWT decode error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    payload = _normalize_claims(payload)
+
+    # Sin exp no hay forma de saber hasta cuándo es válido: no se cachea
+    exp = payload.get("exp")
+    if exp is not None:
+        remaining = float(exp) - time.time()
+        if remaining > 0:
+            token_cache.set(key, payload, ttl=remaining)
+
+    return dict(payload)
+
+
+def token_cache_stats() -> dict:
+    """Estadísticas para el health check"""
+    return token_cache.stats()
+
+
+# =================================================================
+# REVOCACIÓN (AUTH_MODE=stateless)
+# =================================================================
+
+def revocation_key(user_id: int) -> str:
+    return f"auth:revoked:user:{user_id}"
+
+
+def revoke_user_tokens(user_id: int) -> bool:
+    """
+    Agregar usuario a la lista de revocación
+    
+    Los servicios con AUTH_MODE=stateless no consultan la tabla users y
+    confían en los claims del JWT; esta marca invalida los tokens ya emitidos.
+    Expira junto con el token más longevo posible.
+    
+    Retorna False si Redis no pudo registrarla: quien llama decide si
+    seguir (los tokens quedan válidos hasta expirar en modo stateless).
+    """
+    redis_client = get_redis()
+    if not redis_client:
+        logger.warning(f"Redis not available, tokens of user {user_id} not revoked")
+        return False
+    
+    try:
+        redis_client.setex(
+            revocation_key(user_id),
+            config.JWT_EXPIRATION_MINUTES * 60,
+            datetime.utcnow().isoformat()
+        )
+        return True
+    except Exception as e:
+        logger.warning(f"Failed to revoke tokens for user {user_id}: {e}")
+        return False
+
+
+def is_user_revoked(user_id: int) -> Optional[bool]:
+    """
+    Consultar la lista de revocación alimentada por DELETE /me de users-service
+    
+    None si Redis no puede responder (sin cliente, circuito abierto o error).
+    Bloqueante (redis-py): desde un handler async, vía run_in_threadpool.
+    """
+    redis_client = get_redis()
+    if not redis_client:
+        return None
+    
+    try:
+        return redis_client.exists(revocation_key(user_id)) > 0
+    except Exception as e:
+        logger.warning(f"Revocation list check failed: {e}")
+        return None
+
+# =================================================================
+# DEPENDENCIES
+# =================================================================
+
+security = HTTPBearer()
+
+
+class TokenUser(BaseModel):
+    """Identidad construida desde los claims del JWT (AUTH_MODE=stateless)"""
+    id: int
+    email: Optional[str] = None
+    is_admin: bool = False
+    is_active: bool = True
+    
+    @classmethod
+    def from_claims(cls, payload: dict) -> "TokenUser":
+        # Tokens anteriores solo traen "role"
+        is_admin = payload.get("is_admin")
+        if is_admin is None:
+            is_admin = payload.get("role") == "admin"
+        return cls(id=int(payload["sub"]), email=payload.get("email"), is_admin=is_admin)
+
+
+async def bearer_token(credentials: HTTPAuthorizationCredentials = Depends(security)) -> str:
+    return credentials.credentials
+
+
+def current_user_dependency(token_dependency=bearer_token, use_cache: bool = True, allow_stateless: bool = True):
+    """
+    Construir la dependency get_current_user de un servicio
+    
+    - token_dependency: de dónde sale el token (HTTPBearer por defecto;
+      auth-service usa OAuth2PasswordBearer)
+    - use_cache: servir el usuario desde la caché en memoria. Retorna una
+      instancia no asociada a la sesión, así que los servicios que modifican
+      al usuario (users-service) lo desactivan.
+    - allow_stateless: respetar AUTH_MODE=stateless
+    """
+    async def get_current_user(
+        token: str = Depends(token_dependency),
+        db: AsyncSession = Depends(get_db)
+    ) -> User:
+        """Obtener usuario actual desde token JWT"""
+        payload = decode_token(token)
+        user_id: int = payload.get("sub")
+        
+        if user_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid authentication credentials"
+            )
+        
+        revocation_unknown = False
+        if allow_stateless and config.AUTH_MODE == "stateless":
+            # Sin consulta a users: la desactivación llega por la lista de revocación.
+            # redis-py es bloqueante (EXISTS y el ping del circuit breaker): fuera del event loop
+            revoked = await run_in_threadpool(is_user_revoked, user_id)
+            if revoked:
+                raise HTTPException(
+                    status_code=status.HTTP_401_UNAUTHORIZED,
+                    detail="User not found or inactive"
+                )
+            if revoked is False:
+                return TokenUser.from_claims(payload)
+            # Redis no responde: no confiar en los claims, validar contra users
+            # (sin caché local, que tampoco recibe invalidaciones)
+            revocation_unknown = True
+        
+        if use_cache and not revocation_unknown:
+            user = get_cached_user(User, user_id)
+            if user is not None:
+                return user
+        
+        result = await db.execute(select(User).where(User.id == user_id, User.is_active == True))
+        user = result.scalars().first()
+        if user is None:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found or inactive"
+            )
+        
+        if use_cache and not revocation_unknown:
+            cache_user(user)
+        return user
+    
+    return get_current_user
+
+
+def get_admin_user_dependency(get_current_user):
+    """Dependency que exige is_admin sobre la identidad de get_current_user"""
+    def get_admin_user(current_user: User = Depends(get_current_user)) -> User:
+        """Verificar que el usuario es admin"""
+        if not current_user.is_admin:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Admin privileges required"
+            )
+        return current_user
+    
+    return get_admin_user
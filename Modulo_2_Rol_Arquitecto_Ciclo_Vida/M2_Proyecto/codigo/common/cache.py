@@ -0,0 +1,90 @@
+"""
+Caché en memoria con TTL y expulsión LRU
+=========================================
+Acotada en tamaño y en tiempo de vida. Thread-safe: las invalidaciones
+llegan desde el thread del listener de pub/sub mientras los requests
+leen desde el event loop.
+"""
+
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import threading
+import time
+
+
+class TTLLRUCache:
+    """Caché acotada: expulsa la entrada menos usada y expira por TTL"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._disabled = False
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return not self._disabled and self.maxsize > 0 and self.ttl > 0
+
+    def disable(self):
+        """Dejar de guardar y servir entradas (p.ej. sin canal de invalidación)"""
+        self._disabled = True
+        self.clear()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Retorna el valor o None si no existe o expiró"""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Guardar valor; ttl permite acortar la vida de una entrada puntual"""
+        if not self.enabled:
+            return
+
+        expires_at = time.monotonic() + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Contadores para health checks / métricas"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,115 @@
+"""
+Contadores de reservas por usuario
+==================================
+Lectura O(1) de user_reservation_counters, que en PostgreSQL mantiene el
+trigger maintain_user_reservation_counters en la misma transacción que
+cada escritura sobre reservations.
+
+En otros motores (SQLite en tests) no hay trigger: se cuenta con
+GROUP BY. reconcile_counters repara la deriva usuario por usuario, cada
+uno en su transacción: la función SQL bloquea la fila del contador antes de
+contar, así que un trigger concurrente no queda pisado por un recuento
+viejo. Lo ejecuta el sweeper de reservations-service cada
+COUNTER_RECONCILE_INTERVAL segundos; a mano:
+
+    python -m common.counters
+"""
+
+from datetime import datetime
+from typing import Dict
+import asyncio
+import logging
+import os
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.db import dialect_name, dispose_engine, get_sessionmaker
+from common.models import Reservation, User, UserReservationCounter
+from common.user_stats import count_reservations_by_status
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("active", "cancelled", "completed")
+
+# Recorre toda reservations: bastante más espaciado que el sweep
+COUNTER_RECONCILE_INTERVAL = float(os.getenv("COUNTER_RECONCILE_INTERVAL", "3600"))
+
+
+async def get_reservation_counts(db: AsyncSession, user_id: int) -> Dict[str, int]:
+    """Reservas del usuario por estado"""
+    if dialect_name(db) != "postgresql":
+        return await count_reservations_by_status(db, user_id)
+
+    counter = await db.get(UserReservationCounter, user_id)
+    # Sin fila: el usuario nunca tuvo reservas (el trigger la crea en el primer INSERT)
+    if counter is None:
+        return {}
+    return {status: getattr(counter, status) for status in STATUSES if getattr(counter, status)}
+
+
+async def count_upcoming(db: AsyncSession, user_id: int, now: datetime) -> int:
+    """
+    Reservas activas del usuario que aún no empezaron
+
+    El contador de activas incluye las que ya empezaron y todavía no se
+    marcaron completed; se descuentan con una consulta acotada a esas filas
+    (pocas si el sweeper las completa a tiempo).
+    """
+    if dialect_name(db) != "postgresql":
+        result = await db.execute(select(func.count(Reservation.id)).where(
+            Reservation.user_id == user_id,
+            Reservation.status == "active",
+            Reservation.start_time > now
+        ))
+        return result.scalar() or 0
+
+    counts = await get_reservation_counts(db, user_id)
+    if not counts.get("active"):
+        return 0
+
+    result = await db.execute(select(func.count(Reservation.id)).where(
+        Reservation.user_id == user_id,
+        Reservation.status == "active",
+        Reservation.start_time <= now
+    ))
+    return counts["active"] - (result.scalar() or 0)
+
+
+async def reconcile_counters(db: AsyncSession) -> int:
+    """Recalcular los contadores desde reservations; retorna los usuarios corregidos"""
+    if dialect_name(db) != "postgresql":
+        return 0
+
+    user_ids = list((await db.execute(select(User.id).order_by(User.id))).scalars())
+    
+    repaired = 0
+    for user_id in user_ids:
+        # Un commit por usuario: el lock de su fila no frena a los triggers de los demás
+        result = await db.execute(
+            text("SELECT reconcile_user_reservation_counter(:user_id)"),
+            {"user_id": user_id}
+        )
+        await db.commit()
+        if result.scalar():
+            repaired += 1
+    
+    if repaired:
+        logger.warning(f"Reservation counters repaired for {repaired} users")
+    return repaired
+
+
+async def reconcile_all_counters(sessionmaker) -> int:
+    """reconcile_counters en una sesión propia (job del sweeper)"""
+    async with sessionmaker() as db:
+        return await reconcile_counters(db)
+
+
+async def main():
+    repaired = await reconcile_all_counters(get_sessionmaker())
+    await dispose_engine()
+    logger.info(f"Reservation counters reconciled: {repaired} users repaired")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,76 @@
+"""
+Base de datos
+=============
+Engine async compartido. Se crea en el primer uso, no al importar: los
+tests y los scripts que solo necesitan los modelos no abren un pool.
+"""
+
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.declarative import declarative_base
+
+from common import config
+
+Base = declarative_base()
+
+# SQLSTATE de PostgreSQL: exclusion constraint (<partición>_no_overlap o el
+# trigger check_reservation_cross_partition_overlap, que informa
+# reservations_cross_partition_no_overlap). Se mapea por SQLSTATE, no por nombre
+EXCLUSION_VIOLATION = "23P01"
+
+_engine = None
+_sessionmaker = None
+
+
+def to_async_url(url: str) -> str:
+    """Traducir la URL de conexión al driver async (asyncpg / aiosqlite)"""
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    return url
+
+
+def get_engine() -> AsyncEngine:
+    global _engine, _sessionmaker
+    if _engine is None:
+        _engine = create_async_engine(
+            to_async_url(config.DATABASE_URL),
+            pool_pre_ping=True,
+            pool_size=config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW,
+        )
+        _sessionmaker = async_sessionmaker(_engine, autoflush=False, expire_on_commit=False)
+    return _engine
+
+
+def get_sessionmaker() -> async_sessionmaker:
+    get_engine()
+    return _sessionmaker
+
+
+async def get_db():
+    """Dependency para obtener sesión de base de datos"""
+    async with get_sessionmaker()() as db:
+        yield db
+
+
+def dialect_name(db: AsyncSession) -> str:
+    """"postgresql" en producción, "sqlite" en tests"""
+    return db.bind.dialect.name
+
+
+async def dispose_engine():
+    """Cerrar el pool al apagar el servicio"""
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+        _engine = None
+        _sessionmaker = None
+
+
+def sqlstate(exc: Exception) -> Optional[str]:
+    """SQLSTATE del error del driver envuelto por SQLAlchemy (asyncpg: sqlstate, psycopg2: pgcode)"""
+    orig = getattr(exc, "orig", None)
+    return getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
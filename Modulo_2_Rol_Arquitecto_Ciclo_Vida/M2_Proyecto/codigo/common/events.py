@@ -0,0 +1,64 @@
+"""
+Eventos de reservas
+===================
+Lo que hay que hacer después de cada commit que crea o cancela reservas,
+tenga o no el proceso el índice en memoria activado:
+
+- invalidar el free/busy cacheado de los espacios afectados (freebusy)
+- invalidar las estadísticas cacheadas de los usuarios (user_stats)
+- aplicar los cambios al índice local y publicarlos en
+  RESERVATION_CHANGES_CHANNEL para el resto de los procesos (interval_index)
+
+Lo usan la API de reservations-service y su sweeper.
+"""
+
+from typing import Iterable
+import json
+
+from common import pubsub
+from common.freebusy import invalidate_freebusy
+from common.interval_index import RESERVATION_CHANGES_CHANNEL, reservation_index
+from common.queries import as_utc_naive
+from common.redis_client import get_redis
+from common.user_stats import invalidate_user_stats
+
+
+def reservation_change(reservation, op: str) -> dict:
+    return {
+        "op": op,
+        "id": reservation.id,
+        "space_id": reservation.space_id,
+        "start_time": as_utc_naive(reservation.start_time).isoformat(),
+        "end_time": as_utc_naive(reservation.end_time).isoformat(),
+    }
+
+
+def publish_reservation_changes(redis_client, created: Iterable = (), cancelled: Iterable = ()):
+    """
+    Publicar reservas creadas y canceladas en el change feed
+
+    Acepta modelos o filas con id, space_id, start_time y end_time. Se
+    aplican también al índice local sin esperar el eco de Redis (no hace
+    nada si el índice está desactivado).
+    """
+    changes = [reservation_change(r, "upsert") for r in created]
+    changes += [reservation_change(r, "delete") for r in cancelled]
+    for change in changes:
+        reservation_index.apply(change)
+    if changes:
+        pubsub.publish(redis_client, RESERVATION_CHANGES_CHANNEL, json.dumps(changes))
+
+
+def notify_reservation_changes(created: Iterable = (), cancelled: Iterable = ()):
+    """
+    Después de cada commit que crea o cancela reservas: invalidar free/busy y
+    las estadísticas de los usuarios, y publicar el change feed
+
+    Acepta modelos o filas con id, user_id, space_id, start_time y end_time.
+    """
+    created, cancelled = list(created), list(cancelled)
+    redis_client = get_redis()
+    changed = created + cancelled
+    invalidate_freebusy(redis_client, [(r.space_id, r.start_time, r.end_time) for r in changed])
+    invalidate_user_stats(redis_client, {r.user_id for r in changed})
+    publish_reservation_changes(redis_client, created=created, cancelled=cancelled)
@@ -0,0 +1,184 @@
+"""
+Free/busy por espacio
+=====================
+Intervalos ocupados de un espacio, fusionados y cacheados en Redis por
+(espacio, día UTC). spaces-service los lee en GET /{id}/freebusy;
+reservations-service invalida los espacios afectados cada vez que crea o
+cancela reservas.
+
+Las claves incluyen una generación por espacio que invalidate_freebusy
+incrementa después del commit. Quien llena la caché lee la generación
+antes de consultar la BD y escribe bajo esa misma generación: si una
+reserva se confirmó entre medio, lo escrito queda huérfano (expira por
+TTL) en lugar de pisar la invalidación con datos previos al commit.
+"""
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Con invalidación explícita el TTL solo acota datos de escrituras externas
+FREEBUSY_CACHE_TTL = int(os.getenv("FREEBUSY_CACHE_TTL", "3600"))
+
+Interval = Tuple[datetime, datetime]
+
+
+def freebusy_generation_key(space_id: int) -> str:
+    return f"freebusy:{space_id}:generation"
+
+
+def freebusy_key(space_id: int, generation: int, day: date) -> str:
+    return f"freebusy:{space_id}:{generation}:{day.isoformat()}"
+
+
+def days_between(start: datetime, end: datetime) -> List[date]:
+    """Días UTC que toca el intervalo [start, end)"""
+    last = (end - timedelta(microseconds=1)).date()
+    days = []
+    day = start.date()
+    while day <= last:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def day_bounds(day: date) -> Interval:
+    start = datetime.combine(day, time.min)
+    return start, start + timedelta(days=1)
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Fusionar intervalos que se solapan o se tocan
+
+    Recibe intervalos ordenados por inicio (como los retorna la consulta)
+    y los recorre una vez.
+    """
+    merged: List[Interval] = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def clip_intervals(intervals: Iterable[Interval], start: datetime, end: datetime) -> List[Interval]:
+    """Recortar intervalos a [start, end), descartando los que quedan fuera"""
+    return [
+        (max(s, start), min(e, end))
+        for s, e in intervals
+        if s < end and e > start
+    ]
+
+
+def free_gaps(busy: List[Interval], start: datetime, end: datetime) -> List[Interval]:
+    """Huecos libres de [start, end) dados los intervalos ocupados fusionados"""
+    gaps = []
+    cursor = start
+    for s, e in busy:
+        if s > cursor:
+            gaps.append((cursor, s))
+        cursor = max(cursor, e)
+    if cursor < end:
+        gaps.append((cursor, end))
+    return gaps
+
+
+def epoch_seconds(value: datetime) -> int:
+    """Segundos Unix de un datetime UTC naive"""
+    return int(value.replace(tzinfo=timezone.utc).timestamp())
+
+
+def get_generation(redis_client, space_id: int) -> Optional[int]:
+    """Generación actual del espacio; None si no hay Redis (no se usa la caché)"""
+    if not redis_client:
+        return None
+    try:
+        return int(redis_client.get(freebusy_generation_key(space_id)) or 0)
+    except Exception as e:
+        logger.warning(f"Free/busy cache read error: {e}")
+        return None
+
+
+def get_cached_days(redis_client, space_id: int, generation: Optional[int], days: List[date]) -> Dict[date, List[Interval]]:
+    """Días presentes en caché; los que faltan (o si Redis falla) no se incluyen"""
+    if not redis_client or generation is None or not days:
+        return {}
+
+    try:
+        values = redis_client.mget([freebusy_key(space_id, generation, day) for day in days])
+    except Exception as e:
+        logger.warning(f"Free/busy cache read error: {e}")
+        return {}
+
+    cached = {}
+    for day, value in zip(days, values):
+        if value is not None:
+            cached[day] = [
+                (datetime.fromisoformat(s), datetime.fromisoformat(e))
+                for s, e in json.loads(value)
+            ]
+    return cached
+
+
+def cache_days(redis_client, space_id: int, generation: Optional[int], busy_by_day: Dict[date, List[Interval]]):
+    """Guardar días cargados de la BD bajo la generación leída antes de la consulta"""
+    if not redis_client or generation is None or not busy_by_day:
+        return
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for day, busy in busy_by_day.items():
+            payload = json.dumps([[s.isoformat(), e.isoformat()] for s, e in busy])
+            pipe.setex(freebusy_key(space_id, generation, day), FREEBUSY_CACHE_TTL, payload)
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Free/busy cache write error: {e}")
+
+
+def invalidate_freebusy(redis_client, intervals: Iterable[Tuple[int, datetime, datetime]]):
+    """
+    Incrementar la generación de cada espacio de (space_id, start_time, end_time)
+
+    Se llama después del commit; los días cacheados con la generación
+    anterior quedan huérfanos y expiran por TTL. Si Redis falla, la
+    entrada expira por TTL.
+    """
+    if not redis_client:
+        return
+
+    space_ids = {space_id for space_id, _, _ in intervals}
+    if not space_ids:
+        return
+
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for space_id in sorted(space_ids):
+            pipe.incr(freebusy_generation_key(space_id))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Free/busy cache invalidation error: {e}")
+
+
+def snap_to_grid(busy: List[Interval], minutes: Optional[int]) -> List[Interval]:
+    """Ensanchar los intervalos ocupados a múltiplos de minutes (desde medianoche)"""
+    if not minutes:
+        return busy
+
+    step = timedelta(minutes=minutes)
+
+    def floor(value: datetime) -> datetime:
+        midnight = datetime.combine(value.date(), time.min)
+        return midnight + ((value - midnight) // step) * step
+
+    def ceil(value: datetime) -> datetime:
+        floored = floor(value)
+        return floored if floored == value else floored + step
+
+    return merge_intervals((floor(s), ceil(e)) for s, e in busy)
@@ -0,0 +1,242 @@
+"""
+Índice en memoria de reservas activas
+======================================
+Por espacio, un array ordenado por start_time de las reservas activas de
+los próximos INTERVAL_INDEX_DAYS días. Se carga al arrancar, se recarga
+cada INTERVAL_INDEX_REFRESH segundos (mueve el horizonte) y entre cargas
+se mantiene con los eventos que common.events publica en
+RESERVATION_CHANGES_CHANNEL tras cada commit.
+
+Responde disponibilidad y free/busy sin ir a la BD. Es solo una
+aceleración de lecturas: las exclusion constraints de reservations siguen
+decidiendo en las escrituras. Desactivado por defecto.
+"""
+
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+import asyncio
+import json
+import logging
+import os
+import threading
+
+from sqlalchemy import select
+
+from common import pubsub
+from common.models import Reservation
+from common.queries import MAX_RESERVATION_DURATION, as_utc_naive
+
+logger = logging.getLogger(__name__)
+
+RESERVATION_CHANGES_CHANNEL = "reservations:changes"
+
+INTERVAL_INDEX_ENABLED = os.getenv("INTERVAL_INDEX_ENABLED", "false").lower() == "true"
+INTERVAL_INDEX_DAYS = int(os.getenv("INTERVAL_INDEX_DAYS", "14"))
+INTERVAL_INDEX_REFRESH = float(os.getenv("INTERVAL_INDEX_REFRESH", "300"))
+
+# (start_time, end_time, id): el orden de la tupla es el del array
+Entry = Tuple[datetime, datetime, int]
+
+
+class IntervalIndex:
+    """
+    Reservas activas por espacio en arrays ordenados por inicio
+
+    Thread-safe: los eventos llegan desde el thread del listener de pub/sub
+    mientras los requests leen desde el event loop.
+    """
+
+    def __init__(self, days: int):
+        self.days = days
+        self.hits = 0
+        self.misses = 0
+        self._spaces: Dict[int, List[Entry]] = {}
+        # Duración máxima por espacio: acota cuánto retroceder desde el bisect
+        self._max_duration: Dict[int, timedelta] = {}
+        self._by_id: Dict[int, Tuple[int, Entry]] = {}
+        self._loaded_from: Optional[datetime] = None
+        self._horizon: Optional[datetime] = None
+        # Eventos recibidos durante una carga; se reaplican sobre los datos nuevos
+        self._pending: Optional[list] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._horizon is not None
+
+    def covers(self, start_time: datetime, end_time: datetime) -> bool:
+        """True si el rango está dentro de lo cargado y el índice puede responder"""
+        with self._lock:
+            covered = (
+                self._horizon is not None
+                and start_time >= self._loaded_from
+                and end_time <= self._horizon
+            )
+        if covered:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return covered
+
+    def begin_load(self):
+        with self._lock:
+            self._pending = []
+
+    def load(self, rows: Iterable[Tuple[int, int, datetime, datetime]], loaded_from: datetime, horizon: datetime) -> bool:
+        """
+        Reemplazar el contenido con (id, space_id, start_time, end_time) de la BD
+
+        Retorna False si el índice se vació (clear) durante la carga: pudo
+        perderse algún evento y los datos no se instalan.
+        """
+        spaces: Dict[int, List[Entry]] = {}
+        max_duration: Dict[int, timedelta] = {}
+        by_id: Dict[int, Tuple[int, Entry]] = {}
+        for reservation_id, space_id, start_time, end_time in rows:
+            entry = (as_utc_naive(start_time), as_utc_naive(end_time), reservation_id)
+            spaces.setdefault(space_id, []).append(entry)
+            by_id[reservation_id] = (space_id, entry)
+            max_duration[space_id] = max(max_duration.get(space_id, timedelta(0)), entry[1] - entry[0])
+        for entries in spaces.values():
+            entries.sort()
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            if pending is None:
+                return False
+            self._spaces, self._max_duration, self._by_id = spaces, max_duration, by_id
+            self._loaded_from, self._horizon = loaded_from, horizon
+            for change in pending:
+                self._apply(change)
+            return True
+
+    def clear(self):
+        """Descartar todo: el índice no responde hasta la próxima carga"""
+        with self._lock:
+            self._spaces, self._max_duration, self._by_id = {}, {}, {}
+            self._loaded_from = self._horizon = None
+            self._pending = None
+
+    def apply(self, change: dict):
+        """Aplicar un evento del change feed ({"op": "upsert"|"delete", ...})"""
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(change)
+            if self._horizon is not None:
+                self._apply(change)
+
+    def _apply(self, change: dict):
+        self._remove(int(change["id"]))
+        if change["op"] != "upsert":
+            return
+
+        start_time = datetime.fromisoformat(change["start_time"])
+        end_time = datetime.fromisoformat(change["end_time"])
+        if start_time >= self._horizon or end_time <= self._loaded_from:
+            return
+
+        space_id = int(change["space_id"])
+        entry = (start_time, end_time, int(change["id"]))
+        insort(self._spaces.setdefault(space_id, []), entry)
+        self._by_id[entry[2]] = (space_id, entry)
+        self._max_duration[space_id] = max(self._max_duration.get(space_id, timedelta(0)), end_time - start_time)
+
+    def _remove(self, reservation_id: int):
+        found = self._by_id.pop(reservation_id, None)
+        if found is None:
+            return
+        space_id, entry = found
+        entries = self._spaces[space_id]
+        position = bisect_left(entries, entry)
+        if position < len(entries) and entries[position] == entry:
+            del entries[position]
+
+    def overlapping(self, space_id: int, start_time: datetime, end_time: datetime) -> List[Entry]:
+        """Reservas activas del espacio que se solapan con [start_time, end_time), por inicio"""
+        with self._lock:
+            entries = self._spaces.get(space_id)
+            if not entries:
+                return []
+            # Ninguna reserva que empiece antes de start_time - max_duration puede llegar a start_time
+            lower = bisect_left(entries, (start_time - self._max_duration[space_id],))
+            upper = bisect_left(entries, (end_time,))
+            return [entry for entry in entries[lower:upper] if entry[1] > start_time]
+
+    def stats(self) -> dict:
+        """Contadores para health checks / métricas"""
+        total = self.hits + self.misses
+        return {
+            "ready": self.ready,
+            "reservations": len(self._by_id),
+            "spaces": len(self._spaces),
+            "horizon": self._horizon.isoformat() if self._horizon else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+reservation_index = IntervalIndex(days=INTERVAL_INDEX_DAYS)
+
+# Referencia a la tarea de recarga (el event loop solo guarda referencias débiles)
+_refresh_task: Optional[asyncio.Task] = None
+
+
+async def warm_reservation_index(sessionmaker):
+    """Cargar las reservas activas de [ahora, ahora + INTERVAL_INDEX_DAYS)"""
+    loaded_from = datetime.utcnow()
+    horizon = loaded_from + timedelta(days=reservation_index.days)
+    reservation_index.begin_load()
+    async with sessionmaker() as db:
+        result = await db.execute(select(
+            Reservation.id, Reservation.space_id, Reservation.start_time, Reservation.end_time
+        ).where(
+            Reservation.status == "active",
+            Reservation.end_time > loaded_from,
+            Reservation.start_time > loaded_from - MAX_RESERVATION_DURATION,
+            Reservation.start_time < horizon
+        ))
+        rows = result.all()
+    if reservation_index.load(rows, loaded_from, horizon):
+        logger.info(f"✓ Reservation index loaded: {len(rows)} reservations until {horizon.isoformat()}")
+    else:
+        logger.warning("Reservation index load discarded: change feed interrupted")
+
+
+def start_reservation_index(redis_client, sessionmaker):
+    """
+    Suscribirse al change feed y cargar el índice, recargándolo periódicamente
+
+    Si INTERVAL_INDEX_ENABLED es false no hace nada y el índice nunca está
+    listo: los endpoints van a la BD como siempre.
+    """
+    global _refresh_task
+    if not INTERVAL_INDEX_ENABLED:
+        return None
+
+    def handle(payload: str):
+        for change in json.loads(payload):
+            reservation_index.apply(change)
+
+    # Sin listener no hay forma de enterarse de cambios de otros procesos
+    if pubsub.start_listener(
+        redis_client,
+        RESERVATION_CHANGES_CHANNEL,
+        handler=handle,
+        on_error=reservation_index.clear,
+    ) is None:
+        logger.warning("✗ Reservation index disabled: change feed unavailable")
+        return None
+
+    async def refresh_loop():
+        while True:
+            try:
+                await warm_reservation_index(sessionmaker)
+            except Exception as e:
+                logger.warning(f"Reservation index load failed: {e}")
+                reservation_index.clear()
+            await asyncio.sleep(INTERVAL_INDEX_REFRESH)
+
+    _refresh_task = asyncio.create_task(refresh_loop())
+    return _refresh_task
@@ -0,0 +1,74 @@
+"""
+Modelos ORM
+===========
+Mapeo completo de las tablas de database/init.sql. Antes cada servicio
+declaraba su versión parcial de las tablas que leía.
+"""
+
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, JSON, Uuid
+from sqlalchemy.dialects.postgresql import JSONB
+
+from common.db import Base
+
+
+class User(Base):
+    """Modelo ORM de Usuario"""
+    __tablename__ = "users"
+
+    id = Column(Integer, primary_key=True, index=True)
+    email = Column(String, unique=True, index=True, nullable=False)
+    password_hash = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    is_active = Column(Boolean, default=True)
+    is_admin = Column(Boolean, default=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class Space(Base):
+    """Modelo ORM de Espacio"""
+    __tablename__ = "spaces"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False)
+    description = Column(String)
+    capacity = Column(Integer, nullable=False)
+    location = Column(String)
+    # JSONB en PostgreSQL (como en init.sql), JSON en SQLite
+    amenities = Column(JSON().with_variant(JSONB(), "postgresql"))
+    price_per_hour = Column(Numeric(10, 2))
+    is_active = Column(Boolean, default=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Reservation(Base):
+    """Modelo ORM de Reserva"""
+    __tablename__ = "reservations"
+
+    # En PostgreSQL la PK es (id, start_time) por el particionado mensual;
+    # id sale de una secuencia y sigue identificando la reserva
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    space_id = Column(Integer, ForeignKey("spaces.id"), nullable=False)
+    start_time = Column(DateTime, nullable=False)
+    end_time = Column(DateTime, nullable=False)
+    status = Column(String, default="active")
+    total_price = Column(Numeric(10, 2))
+    notes = Column(String, nullable=True)
+    series_id = Column(Uuid, nullable=True, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+class UserReservationCounter(Base):
+    """Reservas por estado de un usuario; en PostgreSQL las mantiene un trigger"""
+    __tablename__ = "user_reservation_counters"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    active = Column(Integer, nullable=False, default=0)
+    cancelled = Column(Integer, nullable=False, default=0)
+    completed = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,41 @@
+"""
+Paginación por cursor (keyset)
+===============================
+El cursor codifica la clave de orden de la última fila entregada; la
+página siguiente se obtiene con WHERE (clave) < (cursor) sobre un índice
+con el mismo orden, así que la página N cuesta lo mismo que la primera.
+"""
+
+from datetime import datetime
+from typing import Tuple, Union
+import base64
+import json
+
+from fastapi import HTTPException
+
+# Header con el cursor de la página siguiente (ausente en la última página)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+SortValue = Union[datetime, str]
+
+
+def encode_cursor(sort_value: SortValue, row_id: int) -> str:
+    """Cursor opaco para (sort_value, id); sort_value es un datetime o un str"""
+    if isinstance(sort_value, datetime):
+        key = {"t": sort_value.isoformat()}
+    else:
+        key = {"s": sort_value}
+    raw = json.dumps({**key, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[SortValue, int]:
+    """Lanza 400 si el cursor no fue emitido por encode_cursor"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if "t" in data:
+            return datetime.fromisoformat(data["t"]), int(data["id"])
+        return str(data["s"]), int(data["id"])
+    except Exception:
+        raise HTTPException(400, "Invalid cursor")
@@ -0,0 +1,147 @@
+"""
+Particiones de reservations
+===========================
+reservations está particionada por mes sobre start_time (init.sql 1.8.0):
+reservations_pYYYY_MM más reservations_default para lo que cae fuera.
+maintain_partitions:
+
+- crea por adelantado las particiones del mes actual y de los
+  PARTITION_MONTHS_AHEAD siguientes (ensure_reservation_partitions), para
+  que las reservas nuevas no caigan en reservations_default;
+- si PARTITION_RETENTION_MONTHS > 0, desvincula las particiones de meses
+  anteriores a esa cantidad de meses y las mueve al schema archive. Las
+  reservas archivadas dejan de verse en la API y en
+  reconcile_user_reservation_counters.
+
+En otros motores (SQLite en tests) no hace nada. Lo ejecuta el sweeper en
+cada pasada; también se puede correr como job con:
+
+    python -m common.partitions
+"""
+
+from datetime import date
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import re
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.db import dialect_name, dispose_engine, get_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "12"))
+# 0: no archivar nunca
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", "0"))
+# Crear (CREATE TABLE ... PARTITION OF) y DETACH toman ACCESS EXCLUSIVE
+# sobre reservations: no encolarse detrás de consultas largas, con todas las
+# lecturas y escrituras esperando detrás (se reintenta en la próxima pasada)
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+
+ARCHIVE_SCHEMA = "archive"
+
+PARTITION_NAME = re.compile(r"^reservations_p(\d{4})_(\d{2})$")
+
+
+def partition_month(name: str) -> Optional[date]:
+    """Primer día del mes de una partición mensual (None si no lo es)"""
+    match = PARTITION_NAME.match(name)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def archive_cutoff(today: date, retention_months: int) -> date:
+    """Primer mes que se conserva: se archivan las particiones anteriores"""
+    months = today.year * 12 + today.month - 1 - retention_months
+    return date(months // 12, months % 12 + 1, 1)
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Crear las particiones que falten; retorna sus nombres"""
+    await db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    result = await db.execute(
+        text("SELECT ensure_reservation_partitions(:months_ahead)"),
+        {"months_ahead": months_ahead}
+    )
+    created = list(result.scalars())
+    await db.commit()
+    return created
+
+
+async def list_partitions(db: AsyncSession) -> List[str]:
+    """Particiones mensuales adjuntas a reservations (sin reservations_default)"""
+    result = await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'reservations'::regclass"
+    ))
+    return sorted(name for name in result.scalars() if partition_month(name))
+
+
+async def archive_partition(db: AsyncSession, name: str):
+    """Desvincular una partición mensual y moverla al schema archive"""
+    # El nombre ya pasó por PARTITION_NAME: no hay nada que escapar
+    if not partition_month(name):
+        raise ValueError(f"Not a monthly reservations partition: {name}")
+
+    await db.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    await db.execute(text(f'ALTER TABLE reservations DETACH PARTITION "{name}"'))
+    await db.execute(text(f'ALTER TABLE "{name}" SET SCHEMA {ARCHIVE_SCHEMA}'))
+    await db.commit()
+
+
+async def maintain_partitions(
+    sessionmaker,
+    today: Optional[date] = None,
+    months_ahead: int = PARTITION_MONTHS_AHEAD,
+    retention_months: int = PARTITION_RETENTION_MONTHS,
+) -> Dict[str, List[str]]:
+    """Crear particiones futuras y archivar las vencidas; retorna qué se hizo"""
+    report = {"created": [], "archived": []}
+
+    async with sessionmaker() as db:
+        if dialect_name(db) != "postgresql":
+            return report
+
+        try:
+            report["created"] = await ensure_partitions(db, months_ahead)
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"Reservations partitions not created: {e}")
+        for name in report["created"]:
+            logger.info(f"✓ Reservations partition created: {name}")
+
+        if retention_months <= 0:
+            return report
+
+        cutoff = archive_cutoff(today or date.today(), retention_months)
+        for name in await list_partitions(db):
+            if partition_month(name) >= cutoff:
+                continue
+            try:
+                await archive_partition(db, name)
+            except Exception as e:
+                await db.rollback()
+                logger.warning(f"Reservations partition {name} not archived: {e}")
+                continue
+            report["archived"].append(name)
+            logger.info(f"✓ Reservations partition archived: {ARCHIVE_SCHEMA}.{name}")
+
+    return report
+
+
+async def main():
+    report = await maintain_partitions(get_sessionmaker())
+    await dispose_engine()
+    logger.info(
+        f"Reservations partitions maintained: {len(report['created'])} created, "
+        f"{len(report['archived'])} archived"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
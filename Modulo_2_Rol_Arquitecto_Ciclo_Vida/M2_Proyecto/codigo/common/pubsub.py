@@ -0,0 +1,64 @@
+"""
+Eventos entre servicios vía Redis pub/sub
+==========================================
+Usado para invalidar cachés en memoria de todos los procesos cuando un
+servicio modifica un registro.
+"""
+
+from typing import Callable, Optional
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def publish(redis_client, channel: str, message: str):
+    """Publicar un evento; si Redis no está disponible solo se registra"""
+    if not redis_client:
+        return
+
+    try:
+        redis_client.publish(channel, message)
+    except Exception as e:
+        logger.warning(f"Failed to publish to {channel}: {e}")
+
+
+def start_listener(
+    redis_client,
+    channel: str,
+    handler: Callable[[str], None],
+    on_error: Optional[Callable[[], None]] = None,
+):
+    """
+    Suscribirse a un canal en un thread daemon
+
+    handler recibe el payload de cada mensaje. on_error se ejecuta cuando la
+    conexión falla (los mensajes emitidos mientras tanto se pierden, por lo
+    que típicamente se vacía la caché local). Retorna el thread o None si
+    Redis no está disponible.
+    """
+    if not redis_client:
+        return None
+
+    def on_message(message):
+        try:
+            handler(message["data"])
+        except Exception as e:
+            logger.warning(f"Invalid message on {channel}: {message.get('data')!r} ({e})")
+
+    def exception_handler(exc, pubsub, worker):
+        logger.warning(f"Pub/sub listener on {channel} lost connection: {exc}")
+        if on_error:
+            on_error()
+        # Evitar un loop de reconexión agresivo; get_message reconecta y re-suscribe
+        time.sleep(1.0)
+
+    try:
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(**{channel: on_message})
+        thread = pubsub.run_in_thread(sleep_time=1.0, daemon=True, exception_handler=exception_handler)
+        logger.info(f"✓ Listening for events on {channel}")
+        return thread
+    except Exception as e:
+        logger.warning(f"✗ Could not subscribe to {channel}: {e}")
+        return None
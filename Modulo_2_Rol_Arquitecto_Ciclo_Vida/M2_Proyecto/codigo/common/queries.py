@@ -0,0 +1,144 @@
+"""
+Consultas compartidas
+=====================
+Predicados sobre reservas y espacios usados por spaces y reservations service.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, NamedTuple, Set
+
+from sqlalchemy import and_, distinct, exists, func, literal_column, or_, select, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB, TSTZRANGE, array
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.db import dialect_name
+from common.models import Reservation, Space
+
+# Columna generada tstzrange(start_time, end_time, '[)') de init.sql 1.1.0.
+# No está mapeada en el modelo: solo existe en PostgreSQL.
+reservation_period = literal_column("reservations.period", type_=TSTZRANGE)
+
+# Duración máxima de una reserva (CHECK maximum_duration de init.sql 1.8.0).
+# Una reserva que se solapa con [start, end) empezó después de
+# start - MAX_RESERVATION_DURATION: con reservations particionada por
+# start_time, ese límite deja fuera todas las particiones salvo una o dos.
+MAX_RESERVATION_DURATION = timedelta(hours=24)
+
+
+def overlaps(start_time: datetime, end_time: datetime, dialect: str = "postgresql"):
+    """
+    Reservas cuyo intervalo [start_time, end_time) se solapa con el dado
+
+    En PostgreSQL usa el operador && sobre period, que resuelve el índice GiST
+    de la exclusion constraint de cada partición (junto con space_id = ...
+    AND status = 'active'), más un rango sobre start_time para podar
+    particiones. En otros motores usa la forma equivalente de un solo
+    predicado: start_time < :end AND end_time > :start.
+    """
+    if dialect == "postgresql":
+        return and_(
+            reservation_period.op("&&")(func.tstzrange(start_time, end_time, "[)")),
+            Reservation.start_time > start_time - MAX_RESERVATION_DURATION,
+            Reservation.start_time < end_time
+        )
+    return and_(Reservation.start_time < end_time, Reservation.end_time > start_time)
+
+
+def has_amenities(amenities: List[str], match: str = "all", dialect: str = "postgresql"):
+    """
+    Espacios que tienen todas (match="all") o alguna (match="any") de las amenidades
+
+    En PostgreSQL usa amenities @> '[...]' y amenities ?| ARRAY[...], ambos
+    resueltos por el índice GIN idx_spaces_amenities. En otros motores
+    recorre el array con json_each.
+    """
+    values = sorted(set(amenities))
+    if dialect == "postgresql":
+        # El comparador del tipo variante es el de JSON: forzar los operadores de JSONB
+        column = type_coerce(Space.amenities, JSONB)
+        if match == "any":
+            return column.has_any(array(values))
+        return column.contains(values)
+
+    items = func.json_each(Space.amenities).table_valued("value")
+    if match == "any":
+        return exists(select(1).select_from(items).where(items.c.value.in_(values)))
+    matched = select(func.count(distinct(items.c.value))).where(items.c.value.in_(values))
+    return matched.scalar_subquery() == len(values)
+
+
+def as_utc_naive(value: datetime) -> datetime:
+    """
+    Normalizar a UTC sin tzinfo para comparar en memoria
+
+    asyncpg retorna TIMESTAMPTZ con zona; los modelos y SQLite usan naive UTC.
+    """
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class Slot(NamedTuple):
+    """Intervalo candidato a reservar; index es su posición en la solicitud"""
+    index: int
+    space_id: int
+    start_time: datetime
+    end_time: datetime
+
+
+def find_overlaps_within(slots: Iterable[Slot]) -> Dict[int, int]:
+    """
+    Solapamientos entre los propios candidatos, en memoria
+
+    Ordena por espacio e inicio y recorre una vez (O(n log n)). Retorna
+    {index: index del candidato con el que choca}; el que empieza antes se
+    conserva.
+    """
+    conflicts = {}
+    by_space = defaultdict(list)
+    for slot in slots:
+        by_space[slot.space_id].append(slot)
+
+    for space_slots in by_space.values():
+        space_slots.sort(key=lambda s: (as_utc_naive(s.start_time), s.index))
+        kept = None
+        for slot in space_slots:
+            if kept is not None and as_utc_naive(slot.start_time) < as_utc_naive(kept.end_time):
+                conflicts[slot.index] = kept.index
+            else:
+                kept = slot
+    return conflicts
+
+
+async def find_existing_conflicts(db: AsyncSession, slots: List[Slot]) -> Set[int]:
+    """
+    Candidatos que chocan con reservas activas, con una sola consulta
+
+    Trae solo las reservas que se solapan con algún candidato (un OR de
+    predicados indexables) y resuelve en memoria a qué candidato afectan.
+    """
+    if not slots:
+        return set()
+
+    dialect = dialect_name(db)
+    result = await db.execute(
+        select(Reservation.space_id, Reservation.start_time, Reservation.end_time).where(
+            Reservation.status == "active",
+            or_(*[
+                and_(Reservation.space_id == slot.space_id, overlaps(slot.start_time, slot.end_time, dialect))
+                for slot in slots
+            ])
+        )
+    )
+
+    existing = defaultdict(list)
+    for space_id, start_time, end_time in result.all():
+        existing[space_id].append((as_utc_naive(start_time), as_utc_naive(end_time)))
+
+    conflicts = set()
+    for slot in slots:
+        start_time, end_time = as_utc_naive(slot.start_time), as_utc_naive(slot.end_time)
+        if any(s < end_time and e > start_time for s, e in existing[slot.space_id]):
+            conflicts.add(slot.index)
+    return conflicts
@@ -0,0 +1,104 @@
+"""
+Cliente Redis
+=============
+Se crea en el primer uso: redis-py conecta de forma perezosa, así que el
+arranque no se bloquea si Redis está caído. Cada operación de caché ya
+maneja sus propios errores y cae a la BD.
+
+Circuit breaker: get_redis() verifica el cliente con un ping cada
+REDIS_HEALTH_CHECK_INTERVAL segundos. Si el ping falla, retorna None
+durante un backoff exponencial (REDIS_RETRY_BACKOFF hasta
+REDIS_RETRY_BACKOFF_MAX) y los llamadores siguen como si no hubiera
+Redis, sin pagar REDIS_CONNECT_TIMEOUT en cada operación.
+"""
+
+from typing import Optional
+import logging
+import time
+
+import redis
+
+from common import config
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_initialized = False
+
+# Estado del circuit breaker
+_failures = 0
+_retry_at = 0.0
+_checked_at: Optional[float] = None
+
+
+def _get_client() -> Optional[redis.Redis]:
+    """Cliente compartido del proceso, sin verificar; None si REDIS_URL no es válida"""
+    global _client, _initialized
+    if not _initialized:
+        _initialized = True
+        try:
+            _client = redis.from_url(
+                config.REDIS_URL,
+                decode_responses=True,
+                socket_connect_timeout=config.REDIS_CONNECT_TIMEOUT,
+            )
+        except Exception as e:
+            logger.warning(f"✗ Invalid Redis configuration: {e}")
+            _client = None
+    return _client
+
+
+def _ping(client: redis.Redis) -> bool:
+    """Ping que actualiza el circuit breaker; True si Redis respondió"""
+    global _failures, _retry_at, _checked_at
+    now = time.monotonic()
+    try:
+        client.ping()
+    except Exception as e:
+        _failures += 1
+        backoff = min(config.REDIS_RETRY_BACKOFF * 2 ** (_failures - 1), config.REDIS_RETRY_BACKOFF_MAX)
+        _retry_at = now + backoff
+        _checked_at = None
+        logger.warning(f"✗ Redis unreachable, retrying in {backoff:.1f}s: {e}")
+        return False
+
+    if _failures:
+        logger.info("✓ Redis reachable again")
+    _failures = 0
+    _checked_at = now
+    return True
+
+
+def get_redis() -> Optional[redis.Redis]:
+    """Cliente compartido del proceso, o None si no hay Redis utilizable"""
+    client = _get_client()
+    if client is None:
+        return None
+
+    now = time.monotonic()
+    if now < _retry_at:
+        return None
+    if _checked_at is None or now - _checked_at >= config.REDIS_HEALTH_CHECK_INTERVAL:
+        if not _ping(client):
+            return None
+    return client
+
+
+def redis_status() -> Optional[str]:
+    """"connected" / "disconnected" para el health check; None si no hay cliente"""
+    client = _get_client()
+    if client is None:
+        return None
+    # El health check siempre hace su propio ping (también reabre el circuito)
+    return "connected" if _ping(client) else "disconnected"
+
+
+def close_redis():
+    global _client, _initialized, _failures, _retry_at, _checked_at
+    if _client is not None:
+        _client.close()
+    _client = None
+    _initialized = False
+    _failures = 0
+    _retry_at = 0.0
+    _checked_at = None
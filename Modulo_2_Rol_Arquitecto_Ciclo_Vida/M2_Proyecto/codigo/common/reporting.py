@@ -0,0 +1,181 @@
+"""
+Reportes
+========
+Vistas materializadas de init.sql 1.9.0 para las lecturas de reporting:
+
+- reservations_full: reservas con usuario y espacio
+- available_spaces: espacios activos con conteo de reservas
+- system_stats: una fila con los totales del sistema (get_system_stats())
+
+Cada una tiene un índice único, requisito de REFRESH ... CONCURRENTLY:
+recalcularlas no bloquea las lecturas. Las refresca el worker de
+reservations-service cada REPORTING_REFRESH_INTERVAL segundos; los datos
+son los de la última pasada (system_stats.refreshed_at).
+
+En otros motores (SQLite en tests) no hay vistas: las mismas columnas se
+calculan en vivo. Para refrescar a mano:
+
+    python -m common.reporting
+"""
+
+from datetime import datetime
+from typing import Dict
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import (
+    BigInteger, Boolean, DateTime, Float, Integer, JSON, Numeric, String,
+    column, func, literal, null, select, table, text,
+)
+
+from common.db import dialect_name, dispose_engine, get_sessionmaker
+from common.models import Reservation, Space, User
+
+logger = logging.getLogger(__name__)
+
+REPORTING_REFRESH_INTERVAL = float(os.getenv("REPORTING_REFRESH_INTERVAL", "300"))
+
+# Orden de refresco: system_stats primero (la más barata y la más consultada)
+REPORTING_VIEWS = ("system_stats", "available_spaces", "reservations_full")
+
+# Vistas materializadas como tablas livianas (fuera de Base.metadata:
+# create_all no debe crearlas)
+reservations_full_view = table(
+    "reservations_full",
+    column("id", Integer),
+    column("user_id", Integer),
+    column("user_name", String),
+    column("user_email", String),
+    column("space_id", Integer),
+    column("space_name", String),
+    column("space_location", String),
+    column("start_time", DateTime),
+    column("end_time", DateTime),
+    column("duration_hours", Float),
+    column("status", String),
+    column("total_price", Numeric(10, 2)),
+    column("notes", String),
+    column("created_at", DateTime),
+    column("updated_at", DateTime),
+)
+
+available_spaces_view = table(
+    "available_spaces",
+    column("id", Integer),
+    column("name", String),
+    column("description", String),
+    column("capacity", Integer),
+    column("location", String),
+    column("amenities", JSON),
+    column("price_per_hour", Numeric(10, 2)),
+    column("is_active", Boolean),
+    column("created_at", DateTime),
+    column("updated_at", DateTime),
+    column("total_reservations", BigInteger),
+    column("active_reservations", BigInteger),
+)
+
+system_stats_view = table(
+    "system_stats",
+    column("total_users", BigInteger),
+    column("total_spaces", BigInteger),
+    column("active_reservations", BigInteger),
+    column("total_reservations", BigInteger),
+    column("database_size", BigInteger),
+    column("refreshed_at", DateTime),
+)
+
+
+def reservations_full(dialect: str):
+    """reservations_full, o su consulta equivalente fuera de PostgreSQL"""
+    if dialect == "postgresql":
+        return reservations_full_view
+
+    duration = (func.julianday(Reservation.end_time) - func.julianday(Reservation.start_time)) * 24
+    return select(
+        Reservation.id,
+        Reservation.user_id,
+        User.name.label("user_name"),
+        User.email.label("user_email"),
+        Reservation.space_id,
+        Space.name.label("space_name"),
+        Space.location.label("space_location"),
+        Reservation.start_time,
+        Reservation.end_time,
+        duration.label("duration_hours"),
+        Reservation.status,
+        Reservation.total_price,
+        Reservation.notes,
+        Reservation.created_at,
+        Reservation.updated_at,
+    ).join(User, User.id == Reservation.user_id).join(
+        Space, Space.id == Reservation.space_id
+    ).subquery("reservations_full")
+
+
+def available_spaces(dialect: str):
+    """available_spaces, o su consulta equivalente fuera de PostgreSQL"""
+    if dialect == "postgresql":
+        return available_spaces_view
+
+    counts = select(
+        Reservation.space_id,
+        func.count(Reservation.id).label("total_reservations"),
+        func.count(Reservation.id).filter(Reservation.status == "active").label("active_reservations"),
+    ).group_by(Reservation.space_id).subquery()
+
+    return select(
+        Space.id, Space.name, Space.description, Space.capacity, Space.location,
+        Space.amenities, Space.price_per_hour, Space.is_active,
+        Space.created_at, Space.updated_at,
+        func.coalesce(counts.c.total_reservations, 0).label("total_reservations"),
+        func.coalesce(counts.c.active_reservations, 0).label("active_reservations"),
+    ).outerjoin(counts, counts.c.space_id == Space.id).where(
+        Space.is_active == True
+    ).subquery("available_spaces")
+
+
+def system_stats(dialect: str):
+    """Consulta de una fila con los totales del sistema"""
+    if dialect == "postgresql":
+        return select(system_stats_view)
+
+    def count(model, *where):
+        return select(func.count(model.id)).where(*where).scalar_subquery()
+
+    return select(
+        count(User, User.is_active == True).label("total_users"),
+        count(Space, Space.is_active == True).label("total_spaces"),
+        count(Reservation, Reservation.status == "active").label("active_reservations"),
+        count(Reservation).label("total_reservations"),
+        null().label("database_size"),
+        literal(datetime.utcnow(), DateTime).label("refreshed_at"),
+    )
+
+
+async def refresh_reporting_views(sessionmaker) -> Dict[str, float]:
+    """Refrescar las vistas materializadas; retorna los ms de cada una"""
+    timings: Dict[str, float] = {}
+    async with sessionmaker() as db:
+        if dialect_name(db) != "postgresql":
+            return timings
+
+        for view in REPORTING_VIEWS:
+            started = time.monotonic()
+            await db.execute(text(f"REFRESH MATERIALIZED VIEW CONCURRENTLY {view}"))
+            await db.commit()
+            timings[view] = round((time.monotonic() - started) * 1000, 1)
+            logger.info(f"✓ {view} refreshed in {timings[view]} ms")
+
+    return timings
+
+
+async def main():
+    await refresh_reporting_views(get_sessionmaker())
+    await dispose_engine()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,305 @@
+"""
+Caché de espacios en Redis
+==========================
+Cache-aside para las lecturas de spaces-service. Los valores son la
+respuesta completa ya serializada (SpaceResponse), no un subconjunto de
+columnas.
+
+- Claves versionadas: SPACE_CACHE_VERSION forma parte de cada clave, así
+  que un cambio de formato ignora lo cacheado con el formato anterior.
+- Versión por espacio: store_space la incrementa y escribe bajo la nueva.
+  get_space lee la versión antes de ir a la BD y llena bajo esa misma:
+  un loader lento que leyó la fila vieja escribe en una clave huérfana
+  (expira por TTL) en lugar de pisar lo que escribió store_space.
+- Listados: la clave incluye la generación del catálogo, que se incrementa
+  en cada alta o modificación; los listados viejos quedan huérfanos y
+  expiran por TTL.
+- Single-flight: ante un miss, un solo request por proceso consulta la BD
+  (los demás esperan su resultado) y entre procesos un lock SET NX hace
+  que el resto espere a que aparezca el valor en lugar de ir a la BD.
+- Caché negativa: un loader que retorna None (espacio inexistente) deja
+  un "null" por SPACE_NEGATIVE_CACHE_TTL segundos, así los 404 repetidos
+  no van a la BD ni esperan el lock de otro proceso.
+- Dos niveles para espacios individuales: una LRU en memoria delante de
+  Redis sirve los espacios frecuentes sin I/O de red. store_space publica
+  en SPACE_INVALIDATION_CHANNEL y cada proceso descarta su copia.
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Optional
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+
+from common import pubsub
+from common.cache import TTLLRUCache
+
+logger = logging.getLogger(__name__)
+
+SPACE_CACHE_VERSION = "v2"
+SPACE_CACHE_TTL = int(os.getenv("SPACE_CACHE_TTL", "300"))
+SPACE_LIST_CACHE_TTL = int(os.getenv("SPACE_LIST_CACHE_TTL", "60"))
+# Cuánto espera un request a que otro proceso llene la clave
+SPACE_CACHE_LOCK_TIMEOUT = float(os.getenv("SPACE_CACHE_LOCK_TIMEOUT", "2"))
+# TTL corto para los None del loader; 0 los deja sin cachear
+SPACE_NEGATIVE_CACHE_TTL = int(os.getenv("SPACE_NEGATIVE_CACHE_TTL", "10"))
+
+# Nivel local: TTL corto, acota la desactualización si se pierde un mensaje
+SPACE_LOCAL_CACHE_SIZE = int(os.getenv("SPACE_LOCAL_CACHE_SIZE", "1000"))
+SPACE_LOCAL_CACHE_TTL = float(os.getenv("SPACE_LOCAL_CACHE_TTL", "30"))
+
+GENERATION_KEY = f"spaces:{SPACE_CACHE_VERSION}:generation"
+SPACE_INVALIDATION_CHANNEL = "spaces:invalidate"
+
+local_space_cache = TTLLRUCache(maxsize=SPACE_LOCAL_CACHE_SIZE, ttl=SPACE_LOCAL_CACHE_TTL)
+
+_inflight: Dict[str, asyncio.Future] = {}
+
+# Invalidaciones locales recibidas; get_space no guarda en la LRU lo que
+# cargó si llegó alguna mientras tanto
+_local_invalidations = 0
+
+# _read: la clave no está en Redis (o Redis falló); None es un "null" cacheado
+_MISS = object()
+
+
+class CacheStats:
+    """Contadores de la caché de espacios, expuestos en /health"""
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.lock_waits = 0
+        self.errors = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "lock_waits": self.lock_waits,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+space_cache_stats = CacheStats()
+
+
+def space_version_key(space_id: int) -> str:
+    return f"space:{SPACE_CACHE_VERSION}:{space_id}:version"
+
+
+def space_key(space_id: int, version: int = 0) -> str:
+    return f"space:{SPACE_CACHE_VERSION}:{space_id}:{version}"
+
+
+def list_key(generation: int, params: dict) -> str:
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    return f"spaces:{SPACE_CACHE_VERSION}:list:{generation}:{digest}"
+
+
+def get_generation(redis_client) -> int:
+    """Generación actual del catálogo (0 si Redis no responde)"""
+    if not redis_client:
+        return 0
+    try:
+        return int(redis_client.get(GENERATION_KEY) or 0)
+    except Exception as e:
+        space_cache_stats.errors += 1
+        logger.warning(f"Cache read error: {e}")
+        return 0
+
+
+def get_space_version(redis_client, space_id: int) -> Optional[int]:
+    """Versión actual del espacio; None si no hay Redis (no se usa la caché)"""
+    if not redis_client:
+        return None
+    try:
+        return int(redis_client.get(space_version_key(space_id)) or 0)
+    except Exception as e:
+        space_cache_stats.errors += 1
+        logger.warning(f"Cache read error: {e}")
+        return None
+
+
+def invalidate_local(space_id: int):
+    """Descartar la copia local de un espacio"""
+    global _local_invalidations
+    _local_invalidations += 1
+    local_space_cache.invalidate(int(space_id))
+
+
+def clear_local():
+    """Descartar toda la LRU local (p.ej. se perdió el canal de invalidación)"""
+    global _local_invalidations
+    _local_invalidations += 1
+    local_space_cache.clear()
+
+
+def store_space(redis_client, space_id: int, value: dict):
+    """
+    Escribir la respuesta de un espacio bajo una versión nueva, descartar
+    los listados cacheados y avisar a todos los procesos que descarten su
+    copia local
+    """
+    invalidate_local(space_id)
+    if not redis_client:
+        return
+    try:
+        version = redis_client.incr(space_version_key(space_id))
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.setex(space_key(space_id, version), SPACE_CACHE_TTL, json.dumps(value, default=str))
+        pipe.incr(GENERATION_KEY)
+        pipe.execute()
+    except Exception as e:
+        space_cache_stats.errors += 1
+        logger.warning(f"Cache write error: {e}")
+    pubsub.publish(redis_client, SPACE_INVALIDATION_CHANNEL, str(space_id))
+
+
+async def get_space(redis_client, space_id: int, loader: Callable[[], Awaitable[Optional[dict]]]) -> Optional[dict]:
+    """
+    Espacio desde la LRU local, Redis o loader (en ese orden)
+
+    El dict retornado es compartido con la caché local: no modificarlo.
+    """
+    value = local_space_cache.get(int(space_id))
+    if value is not None:
+        return value
+
+    invalidations = _local_invalidations
+    version = get_space_version(redis_client, space_id)
+    if version is None:
+        # Sin Redis no hay versión contra la cual escribir: directo a la BD
+        value = await loader()
+    else:
+        value = await cached(redis_client, space_key(space_id, version), loader)
+    if value is not None and invalidations == _local_invalidations:
+        local_space_cache.set(int(space_id), value)
+    return value
+
+
+def start_space_invalidation_listener(redis_client):
+    """
+    Suscribir este proceso a las invalidaciones publicadas por store_space
+
+    Sin listener los cambios hechos por otros procesos no llegarían a la
+    LRU local hasta que expire la entrada: se deshabilita y get_space lee
+    de Redis.
+    """
+    if not local_space_cache.enabled:
+        return None
+
+    thread = pubsub.start_listener(
+        redis_client,
+        SPACE_INVALIDATION_CHANNEL,
+        handler=invalidate_local,
+        on_error=clear_local,
+    )
+    if thread is None:
+        logger.warning("✗ Local space cache disabled: invalidation channel unavailable")
+        local_space_cache.disable()
+    return thread
+
+
+def _read(redis_client, key: str) -> Any:
+    try:
+        cached = redis_client.get(key)
+    except Exception as e:
+        space_cache_stats.errors += 1
+        logger.warning(f"Cache read error: {e}")
+        return _MISS
+    return json.loads(cached) if cached is not None else _MISS
+
+
+def _write(redis_client, key: str, value: Any, ttl: int):
+    if value is None:
+        ttl = min(ttl, SPACE_NEGATIVE_CACHE_TTL)
+        if ttl <= 0:
+            return
+    try:
+        redis_client.setex(key, ttl, json.dumps(value, default=str))
+    except Exception as e:
+        space_cache_stats.errors += 1
+        logger.warning(f"Cache write error: {e}")
+
+
+async def _fill(redis_client, key: str, loader: Callable[[], Awaitable[Any]], ttl: int) -> Any:
+    lock_key = f"lock:{key}"
+    token = uuid.uuid4().hex
+    try:
+        acquired = redis_client.set(lock_key, token, nx=True, px=int(SPACE_CACHE_LOCK_TIMEOUT * 1000))
+    except Exception as e:
+        space_cache_stats.errors += 1
+        logger.warning(f"Cache lock error: {e}")
+        return await loader()
+
+    if not acquired:
+        # Otro proceso está llenando la clave: esperar su valor antes de ir a la BD
+        space_cache_stats.lock_waits += 1
+        deadline = time.monotonic() + SPACE_CACHE_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            value = _read(redis_client, key)
+            if value is not _MISS:
+                return value
+        return await loader()
+
+    try:
+        value = await loader()
+        # También None: los que esperan el lock lo ven sin ir a la BD
+        _write(redis_client, key, value, ttl)
+        return value
+    finally:
+        try:
+            # Solo liberar el lock propio (pudo expirar y tomarlo otro proceso)
+            if redis_client.get(lock_key) == token:
+                redis_client.delete(lock_key)
+        except Exception:
+            pass
+
+
+async def cached(redis_client, key: str, loader: Callable[[], Awaitable[Any]], ttl: int = SPACE_CACHE_TTL) -> Any:
+    """
+    Leer key de Redis o, si falta, llamar a loader y guardar su resultado
+
+    loader retorna un valor serializable a JSON, o None si no existe
+    (se cachea SPACE_NEGATIVE_CACHE_TTL segundos). Sin Redis se llama
+    directamente a loader.
+    """
+    if redis_client:
+        value = _read(redis_client, key)
+        if value is not _MISS:
+            space_cache_stats.hits += 1
+            return value
+    space_cache_stats.misses += 1
+
+    if not redis_client:
+        return await loader()
+
+    inflight = _inflight.get(key)
+    if inflight is not None:
+        space_cache_stats.coalesced += 1
+        return await asyncio.shield(inflight)
+
+    future = asyncio.get_running_loop().create_future()
+    # Evitar "exception was never retrieved" cuando nadie más esperaba
+    future.add_done_callback(lambda f: f.cancelled() or f.exception())
+    _inflight[key] = future
+    try:
+        value = await _fill(redis_client, key, loader, ttl)
+        future.set_result(value)
+        return value
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(key, None)
+        if not future.done():
+            future.cancel()
@@ -0,0 +1,87 @@
+"""
+Fixtures compartidas de common/tests
+====================================
+FakeSession reemplaza a AsyncSession en los jobs que solo corren contra
+PostgreSQL (contadores, particiones, reportes): registra cada sentencia
+para comparar el SQL compilado con el dialecto de PostgreSQL.
+"""
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+
+def compile_pg(statement) -> str:
+    return str(statement.compile(dialect=postgresql.dialect()))
+
+
+class FakeResult:
+    """Subconjunto de Result: filas de una columna"""
+
+    def __init__(self, rows):
+        self.rows = list(rows)
+
+    def scalar(self):
+        return self.rows[0] if self.rows else None
+
+    def scalars(self):
+        return iter(self.rows)
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """
+    Sesión async que registra las sentencias ejecutadas
+
+    results tiene la respuesta de cada execute, en orden (una lista de
+    filas, o una excepción a lanzar); objects lo que retorna get por id.
+    """
+
+    def __init__(self, results=(), objects=None):
+        self.results = list(results)
+        self.objects = objects or {}
+        self.statements = []
+        self.params = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def get(self, model, ident):
+        return self.objects.get(ident)
+
+    async def execute(self, statement, params=None):
+        self.statements.append(statement)
+        self.params.append(params)
+        result = self.results.pop(0) if self.results else []
+        if isinstance(result, Exception):
+            raise result
+        return FakeResult(result)
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+    @property
+    def sql(self):
+        """Sentencias ejecutadas, compiladas para PostgreSQL"""
+        return [compile_pg(statement) for statement in self.statements]
+
+
+@pytest.fixture
+def fake_session():
+    """Fábrica de FakeSession"""
+    return FakeSession
+
+
+@pytest.fixture(name="compile_pg")
+def compile_pg_fixture():
+    """SQL de una sentencia compilada para PostgreSQL"""
+    return compile_pg
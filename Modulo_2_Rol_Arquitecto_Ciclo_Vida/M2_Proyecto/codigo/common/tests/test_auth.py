@@ -0,0 +1,135 @@
+"""
+Tests para common.auth
+======================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import threading
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from common import auth, config
+from common.auth import JWT_ALGORITHM, JWT_SECRET, decode_token, token_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    token_cache.clear()
+    yield
+    token_cache.clear()
+
+def make_token(sub="1", minutes=30, secret=JWT_SECRET):
+    payload = {"sub": sub, "email": "test@example.com"}
+    if minutes is not None:
+        payload["exp"] = datetime.utcnow() + timedelta(minutes=minutes)
+    return jwt.encode(payload, secret, algorithm=JWT_ALGORITHM)
+
+
+def test_decode_token_cached():
+    """Test que la segunda verificación del mismo token sale de caché"""
+    token = make_token()
+    hits, misses = token_cache.hits, token_cache.misses
+    
+    first = decode_token(token)
+    second = decode_token(token)
+    
+    assert first == second
+    assert first["sub"] == 1
+    assert token_cache.hits == hits + 1
+    assert token_cache.misses == misses + 1
+
+def test_decode_token_returns_copy():
+    """Test que modificar el payload no altera la entrada en caché"""
+    token = make_token()
+    decode_token(token)["sub"] = 999
+    
+    assert decode_token(token)["sub"] == 1
+
+def test_decode_token_integer_sub():
+    """Test que se aceptan tokens antiguos con sub entero"""
+    assert decode_token(make_token(sub=7))["sub"] == 7
+
+def test_decode_token_invalid_signature():
+    """Test que un token firmado con otra clave se rechaza y no se cachea"""
+    token = make_token(secret="otra-clave")
+    
+    with pytest.raises(HTTPException) as exc:
+        decode_token(token)
+    
+    assert exc.value.status_code == 401
+    assert len(token_cache) == 0
+
+def test_decode_token_expired():
+    """Test que un token expirado se rechaza"""
+    with pytest.raises(HTTPException):
+        decode_token(make_token(minutes=-1))
+
+def test_decode_token_without_exp_not_cached():
+    """Test que sin claim exp no se guarda en caché"""
+    decode_token(make_token(minutes=None))
+    
+    assert len(token_cache) == 0
+
+def test_revocation_without_redis(monkeypatch):
+    """Test que sin Redis la revocación no se da por registrada ni por consultada"""
+    monkeypatch.setattr(auth, "get_redis", lambda: None)
+    
+    assert auth.revoke_user_tokens(1) is False
+    assert auth.is_user_revoked(1) is None
+
+def test_revocation_redis_error(monkeypatch):
+    """Test que un error de Redis se informa en lugar de tratarse como no revocado"""
+    class FailingRedis:
+        def setex(self, *args):
+            raise ConnectionError("Connection refused")
+        
+        def exists(self, key):
+            raise ConnectionError("Connection refused")
+    
+    monkeypatch.setattr(auth, "get_redis", lambda: FailingRedis())
+    
+    assert auth.revoke_user_tokens(1) is False
+    assert auth.is_user_revoked(1) is None
+
+def test_revocation_roundtrip(monkeypatch):
+    """Test revocar y consultar"""
+    class FakeRedis:
+        def __init__(self):
+            self.data = {}
+        
+        def setex(self, key, ttl, value):
+            self.data[key] = value
+        
+        def exists(self, key):
+            return int(key in self.data)
+    
+    redis_client = FakeRedis()
+    monkeypatch.setattr(auth, "get_redis", lambda: redis_client)
+    
+    assert auth.is_user_revoked(1) is False
+    assert auth.revoke_user_tokens(1) is True
+    assert auth.is_user_revoked(1) is True
+
+def test_stateless_revocation_check_off_event_loop(monkeypatch):
+    """Test que la consulta bloqueante a Redis no corre en el hilo del event loop"""
+    monkeypatch.setattr(config, "AUTH_MODE", "stateless")
+    threads = []
+    
+    def is_user_revoked(user_id):
+        threads.append(threading.get_ident())
+        return False
+    
+    monkeypatch.setattr(auth, "is_user_revoked", is_user_revoked)
+    get_current_user = auth.current_user_dependency()
+    
+    async def call():
+        return await get_current_user(token=make_token(sub="5"), db=None), threading.get_ident()
+    
+    user, loop_thread = asyncio.run(call())
+    
+    assert user.id == 5
+    assert threads and threads[0] != loop_thread
@@ -0,0 +1,115 @@
+"""
+Tests para common.cache y common.user_cache
+============================================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+import time
+
+from common.cache import TTLLRUCache
+from common import user_cache as user_cache_module
+from common.user_cache import publish_user_invalidation, user_cache
+
+
+def test_get_and_set():
+    """Test guardar y recuperar un valor"""
+    cache = TTLLRUCache(maxsize=10, ttl=60)
+    cache.set(1, {"id": 1})
+    
+    assert cache.get(1) == {"id": 1}
+    assert cache.get(2) is None
+    assert cache.hits == 1
+    assert cache.misses == 1
+
+def test_lru_eviction():
+    """Test que se expulsa la entrada menos usada al superar maxsize"""
+    cache = TTLLRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")       # "b" pasa a ser la menos usada
+    cache.set("c", 3)
+    
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+def test_ttl_expiration():
+    """Test que las entradas expiran"""
+    cache = TTLLRUCache(maxsize=10, ttl=0.05)
+    cache.set("k", "v")
+    time.sleep(0.06)
+    
+    assert cache.get("k") is None
+    assert len(cache) == 0
+
+def test_per_entry_ttl_never_exceeds_default():
+    """Test que un ttl puntual solo puede acortar la vida de la entrada"""
+    cache = TTLLRUCache(maxsize=10, ttl=0.05)
+    cache.set("k", "v", ttl=3600)
+    time.sleep(0.06)
+    
+    assert cache.get("k") is None
+
+def test_disabled_cache():
+    """Test que maxsize=0 deshabilita la caché"""
+    cache = TTLLRUCache(maxsize=0, ttl=60)
+    cache.set("k", "v")
+    
+    assert cache.get("k") is None
+    assert cache.enabled is False
+
+def test_disable_cache():
+    """Test que disable() vacía la caché y deja de guardar"""
+    cache = TTLLRUCache(maxsize=10, ttl=60)
+    cache.set("k", "v")
+    cache.disable()
+    cache.set("j", "v")
+    
+    assert cache.get("k") is None
+    assert cache.get("j") is None
+    assert cache.enabled is False
+
+def test_invalidate_and_stats():
+    """Test invalidación y contadores"""
+    cache = TTLLRUCache(maxsize=10, ttl=60)
+    cache.set("k", "v")
+    cache.get("k")
+    cache.invalidate("k")
+    cache.get("k")
+    
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+    assert stats["size"] == 0
+
+def test_publish_user_invalidation_without_redis():
+    """Test que la invalidación local funciona aunque Redis no esté disponible"""
+    user_cache.set(5, {"id": 5, "is_active": True})
+    
+    publish_user_invalidation(None, 5)
+    
+    assert user_cache.get(5) is None
+
+def test_publish_user_invalidation_publishes_event():
+    """Test que se publica el id en el canal de invalidación"""
+    published = []
+    
+    class FakeRedis:
+        def publish(self, channel, message):
+            published.append((channel, message))
+    
+    publish_user_invalidation(FakeRedis(), 7)
+    
+    assert published == [(user_cache_module.USER_INVALIDATION_CHANNEL, "7")]
+
+def test_user_cache_disabled_without_listener(monkeypatch):
+    """Test que sin canal de invalidación la caché de usuarios se deshabilita"""
+    cache = TTLLRUCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(user_cache_module, "user_cache", cache)
+    
+    assert user_cache_module.start_user_invalidation_listener(None) is None
+    
+    cache.set(5, {"id": 5, "is_active": True})
+    assert cache.get(5) is None
+    assert cache.enabled is False
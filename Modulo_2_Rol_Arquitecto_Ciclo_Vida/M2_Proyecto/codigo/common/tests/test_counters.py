@@ -0,0 +1,126 @@
+"""
+Tests para common.counters
+==========================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from common import counters
+from common.db import to_async_url
+from common.models import UserReservationCounter
+
+# PostgreSQL con init.sql aplicado, para las pruebas de concurrencia
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+def test_counts_from_counter_row(monkeypatch, fake_session):
+    """Test lectura de la fila de contadores en PostgreSQL, sin consultas"""
+    monkeypatch.setattr(counters, "dialect_name", lambda db: "postgresql")
+    db = fake_session(objects={1: UserReservationCounter(user_id=1, active=3, cancelled=1, completed=0)})
+    
+    assert asyncio.run(counters.get_reservation_counts(db, 1)) == {"active": 3, "cancelled": 1}
+    assert asyncio.run(counters.get_reservation_counts(fake_session(), 1)) == {}
+    assert db.statements == []
+
+def test_count_upcoming_discounts_started(monkeypatch, fake_session):
+    """Test que las activas ya empezadas no cuentan como futuras"""
+    monkeypatch.setattr(counters, "dialect_name", lambda db: "postgresql")
+    db = fake_session(
+        results=[[1]],
+        objects={1: UserReservationCounter(user_id=1, active=3, cancelled=0, completed=0)}
+    )
+    
+    assert asyncio.run(counters.count_upcoming(db, 1, datetime.utcnow())) == 2
+    assert asyncio.run(counters.count_upcoming(fake_session(), 1, datetime.utcnow())) == 0
+    
+    # Un solo COUNT, acotado a las activas del usuario que ya empezaron
+    [sql] = db.sql
+    assert "count(reservations.id)" in sql
+    assert "reservations.user_id = " in sql
+    assert "reservations.status = " in sql
+    assert "reservations.start_time <= " in sql
+
+def test_reconcile_counters(monkeypatch, fake_session):
+    """Test reconciliación usuario por usuario, con un commit por cada uno"""
+    monkeypatch.setattr(counters, "dialect_name", lambda db: "postgresql")
+    db = fake_session(results=[[1, 2, 3], [True], [False], [True]])
+    
+    assert asyncio.run(counters.reconcile_counters(db)) == 2
+    assert "FROM users ORDER BY users.id" in db.sql[0]
+    assert db.sql[1:] == ["SELECT reconcile_user_reservation_counter(%(user_id)s)"] * 3
+    assert db.params[1:] == [{"user_id": 1}, {"user_id": 2}, {"user_id": 3}]
+    assert db.commits == 3
+
+def test_reconcile_all_counters(monkeypatch, fake_session):
+    """Test el job del sweeper: reconciliación en una sesión propia"""
+    monkeypatch.setattr(counters, "dialect_name", lambda db: "postgresql")
+    db = fake_session(results=[[7], [False]])
+    
+    assert asyncio.run(counters.reconcile_all_counters(lambda: db)) == 0
+    assert db.sql[1] == "SELECT reconcile_user_reservation_counter(%(user_id)s)"
+
+@pytest.mark.skipif(not TEST_DATABASE_URL, reason="requiere TEST_DATABASE_URL con init.sql aplicado")
+def test_reconcile_keeps_concurrent_trigger_update():
+    """Test que un +1 del trigger confirmado durante la reparación no se pierde"""
+    engine = create_async_engine(to_async_url(TEST_DATABASE_URL))
+    sessionmaker = async_sessionmaker(engine)
+    start = datetime.utcnow() + timedelta(days=1)
+    
+    async def scenario():
+        async with engine.begin() as conn:
+            user_id = (await conn.execute(text(
+                "INSERT INTO users (email, password_hash, name) "
+                "VALUES ('counters-race@example.com', 'x', 'Counters Race') RETURNING id"
+            ))).scalar()
+            space_id = (await conn.execute(text(
+                "INSERT INTO spaces (name, capacity, price_per_hour) "
+                "VALUES ('Counters Race', 1, 10) RETURNING id"
+            ))).scalar()
+            # Deriva previa: el contador dice 5 activas y no hay ninguna
+            await conn.execute(text(
+                "INSERT INTO user_reservation_counters (user_id, active) VALUES (:user_id, 5)"
+            ), {"user_id": user_id})
+        
+        try:
+            async with engine.connect() as writer:
+                await writer.begin()
+                # El trigger deja bloqueada la fila del contador hasta el COMMIT
+                await writer.execute(text(
+                    "INSERT INTO reservations (user_id, space_id, start_time, end_time) "
+                    "VALUES (:user_id, :space_id, :start, :end)"
+                ), {"user_id": user_id, "space_id": space_id, "start": start, "end": start + timedelta(hours=1)})
+                
+                repair = asyncio.create_task(counters.reconcile_all_counters(sessionmaker))
+                await asyncio.sleep(0.5)
+                assert not repair.done()
+                await writer.commit()
+                await repair
+            
+            async with engine.connect() as conn:
+                active = (await conn.execute(text(
+                    "SELECT active FROM user_reservation_counters WHERE user_id = :user_id"
+                ), {"user_id": user_id})).scalar()
+            assert active == 1
+        finally:
+            async with engine.begin() as conn:
+                await conn.execute(text("DELETE FROM reservations WHERE user_id = :user_id"), {"user_id": user_id})
+                await conn.execute(text("DELETE FROM spaces WHERE id = :space_id"), {"space_id": space_id})
+                await conn.execute(text("DELETE FROM users WHERE id = :user_id"), {"user_id": user_id})
+            await engine.dispose()
+    
+    asyncio.run(scenario())
+
+def test_reconcile_counters_noop_outside_postgres(monkeypatch, fake_session):
+    """Test que en SQLite no hay contadores que reconciliar"""
+    monkeypatch.setattr(counters, "dialect_name", lambda db: "sqlite")
+    db = fake_session()
+    
+    assert asyncio.run(counters.reconcile_counters(db)) == 0
+    assert db.statements == []
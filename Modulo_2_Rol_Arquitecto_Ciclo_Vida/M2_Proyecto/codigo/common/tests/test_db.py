@@ -0,0 +1,36 @@
+"""
+Tests para common.db
+====================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+from common import db
+
+
+def test_to_async_url():
+    """Test traducción de URLs al driver async"""
+    assert db.to_async_url("postgresql://u:p@host/db") == "postgresql+asyncpg://u:p@host/db"
+    assert db.to_async_url("sqlite:///./test.db") == "sqlite+aiosqlite:///./test.db"
+    assert db.to_async_url("postgresql+asyncpg://host/db") == "postgresql+asyncpg://host/db"
+
+def test_engine_is_lazy():
+    """Test que importar los modelos no crea el engine"""
+    import common.models  # noqa: F401
+    
+    assert db._engine is None
+
+def test_sqlstate():
+    """Test lectura del SQLSTATE según el driver"""
+    class AsyncpgError(Exception):
+        sqlstate = "23P01"
+    
+    class Psycopg2Error(Exception):
+        pgcode = "23505"
+    
+    class Wrapped(Exception):
+        def __init__(self, orig):
+            self.orig = orig
+    
+    assert db.sqlstate(Wrapped(AsyncpgError())) == db.EXCLUSION_VIOLATION
+    assert db.sqlstate(Wrapped(Psycopg2Error())) == "23505"
+    assert db.sqlstate(ValueError()) is None
@@ -0,0 +1,44 @@
+"""
+Tests para common.events
+========================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+import json
+
+from common import events
+from common.interval_index import RESERVATION_CHANGES_CHANNEL
+
+
+def reservation(reservation_id, user_id=1, space_id=1):
+    return SimpleNamespace(
+        id=reservation_id, user_id=user_id, space_id=space_id,
+        start_time=datetime(2026, 3, 1, 9), end_time=datetime(2026, 3, 1, 10)
+    )
+
+def test_notify_reservation_changes(monkeypatch):
+    """Test invalidaciones y change feed aunque el índice en memoria esté desactivado"""
+    calls = {}
+    monkeypatch.setattr(events, "get_redis", lambda: "redis")
+    monkeypatch.setattr(events, "invalidate_freebusy", lambda r, intervals: calls.setdefault("freebusy", list(intervals)))
+    monkeypatch.setattr(events, "invalidate_user_stats", lambda r, user_ids: calls.setdefault("user_stats", user_ids))
+    monkeypatch.setattr(events.pubsub, "publish", lambda r, channel, message: calls.setdefault("published", (channel, message)))
+    
+    events.notify_reservation_changes(created=[reservation(1)], cancelled=[reservation(2, user_id=2, space_id=3)])
+    
+    assert [space_id for space_id, _, _ in calls["freebusy"]] == [1, 3]
+    assert calls["user_stats"] == {1, 2}
+    channel, message = calls["published"]
+    assert channel == RESERVATION_CHANGES_CHANNEL
+    assert [(c["op"], c["id"]) for c in json.loads(message)] == [("upsert", 1), ("delete", 2)]
+
+def test_publish_nothing_without_changes(monkeypatch):
+    """Test que sin reservas no se publica un evento vacío"""
+    published = []
+    monkeypatch.setattr(events.pubsub, "publish", lambda *args: published.append(args))
+    
+    events.publish_reservation_changes("redis")
+    
+    assert published == []
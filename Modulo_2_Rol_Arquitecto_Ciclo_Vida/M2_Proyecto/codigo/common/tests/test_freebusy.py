@@ -0,0 +1,120 @@
+"""
+Tests para common.freebusy
+==========================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+from datetime import date, datetime
+
+from common.freebusy import (
+    cache_days, clip_intervals, days_between, free_gaps, freebusy_generation_key,
+    get_cached_days, get_generation, invalidate_freebusy, merge_intervals, snap_to_grid
+)
+
+
+class FakeRedis:
+    """Subconjunto de redis-py usado por freebusy"""
+    
+    def __init__(self):
+        self.data = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+    
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+    
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+    
+    def pipeline(self, transaction=True):
+        redis_client = self
+        
+        class Pipeline:
+            def __init__(self):
+                self.calls = []
+            
+            def __getattr__(self, name):
+                return lambda *args: self.calls.append((name, args))
+            
+            def execute(self):
+                return [getattr(redis_client, name)(*args) for name, args in self.calls]
+        
+        return Pipeline()
+
+
+def at(hour, minute=0, day=1):
+    return datetime(2026, 3, day, hour, minute)
+
+def test_merge_intervals():
+    """Test fusión de intervalos solapados y contiguos"""
+    merged = merge_intervals([
+        (at(9), at(10)),
+        (at(9, 30), at(9, 45)),
+        (at(10), at(11)),
+        (at(12), at(13))
+    ])
+    
+    assert merged == [(at(9), at(11)), (at(12), at(13))]
+
+def test_free_gaps():
+    """Test huecos libres alrededor de los ocupados"""
+    busy = clip_intervals([(at(8), at(10)), (at(12), at(13))], at(9), at(18))
+    
+    assert busy == [(at(9), at(10)), (at(12), at(13))]
+    assert free_gaps(busy, at(9), at(18)) == [(at(10), at(12)), (at(13), at(18))]
+    assert free_gaps([], at(9), at(18)) == [(at(9), at(18))]
+
+def test_snap_to_grid():
+    """Test ensanchar ocupados a la granularidad pedida"""
+    busy = [(at(9, 10), at(9, 50)), (at(10, 5), at(10, 20))]
+    
+    assert snap_to_grid(busy, 30) == [(at(9), at(10, 30))]
+    assert snap_to_grid(busy, None) == busy
+
+def test_days_between():
+    """Test días UTC tocados por un intervalo (fin exclusivo)"""
+    assert days_between(at(22), at(0, day=2)) == [date(2026, 3, 1)]
+    assert days_between(at(22), at(1, day=3)) == [date(2026, 3, 1), date(2026, 3, 2), date(2026, 3, 3)]
+
+def test_invalidate_freebusy():
+    """Test que se incrementa la generación de cada espacio afectado"""
+    redis_client = FakeRedis()
+    invalidate_freebusy(redis_client, [(1, at(23), at(1, day=2)), (1, at(9), at(10)), (2, at(9), at(10))])
+    
+    assert get_generation(redis_client, 1) == 1
+    assert get_generation(redis_client, 2) == 1
+    assert get_generation(redis_client, 3) == 0
+    assert redis_client.data[freebusy_generation_key(1)] == "1"
+
+def test_cached_days_roundtrip():
+    """Test guardar y leer días bajo la generación actual"""
+    redis_client = FakeRedis()
+    day = date(2026, 3, 1)
+    generation = get_generation(redis_client, 1)
+    cache_days(redis_client, 1, generation, {day: [(at(9), at(10))]})
+    
+    assert get_cached_days(redis_client, 1, generation, [day, date(2026, 3, 2)]) == {day: [(at(9), at(10))]}
+
+def test_stale_fill_after_invalidation_is_ignored():
+    """Test que un llenado con datos previos al commit no pisa la invalidación"""
+    redis_client = FakeRedis()
+    day = date(2026, 3, 1)
+    
+    # El lector toma la generación y consulta la BD antes del commit...
+    generation = get_generation(redis_client, 1)
+    stale = {day: []}
+    # ...la reserva se confirma e invalida...
+    invalidate_freebusy(redis_client, [(1, at(9), at(10))])
+    # ...y el lector escribe su resultado viejo
+    cache_days(redis_client, 1, generation, stale)
+    
+    assert get_cached_days(redis_client, 1, get_generation(redis_client, 1), [day]) == {}
+
+def test_cache_skipped_without_redis():
+    """Test que sin Redis no hay generación ni lecturas de caché"""
+    assert get_generation(None, 1) is None
+    assert get_cached_days(FakeRedis(), 1, None, [date(2026, 3, 1)]) == {}
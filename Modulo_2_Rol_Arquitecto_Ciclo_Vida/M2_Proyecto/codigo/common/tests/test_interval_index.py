@@ -0,0 +1,78 @@
+"""
+Tests para common.interval_index
+================================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+from datetime import datetime
+
+from common.interval_index import IntervalIndex
+
+
+def at(hour, day=1):
+    return datetime(2026, 3, day, hour)
+
+def change(op, reservation_id, space_id=1, start=None, end=None):
+    data = {"op": op, "id": reservation_id, "space_id": space_id}
+    if start:
+        data.update(start_time=start.isoformat(), end_time=end.isoformat())
+    return data
+
+def loaded_index(rows):
+    index = IntervalIndex(days=14)
+    index.begin_load()
+    index.load(rows, at(0), at(0, day=15))
+    return index
+
+def test_not_ready_until_loaded():
+    """Test que el índice no responde antes de la primera carga"""
+    index = IntervalIndex(days=14)
+    
+    assert not index.covers(at(9), at(10))
+    index.apply(change("upsert", 1, start=at(9), end=at(10)))
+    assert index.overlapping(1, at(9), at(10)) == []
+
+def test_overlapping():
+    """Test búsqueda de solapamientos, incluida una reserva larga anterior"""
+    index = loaded_index([
+        (1, 1, at(8), at(20)),
+        (2, 1, at(21), at(22)),
+        (3, 1, at(22), at(23)),
+        (4, 2, at(9), at(10))
+    ])
+    
+    assert index.covers(at(9), at(10))
+    assert not index.covers(at(9, day=20), at(10, day=20))
+    assert [e[2] for e in index.overlapping(1, at(19), at(22))] == [1, 2]
+    assert index.overlapping(1, at(20), at(21)) == []
+    assert index.overlapping(3, at(9), at(10)) == []
+
+def test_apply_changes():
+    """Test eventos del change feed: alta, cancelación y fuera de horizonte"""
+    index = loaded_index([(1, 1, at(9), at(10))])
+    
+    index.apply(change("upsert", 2, start=at(11), end=at(12)))
+    index.apply(change("delete", 1))
+    index.apply(change("upsert", 3, start=at(9, day=20), end=at(10, day=20)))
+    
+    assert [e[2] for e in index.overlapping(1, at(0), at(23))] == [2]
+    assert index.stats()["reservations"] == 1
+
+def test_changes_during_load_are_replayed():
+    """Test que un evento recibido mientras se carga no se pierde"""
+    index = IntervalIndex(days=14)
+    index.begin_load()
+    index.apply(change("upsert", 2, start=at(11), end=at(12)))
+    index.apply(change("delete", 1))
+    
+    assert index.load([(1, 1, at(9), at(10))], at(0), at(0, day=15))
+    assert [e[2] for e in index.overlapping(1, at(0), at(23))] == [2]
+
+def test_clear_during_load_discards_it():
+    """Test que una carga interrumpida por clear no se instala"""
+    index = IntervalIndex(days=14)
+    index.begin_load()
+    index.clear()
+    
+    assert not index.load([(1, 1, at(9), at(10))], at(0), at(0, day=15))
+    assert not index.ready
@@ -0,0 +1,29 @@
+"""
+Tests para common.pagination
+============================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from common.pagination import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    """Test que decode_cursor devuelve la clave codificada"""
+    start = datetime(2026, 3, 1, 9, 30)
+    cursor = encode_cursor(start, 42)
+    
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (start, 42)
+    assert decode_cursor(encode_cursor("Sala Ñ", 7)) == ("Sala Ñ", 7)
+
+def test_invalid_cursor():
+    """Test cursores mal formados"""
+    for cursor in ["", "not-a-cursor", encode_cursor(datetime(2026, 1, 1), 1)[:-3]]:
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(cursor)
+        assert exc.value.status_code == 400
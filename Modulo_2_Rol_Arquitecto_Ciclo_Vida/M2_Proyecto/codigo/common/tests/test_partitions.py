@@ -0,0 +1,119 @@
+"""
+Tests para common.partitions
+============================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+from datetime import date
+import asyncio
+
+import pytest
+
+from common import partitions
+
+
+def test_partition_month():
+    """Test nombre de partición mensual a fecha"""
+    assert partitions.partition_month("reservations_p2026_03") == date(2026, 3, 1)
+    assert partitions.partition_month("reservations_default") is None
+    assert partitions.partition_month("reservations_p2026_3") is None
+
+def test_archive_cutoff():
+    """Test primer mes conservado según la retención"""
+    assert partitions.archive_cutoff(date(2026, 10, 18), 12) == date(2025, 10, 1)
+    assert partitions.archive_cutoff(date(2026, 1, 31), 1) == date(2025, 12, 1)
+    assert partitions.archive_cutoff(date(2026, 3, 1), 0) == date(2026, 3, 1)
+
+def test_maintain_partitions(monkeypatch, fake_session):
+    """Test creación por adelantado y archivo de las particiones vencidas"""
+    monkeypatch.setattr(partitions, "dialect_name", lambda db: "postgresql")
+    db = fake_session(results=[
+        [],
+        ["reservations_p2027_10"],
+        ["reservations_p2025_01", "reservations_p2025_10", "reservations_p2026_10"],
+    ])
+    
+    report = asyncio.run(partitions.maintain_partitions(
+        lambda: db, today=date(2026, 10, 18), months_ahead=12, retention_months=12
+    ))
+    
+    assert report == {"created": ["reservations_p2027_10"], "archived": ["reservations_p2025_01"]}
+    assert db.sql[:2] == [
+        f"SET LOCAL lock_timeout = '{partitions.PARTITION_LOCK_TIMEOUT}'",
+        "SELECT ensure_reservation_partitions(%(months_ahead)s)",
+    ]
+    assert db.params[1] == {"months_ahead": 12}
+    assert "pg_inherits" in db.sql[2]
+    assert db.sql[3:] == [
+        f"SET LOCAL lock_timeout = '{partitions.PARTITION_LOCK_TIMEOUT}'",
+        'ALTER TABLE reservations DETACH PARTITION "reservations_p2025_01"',
+        'ALTER TABLE "reservations_p2025_01" SET SCHEMA archive',
+    ]
+    assert db.commits == 2
+
+def test_maintain_partitions_without_retention(monkeypatch, fake_session):
+    """Test que con retención 0 solo se crean particiones"""
+    monkeypatch.setattr(partitions, "dialect_name", lambda db: "postgresql")
+    db = fake_session(results=[[], []])
+    
+    report = asyncio.run(partitions.maintain_partitions(lambda: db, months_ahead=3, retention_months=0))
+    
+    assert report == {"created": [], "archived": []}
+    assert db.sql[1:] == ["SELECT ensure_reservation_partitions(%(months_ahead)s)"]
+    assert db.params[1:] == [{"months_ahead": 3}]
+
+def test_archive_failure_is_skipped(monkeypatch, fake_session):
+    """Test que un DETACH que falla (p.ej. lock_timeout) se revierte y se reintenta después"""
+    monkeypatch.setattr(partitions, "dialect_name", lambda db: "postgresql")
+    db = fake_session(results=[
+        [], [],
+        ["reservations_p2025_01", "reservations_p2025_02"],
+        [], RuntimeError("canceling statement due to lock timeout"),
+        [], [], [],
+    ])
+    
+    report = asyncio.run(partitions.maintain_partitions(
+        lambda: db, today=date(2026, 10, 18), retention_months=12
+    ))
+    
+    assert report["archived"] == ["reservations_p2025_02"]
+    assert db.rollbacks == 1
+    assert db.sql[-2:] == [
+        'ALTER TABLE reservations DETACH PARTITION "reservations_p2025_02"',
+        'ALTER TABLE "reservations_p2025_02" SET SCHEMA archive',
+    ]
+
+def test_create_lock_timeout_is_skipped(monkeypatch, fake_session):
+    """Test que crear particiones con lock_timeout vencido se revierte y se reintenta después"""
+    monkeypatch.setattr(partitions, "dialect_name", lambda db: "postgresql")
+    db = fake_session(results=[
+        [], RuntimeError("canceling statement due to lock timeout"),
+        ["reservations_p2025_01"],
+        [], [], [],
+    ])
+    
+    report = asyncio.run(partitions.maintain_partitions(
+        lambda: db, today=date(2026, 10, 18), retention_months=12
+    ))
+    
+    assert report == {"created": [], "archived": ["reservations_p2025_01"]}
+    assert db.rollbacks == 1
+    assert db.sql[0] == f"SET LOCAL lock_timeout = '{partitions.PARTITION_LOCK_TIMEOUT}'"
+
+def test_archive_rejects_other_tables(fake_session):
+    """Test que solo se archivan particiones mensuales"""
+    db = fake_session()
+    
+    with pytest.raises(ValueError):
+        asyncio.run(partitions.archive_partition(db, "reservations_default"))
+    assert db.statements == []
+
+def test_maintain_partitions_noop_outside_postgres(monkeypatch, fake_session):
+    """Test que en SQLite no se crean ni archivan particiones"""
+    monkeypatch.setattr(partitions, "dialect_name", lambda db: "sqlite")
+    db = fake_session()
+    
+    report = asyncio.run(partitions.maintain_partitions(lambda: db, retention_months=12))
+    
+    assert report == {"created": [], "archived": []}
+    assert db.statements == []
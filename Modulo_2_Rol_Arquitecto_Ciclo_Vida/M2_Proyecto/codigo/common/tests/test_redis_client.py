@@ -0,0 +1,109 @@
+"""
+Tests para common.redis_client
+==============================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+import pytest
+
+from common import config, redis_client
+
+
+class FakeRedis:
+    """Cliente que responde o falla el ping según up"""
+
+    def __init__(self):
+        self.up = True
+        self.pings = 0
+
+    def ping(self):
+        self.pings += 1
+        if not self.up:
+            raise ConnectionError("Connection refused")
+        return True
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """Cliente falso y reloj controlado por el test"""
+    client = FakeRedis()
+    clock = {"now": 1000.0}
+    redis_client.close_redis()
+    monkeypatch.setattr(redis_client.redis, "from_url", lambda *args, **kwargs: client)
+    monkeypatch.setattr(redis_client.time, "monotonic", lambda: clock["now"])
+    monkeypatch.setattr(config, "REDIS_HEALTH_CHECK_INTERVAL", 5)
+    monkeypatch.setattr(config, "REDIS_RETRY_BACKOFF", 1)
+    monkeypatch.setattr(config, "REDIS_RETRY_BACKOFF_MAX", 4)
+    yield client, clock
+    redis_client.close_redis()
+
+
+def test_health_check_interval(fake_redis):
+    """Test que el ping se repite solo cada REDIS_HEALTH_CHECK_INTERVAL"""
+    client, clock = fake_redis
+
+    assert redis_client.get_redis() is client
+    assert redis_client.get_redis() is client
+    assert client.pings == 1
+
+    clock["now"] += 5
+    assert redis_client.get_redis() is client
+    assert client.pings == 2
+
+def test_circuit_opens_with_backoff(fake_redis):
+    """Test que tras un fallo get_redis() retorna None sin pings hasta el backoff"""
+    client, clock = fake_redis
+    client.up = False
+
+    assert redis_client.get_redis() is None
+    clock["now"] += 0.5
+    assert redis_client.get_redis() is None
+    assert client.pings == 1
+
+    # Segundo fallo: el backoff se duplica (1s -> 2s)
+    clock["now"] += 0.5
+    assert redis_client.get_redis() is None
+    clock["now"] += 1.5
+    assert redis_client.get_redis() is None
+    assert client.pings == 2
+
+def test_backoff_is_capped(fake_redis):
+    """Test que el backoff no supera REDIS_RETRY_BACKOFF_MAX"""
+    client, clock = fake_redis
+    client.up = False
+
+    for _ in range(5):
+        assert redis_client.get_redis() is None
+        clock["now"] += 4
+
+    assert client.pings == 5
+
+def test_circuit_closes_when_redis_recovers(fake_redis):
+    """Test que al volver Redis el cliente se retorna otra vez"""
+    client, clock = fake_redis
+    client.up = False
+    assert redis_client.get_redis() is None
+
+    client.up = True
+    clock["now"] += 1
+    assert redis_client.get_redis() is client
+
+    # El contador de fallos se reinicia: un nuevo fallo vuelve al backoff inicial
+    client.up = False
+    clock["now"] += 5
+    assert redis_client.get_redis() is None
+    clock["now"] += 1
+    assert redis_client.get_redis() is None
+    assert client.pings == 4
+
+def test_redis_status(fake_redis):
+    """Test que el health check informa el estado aunque el circuito esté abierto"""
+    client, clock = fake_redis
+
+    assert redis_client.redis_status() == "connected"
+    client.up = False
+    assert redis_client.redis_status() == "disconnected"
+    assert redis_client.get_redis() is None
@@ -0,0 +1,45 @@
+"""
+Tests para common.reporting
+===========================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+import asyncio
+
+from sqlalchemy import select
+
+from common import reporting
+
+
+def test_postgres_reads_materialized_views(compile_pg):
+    """Test que en PostgreSQL los reportes leen las vistas, sin COUNT"""
+    stats = compile_pg(reporting.system_stats("postgresql"))
+    spaces = compile_pg(select(reporting.available_spaces("postgresql")))
+    reservations = compile_pg(select(reporting.reservations_full("postgresql")))
+    
+    assert "FROM system_stats" in stats and "count" not in stats
+    assert "FROM available_spaces" in spaces and "count" not in spaces
+    assert "FROM reservations_full" in reservations and "JOIN" not in reservations
+
+def test_refresh_concurrently_in_order(monkeypatch, fake_session):
+    """Test REFRESH ... CONCURRENTLY de cada vista, cada una en su transacción"""
+    monkeypatch.setattr(reporting, "dialect_name", lambda db: "postgresql")
+    db = fake_session()
+    
+    timings = asyncio.run(reporting.refresh_reporting_views(lambda: db))
+    
+    assert list(timings) == list(reporting.REPORTING_VIEWS)
+    assert db.sql == [
+        "REFRESH MATERIALIZED VIEW CONCURRENTLY system_stats",
+        "REFRESH MATERIALIZED VIEW CONCURRENTLY available_spaces",
+        "REFRESH MATERIALIZED VIEW CONCURRENTLY reservations_full",
+    ]
+    assert db.commits == len(reporting.REPORTING_VIEWS)
+
+def test_refresh_noop_outside_postgres(monkeypatch, fake_session):
+    """Test que en SQLite no hay vistas que refrescar"""
+    monkeypatch.setattr(reporting, "dialect_name", lambda db: "sqlite")
+    db = fake_session()
+    
+    assert asyncio.run(reporting.refresh_reporting_views(lambda: db)) == {}
+    assert db.statements == []
@@ -0,0 +1,201 @@
+"""
+Tests para common.space_cache
+=============================
+Ejecutar con: pytest tests/ -v (desde common/)
+"""
+
+import asyncio
+import time
+
+from common import space_cache
+from common.cache import TTLLRUCache
+
+
+class FakeRedis:
+    """Subconjunto de redis-py usado por space_cache"""
+    
+    def __init__(self):
+        self.data = {}
+        self.ttls = {}
+    
+    def get(self, key):
+        return self.data.get(key)
+    
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+    
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+        self.ttls[key] = ttl
+    
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+    
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key, 0)) + 1)
+        return int(self.data[key])
+    
+    def pipeline(self, transaction=True):
+        redis_client = self
+        
+        class Pipeline:
+            def __getattr__(self, name):
+                return getattr(redis_client, name)
+            
+            def execute(self):
+                pass
+        
+        return Pipeline()
+
+def test_cache_aside():
+    """Test miss, llenado y hit"""
+    redis_client = FakeRedis()
+    calls = []
+    
+    async def loader():
+        calls.append(1)
+        return {"id": 1, "name": "Room"}
+    
+    key = space_cache.space_key(1)
+    assert asyncio.run(space_cache.cached(redis_client, key, loader)) == {"id": 1, "name": "Room"}
+    assert asyncio.run(space_cache.cached(redis_client, key, loader)) == {"id": 1, "name": "Room"}
+    assert len(calls) == 1
+    assert f"lock:{key}" not in redis_client.data
+
+def test_negative_cache(monkeypatch):
+    """Test que un None se cachea con TTL corto y store_space lo reemplaza"""
+    redis_client = FakeRedis()
+    monkeypatch.setattr(space_cache.pubsub, "publish", lambda *args: None)
+    calls = []
+    
+    async def missing():
+        calls.append(1)
+        return None
+    
+    key = space_cache.space_key(2)
+    assert asyncio.run(space_cache.cached(redis_client, key, missing)) is None
+    assert asyncio.run(space_cache.cached(redis_client, key, missing)) is None
+    assert len(calls) == 1
+    assert redis_client.ttls[key] == space_cache.SPACE_NEGATIVE_CACHE_TTL
+    
+    space_cache.local_space_cache.clear()
+    space_cache.store_space(redis_client, 2, {"id": 2})
+    assert asyncio.run(space_cache.get_space(redis_client, 2, missing)) == {"id": 2}
+    assert len(calls) == 1
+
+def test_lock_waiter_sees_negative_entry():
+    """Test que quien espera el lock de otro proceso no sondea hasta el timeout ante un None"""
+    redis_client = FakeRedis()
+    key = space_cache.space_key(3)
+    redis_client.data[f"lock:{key}"] = "other-process"
+    
+    async def missing():
+        raise AssertionError("loader should not run")
+    
+    async def fill_elsewhere():
+        await asyncio.sleep(0.02)
+        redis_client.data[key] = "null"
+    
+    async def scenario():
+        filler = asyncio.create_task(fill_elsewhere())
+        value = await space_cache.cached(redis_client, key, missing)
+        await filler
+        return value
+    
+    started = time.monotonic()
+    assert asyncio.run(scenario()) is None
+    assert time.monotonic() - started < space_cache.SPACE_CACHE_LOCK_TIMEOUT
+
+def test_single_flight():
+    """Test que requests concurrentes con la misma clave consultan la BD una vez"""
+    redis_client = FakeRedis()
+    calls = []
+    
+    async def loader():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"id": 1}
+    
+    async def concurrent():
+        key = space_cache.space_key(1)
+        return await asyncio.gather(*[space_cache.cached(redis_client, key, loader) for _ in range(5)])
+    
+    assert asyncio.run(concurrent()) == [{"id": 1}] * 5
+    assert len(calls) == 1
+
+def test_generation_changes_list_key():
+    """Test que store_space invalida los listados cacheados"""
+    redis_client = FakeRedis()
+    params = {"limit": 10}
+    before = space_cache.list_key(space_cache.get_generation(redis_client), params)
+    
+    space_cache.store_space(redis_client, 1, {"id": 1})
+    
+    assert space_cache.list_key(space_cache.get_generation(redis_client), params) != before
+    assert space_cache.SPACE_CACHE_VERSION in space_cache.space_key(1)
+
+def test_local_tier(monkeypatch):
+    """Test que un espacio en la LRU local no consulta Redis y store_space lo invalida"""
+    redis_client = FakeRedis()
+    published = []
+    monkeypatch.setattr(space_cache.pubsub, "publish", lambda r, channel, message: published.append(message))
+    space_cache.local_space_cache.clear()
+    
+    async def loader():
+        return {"id": 1, "name": "Room"}
+    
+    async def unreachable():
+        raise AssertionError("loader should not run")
+    
+    asyncio.run(space_cache.get_space(redis_client, 1, loader))
+    redis_client.data.clear()
+    assert asyncio.run(space_cache.get_space(redis_client, 1, unreachable)) == {"id": 1, "name": "Room"}
+    
+    space_cache.store_space(redis_client, 1, {"id": 1, "name": "Renamed"})
+    assert space_cache.local_space_cache.get(1) is None
+    assert published == ["1"]
+
+def test_slow_loader_does_not_overwrite_store_space(monkeypatch):
+    """Test que un loader que leyó la fila vieja no pisa lo escrito por store_space"""
+    redis_client = FakeRedis()
+    monkeypatch.setattr(space_cache.pubsub, "publish", lambda *args: None)
+    space_cache.local_space_cache.clear()
+    
+    async def scenario():
+        loaded = asyncio.Event()
+        release = asyncio.Event()
+        
+        async def slow_loader():
+            # Fila leída antes del commit de update_space
+            loaded.set()
+            await release.wait()
+            return {"id": 1, "name": "Old"}
+        
+        reader = asyncio.create_task(space_cache.get_space(redis_client, 1, slow_loader))
+        await loaded.wait()
+        space_cache.store_space(redis_client, 1, {"id": 1, "name": "New"})
+        release.set()
+        assert await reader == {"id": 1, "name": "Old"}
+        
+        async def unreachable():
+            raise AssertionError("loader should not run")
+        
+        return await space_cache.get_space(redis_client, 1, unreachable)
+    
+    assert asyncio.run(scenario()) == {"id": 1, "name": "New"}
+    assert space_cache.local_space_cache.get(1) == {"id": 1, "name": "New"}
+
+def test_local_tier_disabled_without_listener(monkeypatch):
+    """Test que sin canal de invalidación la LRU local de espacios se deshabilita"""
+    cache = TTLLRUCache(maxsize=10, ttl=60)
+    monkeypatch.setattr(space_cache, "local_space_cache", cache)
+    
+    assert space_cache.start_space_invalidation_listener(None) is None
+    
+    cache.set(1, {"id": 1})
+    assert cache.get(1) is None
+    assert cache.enabled is False
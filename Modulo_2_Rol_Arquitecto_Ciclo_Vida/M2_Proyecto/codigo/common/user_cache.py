@@ -0,0 +1,73 @@
+"""
+Caché de usuarios activos
+==========================
+get_current_user consulta la tabla users en cada request autenticado.
+Esta caché guarda las columnas del usuario por id durante USER_CACHE_TTL
+segundos; users-service publica en USER_INVALIDATION_CHANNEL cuando un
+usuario cambia o se desactiva, y cada proceso descarta su copia.
+"""
+
+import logging
+import os
+
+from common.cache import TTLLRUCache
+from common import pubsub
+
+logger = logging.getLogger(__name__)
+
+USER_INVALIDATION_CHANNEL = "users:invalidate"
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+user_cache = TTLLRUCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def snapshot_user(user) -> dict:
+    """Copiar las columnas mapeadas del modelo ORM (cada servicio tiene el suyo)"""
+    return {column.key: getattr(user, column.key) for column in user.__table__.columns}
+
+
+def get_cached_user(model, user_id: int):
+    """
+    Retorna una instancia transitoria del modelo (no asociada a sesión)
+    o None si no está en caché
+    """
+    data = user_cache.get(int(user_id))
+    if data is None:
+        return None
+    return model(**data)
+
+
+def cache_user(user):
+    """Guardar solo usuarios activos; los inactivos siempre se consultan"""
+    if user.is_active:
+        user_cache.set(int(user.id), snapshot_user(user))
+
+
+def publish_user_invalidation(redis_client, user_id: int):
+    """Avisar a todos los procesos que descarten el usuario"""
+    user_cache.invalidate(int(user_id))
+    pubsub.publish(redis_client, USER_INVALIDATION_CHANNEL, str(user_id))
+
+
+def start_user_invalidation_listener(redis_client):
+    """
+    Suscribir este proceso a las invalidaciones publicadas por users-service
+
+    Sin listener un usuario desactivado seguiría autenticando hasta que
+    expire su entrada: la caché se deshabilita y get_current_user va a la BD.
+    """
+    if not user_cache.enabled:
+        return None
+
+    thread = pubsub.start_listener(
+        redis_client,
+        USER_INVALIDATION_CHANNEL,
+        handler=lambda user_id: user_cache.invalidate(int(user_id)),
+        on_error=user_cache.clear,
+    )
+    if thread is None:
+        logger.warning("✗ User cache disabled: invalidation channel unavailable")
+        user_cache.disable()
+    return thread
@@ -0,0 +1,67 @@
+"""
+Estadísticas de reservas por usuario
+====================================
+Conteo de reservas por estado, calculado por users-service (GET /stats)
+con una sola consulta agrupada y cacheado en Redis por usuario.
+reservations-service borra la entrada del usuario cada vez que crea o
+cancela reservas.
+"""
+
+from typing import Dict, Iterable, Optional
+import json
+import logging
+import os
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from common.models import Reservation
+
+logger = logging.getLogger(__name__)
+
+USER_STATS_CACHE_TTL = int(os.getenv("USER_STATS_CACHE_TTL", "300"))
+
+
+def user_stats_key(user_id: int) -> str:
+    return f"user_stats:{user_id}"
+
+
+async def count_reservations_by_status(db: AsyncSession, user_id: int) -> Dict[str, int]:
+    """Reservas del usuario por estado, en una consulta (GROUP BY status)"""
+    result = await db.execute(
+        select(Reservation.status, func.count())
+        .where(Reservation.user_id == user_id)
+        .group_by(Reservation.status)
+    )
+    return {status: count for status, count in result.all()}
+
+
+def get_cached_user_stats(redis_client, user_id: int) -> Optional[Dict[str, int]]:
+    if not redis_client:
+        return None
+    try:
+        cached = redis_client.get(user_stats_key(user_id))
+        return json.loads(cached) if cached is not None else None
+    except Exception as e:
+        logger.warning(f"User stats cache read error: {e}")
+        return None
+
+
+def cache_user_stats(redis_client, user_id: int, counts: Dict[str, int]):
+    if not redis_client:
+        return
+    try:
+        redis_client.setex(user_stats_key(user_id), USER_STATS_CACHE_TTL, json.dumps(counts))
+    except Exception as e:
+        logger.warning(f"User stats cache write error: {e}")
+
+
+def invalidate_user_stats(redis_client, user_ids: Iterable[int]):
+    """Borrar las estadísticas cacheadas de los usuarios (después del commit)"""
+    keys = {user_stats_key(user_id) for user_id in user_ids}
+    if not redis_client or not keys:
+        return
+    try:
+        redis_client.delete(*keys)
+    except Exception as e:
+        logger.warning(f"User stats cache invalidation error: {e}")
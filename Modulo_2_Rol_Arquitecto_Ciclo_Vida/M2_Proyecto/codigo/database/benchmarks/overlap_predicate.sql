@@ -0,0 +1,141 @@
+-- =================================================================
+-- BENCHMARK - Predicado de solapamiento de reservas
+-- =================================================================
+-- Compara el predicado original de check_availability (tres OR) con
+-- el de common/queries.py::overlaps (period && tstzrange más el rango
+-- sobre start_time que poda particiones) sobre un espacio con 100.000
+-- reservas activas. Todo corre en una transacción que se revierte al
+-- final: no deja datos ni particiones. Crear las particiones toma ACCESS
+-- EXCLUSIVE sobre reservations hasta el ROLLBACK: usar una BD de desarrollo.
+--
+-- Requiere el schema 1.8.0 (reservations particionada por mes, con la
+-- exclusion constraint <partición>_no_overlap en cada partición).
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/benchmarks/overlap_predicate.sql
+--
+-- Resultado esperado:
+--   - Predicado original: Append sobre todas las particiones (sin cota
+--     inferior en start_time no hay poda), cada una con Index Scan sobre
+--     su copia de idx_reservations_availability y la condición de tiempo
+--     como Filter.
+--   - Predicado nuevo: el rango sobre start_time [inicio - 24 horas, fin)
+--     deja solo reservations_p2037_04 y reservations_p2037_05 en el Append,
+--     cada una con Index Scan sobre <partición>_no_overlap con space_id y
+--     period en Index Cond; lee solo las filas que se solapan.
+-- =================================================================
+
+BEGIN;
+
+\timing on
+
+-- Particiones mensuales para todo el rango de datos: sin ellas las
+-- reservas caerían en reservations_default y no habría nada que podar
+SELECT count(create_reservation_partition(m::DATE))
+FROM generate_series(DATE '2026-01-01', DATE '2037-06-01', INTERVAL '1 month') AS m;
+
+INSERT INTO users (email, password_hash, name)
+VALUES ('bench@example.com', 'x', 'Benchmark');
+
+INSERT INTO spaces (name, capacity, price_per_hour)
+VALUES ('Benchmark Room', 10, 10.00);
+
+-- 100k reservas de 1 hora consecutivas (sin solapamiento entre ellas)
+INSERT INTO reservations (user_id, space_id, start_time, end_time, status)
+SELECT u.id, s.id,
+       TIMESTAMPTZ '2026-01-01 00:00+00' + (g * INTERVAL '1 hour'),
+       TIMESTAMPTZ '2026-01-01 01:00+00' + (g * INTERVAL '1 hour'),
+       'active'
+FROM generate_series(0, 99999) AS g,
+     (SELECT id FROM users WHERE email = 'bench@example.com') u,
+     (SELECT id FROM spaces WHERE name = 'Benchmark Room') s;
+
+ANALYZE reservations;
+
+-- Rango consultado cerca del final: el peor caso para el predicado original
+\set range_start '2037-05-01 10:30+00'
+\set range_end '2037-05-01 12:30+00'
+
+-- -----------------------------------------------------------------
+-- EXPLAIN: predicado original (tres OR)
+-- -----------------------------------------------------------------
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT r.id
+FROM reservations r
+WHERE r.space_id = (SELECT id FROM spaces WHERE name = 'Benchmark Room')
+  AND r.status = 'active'
+  AND (
+      (r.start_time <= :'range_start' AND r.end_time > :'range_start') OR
+      (r.start_time < :'range_end' AND r.end_time >= :'range_end') OR
+      (r.start_time >= :'range_start' AND r.end_time <= :'range_end')
+  )
+LIMIT 1;
+
+-- -----------------------------------------------------------------
+-- EXPLAIN: predicado de rango (common/queries.py::overlaps)
+-- -----------------------------------------------------------------
+EXPLAIN (ANALYZE, BUFFERS)
+SELECT r.id
+FROM reservations r
+WHERE r.space_id = (SELECT id FROM spaces WHERE name = 'Benchmark Room')
+  AND r.status = 'active'
+  AND r.period && tstzrange(:'range_start', :'range_end', '[)')
+  AND r.start_time > TIMESTAMPTZ :'range_start' - INTERVAL '24 hours'
+  AND r.start_time < :'range_end'
+LIMIT 1;
+
+-- -----------------------------------------------------------------
+-- Tiempo de 1000 consultas con cada predicado, en rangos aleatorios
+-- -----------------------------------------------------------------
+DO $$
+DECLARE
+    bench_space INTEGER;
+    t0 TIMESTAMPTZ;
+    q_start TIMESTAMPTZ;
+    q_end TIMESTAMPTZ;
+    found_id INTEGER;
+    i INTEGER;
+    old_ms NUMERIC;
+    new_ms NUMERIC;
+BEGIN
+    SELECT id INTO bench_space FROM spaces WHERE name = 'Benchmark Room';
+    PERFORM setseed(0.42);
+
+    t0 := clock_timestamp();
+    FOR i IN 1..1000 LOOP
+        q_start := TIMESTAMPTZ '2026-01-01 00:00+00' + (floor(random() * 99990) * INTERVAL '1 hour') + INTERVAL '30 minutes';
+        q_end := q_start + INTERVAL '2 hours';
+        SELECT r.id INTO found_id
+        FROM reservations r
+        WHERE r.space_id = bench_space
+          AND r.status = 'active'
+          AND (
+              (r.start_time <= q_start AND r.end_time > q_start) OR
+              (r.start_time < q_end AND r.end_time >= q_end) OR
+              (r.start_time >= q_start AND r.end_time <= q_end)
+          )
+        LIMIT 1;
+    END LOOP;
+    old_ms := EXTRACT(EPOCH FROM (clock_timestamp() - t0)) * 1000;
+
+    PERFORM setseed(0.42);
+    t0 := clock_timestamp();
+    FOR i IN 1..1000 LOOP
+        q_start := TIMESTAMPTZ '2026-01-01 00:00+00' + (floor(random() * 99990) * INTERVAL '1 hour') + INTERVAL '30 minutes';
+        q_end := q_start + INTERVAL '2 hours';
+        SELECT r.id INTO found_id
+        FROM reservations r
+        WHERE r.space_id = bench_space
+          AND r.status = 'active'
+          AND r.period && tstzrange(q_start, q_end, '[)')
+          AND r.start_time > q_start - INTERVAL '24 hours'
+          AND r.start_time < q_end
+        LIMIT 1;
+    END LOOP;
+    new_ms := EXTRACT(EPOCH FROM (clock_timestamp() - t0)) * 1000;
+
+    RAISE NOTICE 'OR predicate:    % ms / 1000 queries', round(old_ms, 1);
+    RAISE NOTICE 'Range predicate: % ms / 1000 queries', round(new_ms, 1);
+    RAISE NOTICE 'Speedup:         %x', round(old_ms / NULLIF(new_ms, 0), 1);
+END $$;
+
+ROLLBACK;
@@ -9,6 +9,10 @@
 SET client_encoding = 'UTF8';
 SET timezone = 'UTC';
 
+-- btree_gist: permite combinar igualdad sobre enteros (space_id) y
+-- solapamiento de rangos (period) en un mismo índice GiST
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 -- =================================================================
 -- TABLA: users
 -- Almacena información de usuarios del sistema
@@ -67,6 +71,8 @@ CREATE INDEX IF NOT EXISTS idx_spaces_active ON spaces(is_active) WHERE is_activ
 CREATE INDEX IF NOT EXISTS idx_spaces_capacity ON spaces(capacity);
 CREATE INDEX IF NOT EXISTS idx_spaces_amenities ON spaces USING GIN (amenities);
 CREATE INDEX IF NOT EXISTS idx_spaces_name ON spaces(name);
+-- Paginación keyset de GET / en spaces-service
+CREATE INDEX IF NOT EXISTS idx_spaces_active_name_id ON spaces(is_active, name, id);
 
 -- Comentarios
 COMMENT ON TABLE spaces IS 'Espacios y recursos disponibles para reserva';
@@ -77,8 +83,12 @@ COMMENT ON COLUMN spaces.price_per_hour IS 'Precio por hora de uso del espacio';
 -- TABLA: reservations
 -- Almacena las reservas realizadas por usuarios
 -- =================================================================
+-- Particionada por mes sobre start_time (reservations_pYYYY_MM, ver
+-- create_reservation_partition). Las consultas acotadas en el tiempo
+-- leen solo las particiones del rango; reservations_default recibe lo
+-- que cae fuera de las particiones creadas.
 CREATE TABLE IF NOT EXISTS reservations (
-    id SERIAL PRIMARY KEY,
+    id SERIAL,
     user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
     space_id INTEGER NOT NULL REFERENCES spaces(id) ON DELETE CASCADE,
     start_time TIMESTAMP WITH TIME ZONE NOT NULL,
@@ -86,15 +96,37 @@ CREATE TABLE IF NOT EXISTS reservations (
     status VARCHAR(50) DEFAULT 'active' NOT NULL,
     total_price DECIMAL(10, 2),
     notes TEXT,
+    series_id UUID,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    -- Intervalo semiabierto [start_time, end_time): reservas contiguas no se solapan
+    period TSTZRANGE GENERATED ALWAYS AS (tstzrange(start_time, end_time, '[)')) STORED,
     
     -- Constraints
+    -- La clave de partición debe formar parte de la PK; id sigue saliendo de la secuencia
+    CONSTRAINT reservations_pkey PRIMARY KEY (id, start_time),
     CONSTRAINT valid_time_range CHECK (end_time > start_time),
     CONSTRAINT valid_status CHECK (status IN ('active', 'cancelled', 'completed')),
     CONSTRAINT minimum_duration CHECK (EXTRACT(EPOCH FROM (end_time - start_time)) >= 1800), -- mínimo 30 minutos
+    -- Máximo 24 horas: acota qué particiones pueden tener reservas que se solapan
+    -- con un rango (common/queries.py::MAX_RESERVATION_DURATION)
+    CONSTRAINT maximum_duration CHECK (end_time - start_time <= INTERVAL '24 hours'),
     CONSTRAINT total_price_non_negative CHECK (total_price IS NULL OR total_price >= 0)
-);
+    -- Sin solapamiento entre reservas activas del mismo espacio (SQLSTATE 23P01):
+    -- PostgreSQL no admite EXCLUDE sobre la tabla particionada. Cada partición
+    -- tiene su constraint <partición>_no_overlap y el trigger
+    -- check_reservation_cross_partition_overlap cubre los bordes entre meses.
+) PARTITION BY RANGE (start_time);
+
+-- Partición por defecto (fechas sin partición mensual todavía)
+CREATE TABLE IF NOT EXISTS reservations_default PARTITION OF reservations DEFAULT;
+ALTER TABLE reservations_default
+    ADD CONSTRAINT reservations_default_no_overlap
+    EXCLUDE USING gist (space_id WITH =, period WITH &&)
+    WHERE (status = 'active');
+
+-- Particiones desvinculadas por common/partitions.py (retención)
+CREATE SCHEMA IF NOT EXISTS archive;
 
 -- Índices para reservations
 CREATE INDEX IF NOT EXISTS idx_reservations_user ON reservations(user_id);
@@ -102,6 +134,13 @@ CREATE INDEX IF NOT EXISTS idx_reservations_space ON reservations(space_id);
 CREATE INDEX IF NOT EXISTS idx_reservations_status ON reservations(status);
 CREATE INDEX IF NOT EXISTS idx_reservations_time_range ON reservations(start_time, end_time);
 CREATE INDEX IF NOT EXISTS idx_reservations_start_time ON reservations(start_time DESC);
+-- Paginación keyset de GET / en reservations-service
+CREATE INDEX IF NOT EXISTS idx_reservations_user_start_id ON reservations(user_id, start_time DESC, id DESC);
+-- GET /stats de users-service: GROUP BY status con index-only scan
+CREATE INDEX IF NOT EXISTS idx_reservations_user_status ON reservations(user_id, status);
+CREATE INDEX IF NOT EXISTS idx_reservations_series ON reservations(series_id) WHERE series_id IS NOT NULL;
+-- reservations-service/sweeper.py: activas ya terminadas, por end_time
+CREATE INDEX IF NOT EXISTS idx_reservations_active_end ON reservations(end_time) WHERE status = 'active';
 CREATE INDEX IF NOT EXISTS idx_reservations_space_time ON reservations(space_id, start_time, end_time) 
     WHERE status = 'active';
 
@@ -114,6 +153,22 @@ COMMENT ON TABLE reservations IS 'Reservas de espacios realizadas por usuarios';
 COMMENT ON COLUMN reservations.status IS 'Estado: active (activa), cancelled (cancelada), completed (completada)';
 COMMENT ON COLUMN reservations.total_price IS 'Precio total calculado de la reserva';
 COMMENT ON COLUMN reservations.notes IS 'Notas adicionales de la reserva';
+COMMENT ON COLUMN reservations.series_id IS 'Serie recurrente a la que pertenece la reserva (NULL si es única)';
+COMMENT ON COLUMN reservations.period IS 'Rango [start_time, end_time) usado por las exclusion constraints de cada partición';
+
+-- =================================================================
+-- TABLA: user_reservation_counters
+-- =================================================================
+-- Contadores de reservas por usuario, mantenidos por trigger
+CREATE TABLE IF NOT EXISTS user_reservation_counters (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    active INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE user_reservation_counters IS 'Reservas por estado de cada usuario (trigger sobre reservations)';
 
 -- =================================================================
 -- FUNCIONES Y TRIGGERS
@@ -151,6 +206,11 @@ DECLARE
     hours_duration DECIMAL;
     hourly_rate DECIMAL;
 BEGIN
+    -- Filas reubicadas por create_reservation_partition: conservar el precio
+    IF current_setting('reservations.preserve_price', true) = 'on' THEN
+        RETURN NEW;
+    END IF;
+
     -- Calcular duración en horas (redondeado hacia arriba)
     hours_duration := CEIL(EXTRACT(EPOCH FROM (NEW.end_time - NEW.start_time)) / 3600.0);
     
@@ -172,43 +232,211 @@ CREATE TRIGGER calculate_price_before_insert
     FOR EACH ROW 
     EXECUTE FUNCTION calculate_reservation_price();
 
--- Función para validar solapamiento de reservas
-CREATE OR REPLACE FUNCTION check_reservation_overlap()
+-- Función para mantener user_reservation_counters en la misma transacción
+-- que el INSERT / UPDATE / DELETE de la reserva
+CREATE OR REPLACE FUNCTION update_user_reservation_counters()
 RETURNS TRIGGER AS $$
 BEGIN
-    -- Verificar si existe una reserva activa que se solape
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE user_reservation_counters SET
+            active = active - (OLD.status = 'active')::int,
+            cancelled = cancelled - (OLD.status = 'cancelled')::int,
+            completed = completed - (OLD.status = 'completed')::int,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = OLD.user_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO user_reservation_counters (user_id, active, cancelled, completed)
+        VALUES (
+            NEW.user_id,
+            (NEW.status = 'active')::int,
+            (NEW.status = 'cancelled')::int,
+            (NEW.status = 'completed')::int
+        )
+        ON CONFLICT (user_id) DO UPDATE SET
+            active = user_reservation_counters.active + EXCLUDED.active,
+            cancelled = user_reservation_counters.cancelled + EXCLUDED.cancelled,
+            completed = user_reservation_counters.completed + EXCLUDED.completed,
+            updated_at = CURRENT_TIMESTAMP;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger para contadores por usuario (solo si cambia el estado o el dueño)
+CREATE TRIGGER maintain_user_reservation_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status, user_id ON reservations
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_reservation_counters();
+
+-- Clave del advisory lock de un borde de mes (meses desde el año 0)
+CREATE OR REPLACE FUNCTION reservation_month_key(month_start TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+    SELECT (EXTRACT(YEAR FROM month_start AT TIME ZONE 'UTC') * 12
+            + EXTRACT(MONTH FROM month_start AT TIME ZONE 'UTC'))::INTEGER;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Solapamiento entre particiones. Dentro de una partición lo impide su
+-- constraint <partición>_no_overlap; como ninguna reserva dura más de 24
+-- horas, solo puede haber conflicto con otra partición si la reserva
+-- empieza en las primeras 24 horas del mes o termina en el mes siguiente.
+-- Esas reservas toman un advisory lock por (espacio, borde de mes), que
+-- serializa a las que pueden chocar a través del mismo borde; el resto no
+-- paga nada extra.
+CREATE OR REPLACE FUNCTION check_reservation_cross_partition_overlap()
+RETURNS TRIGGER AS $$
+DECLARE
+    month_start TIMESTAMPTZ := date_trunc('month', NEW.start_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    next_month TIMESTAMPTZ := month_start + INTERVAL '1 month';
+BEGIN
+    IF NEW.start_time >= month_start + INTERVAL '24 hours' AND NEW.end_time <= next_month THEN
+        RETURN NEW;
+    END IF;
+
+    -- Bordes en orden ascendente: dos transacciones no se bloquean mutuamente
+    IF NEW.start_time < month_start + INTERVAL '24 hours' THEN
+        PERFORM pg_advisory_xact_lock(NEW.space_id, reservation_month_key(month_start));
+    END IF;
+    IF NEW.end_time > next_month THEN
+        PERFORM pg_advisory_xact_lock(NEW.space_id, reservation_month_key(next_month));
+    END IF;
+
     IF EXISTS (
-        SELECT 1 
-        FROM reservations 
-        WHERE space_id = NEW.space_id
-          AND status = 'active'
-          AND id != COALESCE(NEW.id, 0)  -- Excluir la misma reserva en UPDATEs
-          AND (
-              (NEW.start_time >= start_time AND NEW.start_time < end_time) OR
-              (NEW.end_time > start_time AND NEW.end_time <= end_time) OR
-              (NEW.start_time <= start_time AND NEW.end_time >= end_time)
-          )
+        SELECT 1 FROM reservations r
+        WHERE r.space_id = NEW.space_id
+          AND r.status = 'active'
+          AND r.id <> NEW.id
+          AND r.period && tstzrange(NEW.start_time, NEW.end_time, '[)')
+          -- Poda: solo las particiones vecinas pueden tener reservas solapadas
+          AND r.start_time > NEW.start_time - INTERVAL '24 hours'
+          AND r.start_time < NEW.end_time
+          AND (r.start_time < month_start OR r.start_time >= next_month)
     ) THEN
-        RAISE EXCEPTION 'Reservation conflict: Space is already booked for this time range'
-            USING ERRCODE = '23P01';  -- Código de error de constraint violation
+        -- No es una constraint real (las hay solo por partición): nombre
+        -- propio para logs. La API no mira el nombre; mapea a 409 por
+        -- SQLSTATE 23P01 (common.db.EXCLUSION_VIOLATION), como a las de partición.
+        RAISE EXCEPTION 'conflicting key value violates cross-partition overlap check "reservations_cross_partition_no_overlap"'
+            USING ERRCODE = 'exclusion_violation',
+                  CONSTRAINT = 'reservations_cross_partition_no_overlap',
+                  TABLE = 'reservations';
     END IF;
-    
+
     RETURN NEW;
 END;
 $$ LANGUAGE plpgsql;
 
--- Trigger para validar solapamiento
-CREATE TRIGGER prevent_reservation_overlap 
-    BEFORE INSERT OR UPDATE ON reservations
-    FOR EACH ROW 
-    EXECUTE FUNCTION check_reservation_overlap();
+CREATE TRIGGER check_reservation_cross_partition_overlap
+    BEFORE INSERT OR UPDATE OF space_id, start_time, end_time, status ON reservations
+    FOR EACH ROW
+    WHEN (NEW.status = 'active')
+    EXECUTE FUNCTION check_reservation_cross_partition_overlap();
+
+-- =================================================================
+-- PARTICIONES DE reservations
+-- =================================================================
+
+-- Crear la partición mensual que contiene month (reservations_pYYYY_MM) con
+-- su exclusion constraint. Si reservations_default ya tiene filas de ese
+-- mes se reubican en la partición nueva (mismo id, precio y fechas).
+-- Retorna el nombre de la partición, o NULL si ya existía.
+CREATE OR REPLACE FUNCTION create_reservation_partition(month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    lower_bound TIMESTAMPTZ := date_trunc('month', month::TIMESTAMP) AT TIME ZONE 'UTC';
+    upper_bound TIMESTAMPTZ := lower_bound + INTERVAL '1 month';
+    partition_name TEXT := 'reservations_p' || to_char(date_trunc('month', month::TIMESTAMP), 'YYYY_MM');
+    moved reservations[];
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Crear la partición escanea reservations_default y falla si tiene filas del rango.
+    -- Bloquear primero el padre y después reservations_default, el mismo orden
+    -- en que las consultas sobre reservations toman sus locks (a la inversa,
+    -- una consulta en curso que espera por reservations_default es un deadlock).
+    -- common/partitions.py fija lock_timeout antes de llamar: si hay consultas
+    -- largas falla y se reintenta, en lugar de dejar la tabla bloqueada en cola
+    LOCK TABLE ONLY reservations IN ACCESS EXCLUSIVE MODE;
+    LOCK TABLE reservations_default IN ACCESS EXCLUSIVE MODE;
+
+    -- Otra sesión pudo crearla mientras se esperaban los locks
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT array_agg(r) INTO moved
+    FROM reservations r
+    WHERE r.start_time >= lower_bound AND r.start_time < upper_bound;
+    IF moved IS NOT NULL THEN
+        DELETE FROM reservations WHERE start_time >= lower_bound AND start_time < upper_bound;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF reservations FOR VALUES FROM (%L) TO (%L)',
+        partition_name, lower_bound, upper_bound
+    );
+    EXECUTE format(
+        'ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist (space_id WITH =, period WITH &&) WHERE (status = ''active'')',
+        partition_name, partition_name || '_no_overlap'
+    );
+
+    IF moved IS NOT NULL THEN
+        PERFORM set_config('reservations.preserve_price', 'on', true);
+        INSERT INTO reservations (id, user_id, space_id, start_time, end_time, status,
+                                  total_price, notes, series_id, created_at, updated_at)
+        SELECT id, user_id, space_id, start_time, end_time, status,
+               total_price, notes, series_id, created_at, updated_at
+        FROM unnest(moved);
+        PERFORM set_config('reservations.preserve_price', 'off', true);
+        RAISE NOTICE 'Moved % reservations from reservations_default to %', cardinality(moved), partition_name;
+    END IF;
+
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION create_reservation_partition(DATE) IS 'Crea la partición mensual de reservations que contiene la fecha dada';
+
+-- Particiones del mes actual y de los months_ahead siguientes; retorna las creadas
+CREATE OR REPLACE FUNCTION ensure_reservation_partitions(months_ahead INTEGER)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    month DATE;
+    created TEXT;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+            date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC') + make_interval(months => months_ahead),
+            INTERVAL '1 month'
+        )::DATE
+    LOOP
+        created := create_reservation_partition(month);
+        IF created IS NOT NULL THEN
+            RETURN NEXT created;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION ensure_reservation_partitions(INTEGER) IS 'Crea por adelantado las particiones mensuales de reservations';
+
+-- Particiones iniciales (después las mantiene common/partitions.py)
+SELECT ensure_reservation_partitions(12);
 
 -- =================================================================
--- VISTAS ÚTILES
+-- VISTAS MATERIALIZADAS (REPORTING)
 -- =================================================================
+-- Se recalculan con REFRESH MATERIALIZED VIEW CONCURRENTLY desde el worker
+-- de reservations-service (common/reporting.py), que no bloquea las
+-- lecturas y requiere un índice único en cada vista. Leerlas no recorre
+-- las tablas: los datos son los de la última pasada.
 
--- Vista de reservas con información completa
-CREATE OR REPLACE VIEW reservations_full AS
+-- Reservas con información de usuario y espacio
+CREATE MATERIALIZED VIEW IF NOT EXISTS reservations_full AS
 SELECT 
     r.id,
     r.user_id,
@@ -229,44 +457,139 @@ FROM reservations r
 JOIN users u ON r.user_id = u.id
 JOIN spaces s ON r.space_id = s.id;
 
-COMMENT ON VIEW reservations_full IS 'Vista completa de reservas con información de usuario y espacio';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reservations_full_id ON reservations_full(id, start_time);
+-- GET /admin/reports/reservations: keyset sobre (start_time DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_reservations_full_start_id ON reservations_full(start_time DESC, id DESC);
+
+COMMENT ON MATERIALIZED VIEW reservations_full IS 'Reservas con información de usuario y espacio (materializada)';
 
--- Vista de espacios disponibles
-CREATE OR REPLACE VIEW available_spaces AS
+-- Espacios activos con conteo de reservas (agregado por espacio antes del join)
+CREATE MATERIALIZED VIEW IF NOT EXISTS available_spaces AS
 SELECT 
     s.*,
-    COUNT(r.id) AS total_reservations,
-    COALESCE(SUM(CASE WHEN r.status = 'active' THEN 1 ELSE 0 END), 0) AS active_reservations
+    COALESCE(r.total_reservations, 0) AS total_reservations,
+    COALESCE(r.active_reservations, 0) AS active_reservations
 FROM spaces s
-LEFT JOIN reservations r ON s.id = r.space_id
-WHERE s.is_active = TRUE
-GROUP BY s.id;
+LEFT JOIN (
+    SELECT space_id,
+           COUNT(*) AS total_reservations,
+           COUNT(*) FILTER (WHERE status = 'active') AS active_reservations
+    FROM reservations
+    GROUP BY space_id
+) r ON r.space_id = s.id
+WHERE s.is_active = TRUE;
 
-COMMENT ON VIEW available_spaces IS 'Espacios activos con estadísticas de reservas';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_available_spaces_id ON available_spaces(id);
+CREATE INDEX IF NOT EXISTS idx_available_spaces_name_id ON available_spaces(name, id);
+
+COMMENT ON MATERIALIZED VIEW available_spaces IS 'Espacios activos con estadísticas de reservas (materializada)';
 
 -- =================================================================
 -- ESTADÍSTICAS Y METADATA
 -- =================================================================
 
--- Función para obtener estadísticas del sistema
+-- Totales del sistema en una fila (id = 1 para el índice único)
+CREATE MATERIALIZED VIEW IF NOT EXISTS system_stats AS
+SELECT
+    1 AS id,
+    (SELECT COUNT(*) FROM users WHERE is_active = TRUE) AS total_users,
+    (SELECT COUNT(*) FROM spaces WHERE is_active = TRUE) AS total_spaces,
+    (SELECT COUNT(*) FROM reservations WHERE status = 'active') AS active_reservations,
+    (SELECT COUNT(*) FROM reservations) AS total_reservations,
+    pg_database_size(current_database()) AS database_size,
+    CURRENT_TIMESTAMP AS refreshed_at;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_system_stats_id ON system_stats(id);
+
+COMMENT ON MATERIALIZED VIEW system_stats IS 'Totales del sistema a la fecha de refreshed_at (materializada)';
+
+-- Función para obtener estadísticas del sistema (lee system_stats)
 CREATE OR REPLACE FUNCTION get_system_stats()
 RETURNS JSON AS $$
+    SELECT json_build_object(
+        'total_users', total_users,
+        'total_spaces', total_spaces,
+        'active_reservations', active_reservations,
+        'total_reservations', total_reservations,
+        'database_size', database_size,
+        'refreshed_at', refreshed_at
+    )
+    FROM system_stats;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION get_system_stats() IS 'Retorna estadísticas generales del sistema (última actualización de system_stats)';
+
+-- Función para reparar los contadores de un usuario a partir de reservations
+-- (deriva por cargas masivas con el trigger deshabilitado, ediciones manuales...)
+-- Retorna TRUE si había que corregirlos. Requiere READ COMMITTED: la fila se
+-- bloquea antes de contar y el COUNT, en una sentencia posterior, ve todo lo
+-- que confirmaron los triggers que la tenían bloqueada. Un trigger que llega
+-- después espera a este COMMIT y aplica su +1/-1 sobre el valor reparado.
+CREATE OR REPLACE FUNCTION reconcile_user_reservation_counter(p_user_id INTEGER)
+RETURNS BOOLEAN AS $$
 DECLARE
-    stats JSON;
+    stored user_reservation_counters%ROWTYPE;
+    actual_active INTEGER;
+    actual_cancelled INTEGER;
+    actual_completed INTEGER;
 BEGIN
-    SELECT json_build_object(
-        'total_users', (SELECT COUNT(*) FROM users WHERE is_active = TRUE),
-        'total_spaces', (SELECT COUNT(*) FROM spaces WHERE is_active = TRUE),
-        'active_reservations', (SELECT COUNT(*) FROM reservations WHERE status = 'active'),
-        'total_reservations', (SELECT COUNT(*) FROM reservations),
-        'database_size', pg_database_size(current_database())
-    ) INTO stats;
-    
-    RETURN stats;
+    -- Sin fila no hay nada que bloquear: crearla (si un INSERT concurrente
+    -- la está creando, esperar a que termine)
+    INSERT INTO user_reservation_counters (user_id)
+    VALUES (p_user_id)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    SELECT * INTO stored
+    FROM user_reservation_counters
+    WHERE user_id = p_user_id
+    FOR UPDATE;
+
+    SELECT COUNT(*) FILTER (WHERE status = 'active'),
+           COUNT(*) FILTER (WHERE status = 'cancelled'),
+           COUNT(*) FILTER (WHERE status = 'completed')
+    INTO actual_active, actual_cancelled, actual_completed
+    FROM reservations
+    WHERE user_id = p_user_id;
+
+    IF (stored.active, stored.cancelled, stored.completed)
+       = (actual_active, actual_cancelled, actual_completed) THEN
+        RETURN FALSE;
+    END IF;
+
+    UPDATE user_reservation_counters SET
+        active = actual_active,
+        cancelled = actual_cancelled,
+        completed = actual_completed,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE user_id = p_user_id;
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION reconcile_user_reservation_counter(INTEGER) IS 'Recalcula los contadores de un usuario bajo el lock de su fila; TRUE si estaban mal';
+
+-- Reparar todos los usuarios en una sola transacción (backfill de la
+-- migración 1.6.0). Mantiene bloqueadas las filas hasta el COMMIT: el job
+-- periódico (python -m common.counters) confirma usuario por usuario.
+-- Retorna la cantidad de usuarios corregidos
+CREATE OR REPLACE FUNCTION reconcile_user_reservation_counters()
+RETURNS INTEGER AS $$
+DECLARE
+    uid INTEGER;
+    repaired INTEGER := 0;
+BEGIN
+    FOR uid IN SELECT id FROM users ORDER BY id LOOP
+        IF reconcile_user_reservation_counter(uid) THEN
+            repaired := repaired + 1;
+        END IF;
+    END LOOP;
+
+    RETURN repaired;
 END;
 $$ LANGUAGE plpgsql;
 
-COMMENT ON FUNCTION get_system_stats() IS 'Retorna estadísticas generales del sistema';
+COMMENT ON FUNCTION reconcile_user_reservation_counters() IS 'Recalcula user_reservation_counters y retorna los usuarios corregidos';
 
 -- =================================================================
 -- GRANTS (Permisos - ajustar según necesidad)
@@ -288,14 +611,26 @@ CREATE TABLE IF NOT EXISTS schema_version (
 );
 
 INSERT INTO schema_version (version, description) 
-VALUES ('1.0.0', 'Initial schema - Users, Spaces, Reservations')
+VALUES ('1.0.0', 'Initial schema - Users, Spaces, Reservations'),
+       ('1.1.0', 'Exclusion constraint reservations_no_overlap replaces overlap trigger'),
+       ('1.2.0', 'Recurring reservation series (series_id)'),
+       ('1.3.0', 'Keyset pagination index on reservations(user_id, start_time, id)'),
+       ('1.4.0', 'Keyset pagination index on spaces(is_active, name, id)'),
+       ('1.5.0', 'Index on reservations(user_id, status) for per-user stats'),
+       ('1.6.0', 'Per-user reservation counters maintained by trigger'),
+       ('1.7.0', 'Partial index on active reservations(end_time) for the completion sweeper'),
+       ('1.8.0', 'Monthly range partitioning of reservations on start_time'),
+       ('1.9.0', 'Materialized reporting views refreshed concurrently')
 ON CONFLICT (version) DO NOTHING;
 
 -- Log de finalización
 DO $$
 BEGIN
     RAISE NOTICE 'Database schema initialized successfully';
-    RAISE NOTICE 'Version: 1.0.0';
-    RAISE NOTICE 'Tables created: users, spaces, reservations';
-    RAISE NOTICE 'Triggers enabled for: updated_at, price calculation, overlap validation';
+    RAISE NOTICE 'Version: 1.9.0';
+    RAISE NOTICE 'Tables created: users, spaces, reservations, user_reservation_counters';
+    RAISE NOTICE 'Triggers enabled for: updated_at, price calculation, user counters';
+    RAISE NOTICE 'Reservations partitioned by month (reservations_pYYYY_MM + reservations_default)';
+    RAISE NOTICE 'Exclusion constraints: <partition>_no_overlap + cross-partition trigger';
+    RAISE NOTICE 'Materialized views: reservations_full, available_spaces, system_stats';
 END $$;
\ No newline at end of file
@@ -0,0 +1,45 @@
+-- =================================================================
+-- MIGRACIÓN 1.1.0 - Exclusion constraint para solapamiento de reservas
+-- =================================================================
+-- Para bases creadas con init.sql 1.0.0. Reemplaza el trigger
+-- prevent_reservation_overlap (SELECT previo, con carrera bajo READ
+-- COMMITTED) por una EXCLUDE constraint sobre un tstzrange generado.
+--
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/001_reservations_exclusion_constraint.sql
+--
+-- Si ya existen reservas activas solapadas (posibles con el trigger),
+-- la constraint no se puede crear. Listarlas antes con:
+--
+--   SELECT a.id, b.id, a.space_id
+--   FROM reservations a
+--   JOIN reservations b
+--     ON a.space_id = b.space_id AND a.id < b.id
+--    AND a.status = 'active' AND b.status = 'active'
+--    AND a.start_time < b.end_time AND a.end_time > b.start_time;
+-- =================================================================
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+-- Reescribe la tabla para calcular la columna generada
+ALTER TABLE reservations
+    ADD COLUMN IF NOT EXISTS period TSTZRANGE
+    GENERATED ALWAYS AS (tstzrange(start_time, end_time, '[)')) STORED;
+
+ALTER TABLE reservations
+    ADD CONSTRAINT reservations_no_overlap
+    EXCLUDE USING gist (space_id WITH =, period WITH &&)
+    WHERE (status = 'active');
+
+DROP TRIGGER IF EXISTS prevent_reservation_overlap ON reservations;
+DROP FUNCTION IF EXISTS check_reservation_overlap();
+
+COMMENT ON COLUMN reservations.period IS 'Rango [start_time, end_time) usado por la exclusion constraint';
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.1.0', 'Exclusion constraint reservations_no_overlap replaces overlap trigger')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,24 @@
+-- =================================================================
+-- MIGRACIÓN 1.2.0 - Series de reservas recurrentes
+-- =================================================================
+-- Agrega series_id: las ocurrencias de una serie creada con
+-- POST /series comparten el mismo UUID, y DELETE /series/{id}
+-- las cancela con un único UPDATE.
+--
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/002_reservation_series.sql
+-- =================================================================
+
+BEGIN;
+
+ALTER TABLE reservations ADD COLUMN IF NOT EXISTS series_id UUID;
+
+CREATE INDEX IF NOT EXISTS idx_reservations_series ON reservations(series_id) WHERE series_id IS NOT NULL;
+
+COMMENT ON COLUMN reservations.series_id IS 'Serie recurrente a la que pertenece la reserva (NULL si es única)';
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.2.0', 'Recurring reservation series (series_id)')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,20 @@
+-- =================================================================
+-- MIGRACIÓN 1.3.0 - Índice para paginación keyset
+-- =================================================================
+-- GET / de reservations-service pagina con
+--   WHERE user_id = ? AND (start_time, id) < (?, ?)
+--   ORDER BY start_time DESC, id DESC LIMIT ?
+-- Este índice entrega las filas ya ordenadas: cada página es un
+-- recorrido corto del índice, sin importar cuántas páginas se saltaron.
+--
+-- CONCURRENTLY no bloquea escrituras (no puede ir dentro de BEGIN/COMMIT).
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/003_reservations_keyset_index.sql
+-- =================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservations_user_start_id
+    ON reservations(user_id, start_time DESC, id DESC);
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.3.0', 'Keyset pagination index on reservations(user_id, start_time, id)')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,19 @@
+-- =================================================================
+-- MIGRACIÓN 1.4.0 - Índice para paginación keyset de espacios
+-- =================================================================
+-- GET / de spaces-service pagina (y transmite en NDJSON) con
+--   WHERE is_active = ? AND (name, id) > (?, ?)
+--   ORDER BY name, id LIMIT ?
+-- El índice entrega las filas en ese orden sin ordenar el catálogo.
+--
+-- CONCURRENTLY no bloquea escrituras (no puede ir dentro de BEGIN/COMMIT).
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/004_spaces_keyset_index.sql
+-- =================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_spaces_active_name_id
+    ON spaces(is_active, name, id);
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.4.0', 'Keyset pagination index on spaces(is_active, name, id)')
+ON CONFLICT (version) DO NOTHING;
@@ -0,0 +1,19 @@
+-- =================================================================
+-- MIGRACIÓN 1.5.0 - Índice para las estadísticas por usuario
+-- =================================================================
+-- GET /stats de users-service cuenta las reservas con
+--   SELECT status, count(*) FROM reservations
+--   WHERE user_id = ? GROUP BY status
+-- Con (user_id, status) la consulta es un index-only scan.
+--
+-- CONCURRENTLY no bloquea escrituras (no puede ir dentro de BEGIN/COMMIT).
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/005_reservations_user_status_index.sql
+-- =================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservations_user_status
+    ON reservations(user_id, status);
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.5.0', 'Index on reservations(user_id, status) for per-user stats')
+ON CONFLICT (version) DO NOTHING;
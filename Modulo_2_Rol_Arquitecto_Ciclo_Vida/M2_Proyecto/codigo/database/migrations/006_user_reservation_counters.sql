@@ -0,0 +1,150 @@
+-- =================================================================
+-- MIGRACIÓN 1.6.0 - Contadores de reservas por usuario
+-- =================================================================
+-- user_reservation_counters guarda cuántas reservas activas, canceladas
+-- y completadas tiene cada usuario. Un trigger sobre reservations lo
+-- mantiene en la misma transacción de cada escritura; GET /stats y
+-- GET /upcoming/count lo leen en lugar de contar filas.
+--
+-- reconcile_user_reservation_counters() recalcula desde reservations;
+-- se usa aquí para el backfill. La reparación periódica
+-- (python -m common.counters) llama a reconcile_user_reservation_counter
+-- usuario por usuario, una transacción cada uno.
+--
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/006_user_reservation_counters.sql
+-- =================================================================
+
+BEGIN;
+
+-- Contadores de reservas por usuario, mantenidos por trigger
+CREATE TABLE IF NOT EXISTS user_reservation_counters (
+    user_id INTEGER PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    active INTEGER NOT NULL DEFAULT 0,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    completed INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
+COMMENT ON TABLE user_reservation_counters IS 'Reservas por estado de cada usuario (trigger sobre reservations)';
+
+-- Función para mantener user_reservation_counters en la misma transacción
+-- que el INSERT / UPDATE / DELETE de la reserva
+CREATE OR REPLACE FUNCTION update_user_reservation_counters()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE user_reservation_counters SET
+            active = active - (OLD.status = 'active')::int,
+            cancelled = cancelled - (OLD.status = 'cancelled')::int,
+            completed = completed - (OLD.status = 'completed')::int,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE user_id = OLD.user_id;
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO user_reservation_counters (user_id, active, cancelled, completed)
+        VALUES (
+            NEW.user_id,
+            (NEW.status = 'active')::int,
+            (NEW.status = 'cancelled')::int,
+            (NEW.status = 'completed')::int
+        )
+        ON CONFLICT (user_id) DO UPDATE SET
+            active = user_reservation_counters.active + EXCLUDED.active,
+            cancelled = user_reservation_counters.cancelled + EXCLUDED.cancelled,
+            completed = user_reservation_counters.completed + EXCLUDED.completed,
+            updated_at = CURRENT_TIMESTAMP;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Trigger para contadores por usuario (solo si cambia el estado o el dueño)
+CREATE TRIGGER maintain_user_reservation_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status, user_id ON reservations
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_reservation_counters();
+
+-- Función para reparar los contadores de un usuario a partir de reservations
+-- (deriva por cargas masivas con el trigger deshabilitado, ediciones manuales...)
+-- Retorna TRUE si había que corregirlos. Requiere READ COMMITTED: la fila se
+-- bloquea antes de contar y el COUNT, en una sentencia posterior, ve todo lo
+-- que confirmaron los triggers que la tenían bloqueada. Un trigger que llega
+-- después espera a este COMMIT y aplica su +1/-1 sobre el valor reparado.
+CREATE OR REPLACE FUNCTION reconcile_user_reservation_counter(p_user_id INTEGER)
+RETURNS BOOLEAN AS $$
+DECLARE
+    stored user_reservation_counters%ROWTYPE;
+    actual_active INTEGER;
+    actual_cancelled INTEGER;
+    actual_completed INTEGER;
+BEGIN
+    -- Sin fila no hay nada que bloquear: crearla (si un INSERT concurrente
+    -- la está creando, esperar a que termine)
+    INSERT INTO user_reservation_counters (user_id)
+    VALUES (p_user_id)
+    ON CONFLICT (user_id) DO NOTHING;
+
+    SELECT * INTO stored
+    FROM user_reservation_counters
+    WHERE user_id = p_user_id
+    FOR UPDATE;
+
+    SELECT COUNT(*) FILTER (WHERE status = 'active'),
+           COUNT(*) FILTER (WHERE status = 'cancelled'),
+           COUNT(*) FILTER (WHERE status = 'completed')
+    INTO actual_active, actual_cancelled, actual_completed
+    FROM reservations
+    WHERE user_id = p_user_id;
+
+    IF (stored.active, stored.cancelled, stored.completed)
+       = (actual_active, actual_cancelled, actual_completed) THEN
+        RETURN FALSE;
+    END IF;
+
+    UPDATE user_reservation_counters SET
+        active = actual_active,
+        cancelled = actual_cancelled,
+        completed = actual_completed,
+        updated_at = CURRENT_TIMESTAMP
+    WHERE user_id = p_user_id;
+
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION reconcile_user_reservation_counter(INTEGER) IS 'Recalcula los contadores de un usuario bajo el lock de su fila; TRUE si estaban mal';
+
+-- Reparar todos los usuarios en una sola transacción (backfill de la
+-- migración 1.6.0). Mantiene bloqueadas las filas hasta el COMMIT: el job
+-- periódico (python -m common.counters) confirma usuario por usuario.
+-- Retorna la cantidad de usuarios corregidos
+CREATE OR REPLACE FUNCTION reconcile_user_reservation_counters()
+RETURNS INTEGER AS $$
+DECLARE
+    uid INTEGER;
+    repaired INTEGER := 0;
+BEGIN
+    FOR uid IN SELECT id FROM users ORDER BY id LOOP
+        IF reconcile_user_reservation_counter(uid) THEN
+            repaired := repaired + 1;
+        END IF;
+    END LOOP;
+
+    RETURN repaired;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION reconcile_user_reservation_counters() IS 'Recalcula user_reservation_counters y retorna los usuarios corregidos';
+
+-- Backfill. CREATE TRIGGER ya bloquea las escrituras en reservations hasta
+-- el COMMIT: ningún incremento queda entre el trigger y el recálculo.
+SELECT reconcile_user_reservation_counters();
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.6.0', 'Per-user reservation counters maintained by trigger')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
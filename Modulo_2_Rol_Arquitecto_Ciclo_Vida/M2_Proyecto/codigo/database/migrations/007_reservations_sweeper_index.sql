@@ -0,0 +1,20 @@
+-- =================================================================
+-- MIGRACIÓN 1.7.0 - Índice para el sweeper de reservas terminadas
+-- =================================================================
+-- reservations-service/sweeper.py completa en lotes las reservas con
+--   WHERE status = 'active' AND end_time <= now()
+--   ORDER BY end_time LIMIT ? FOR UPDATE SKIP LOCKED
+-- El índice parcial contiene solo las activas y las entrega ordenadas
+-- por end_time: cada lote lee las filas que va a actualizar y nada más.
+--
+-- CONCURRENTLY no bloquea escrituras (no puede ir dentro de BEGIN/COMMIT).
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/007_reservations_sweeper_index.sql
+-- =================================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_reservations_active_end
+    ON reservations(end_time) WHERE status = 'active';
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.7.0', 'Partial index on active reservations(end_time) for the completion sweeper')
+ON CONFLICT (version) DO NOTHING;
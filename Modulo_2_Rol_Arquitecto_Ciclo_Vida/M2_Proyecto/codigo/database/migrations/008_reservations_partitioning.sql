@@ -0,0 +1,355 @@
+-- =================================================================
+-- MIGRACIÓN 1.8.0 - Particionado mensual de reservations
+-- =================================================================
+-- Convierte reservations en una tabla particionada por rango sobre
+-- start_time: una partición por mes (reservations_pYYYY_MM) y
+-- reservations_default para lo que cae fuera. Las consultas acotadas en
+-- el tiempo leen solo las particiones del rango, y las particiones
+-- viejas se pueden desvincular sin tocar las activas
+-- (python -m common.partitions).
+--
+-- Cambios respecto de 1.7.0:
+--   - PK (id, start_time): la clave de partición debe formar parte de
+--     la PK. id sigue saliendo de reservations_id_seq.
+--   - CHECK maximum_duration (24 horas): acota qué particiones pueden
+--     contener reservas que se solapan con un rango.
+--   - reservations_no_overlap pasa a ser una constraint por partición
+--     (<partición>_no_overlap) más el trigger
+--     check_reservation_cross_partition_overlap para los bordes entre
+--     meses: PostgreSQL no admite EXCLUDE sobre la tabla particionada.
+--     El trigger informa CONSTRAINT reservations_cross_partition_no_overlap;
+--     ambos casos llegan con SQLSTATE 23P01, que es lo que mapea la API.
+--
+-- Copia la tabla completa con ACCESS EXCLUSIVE: ejecutar en una ventana
+-- de mantenimiento. Si hay reservas de más de 24 horas la copia falla;
+-- listarlas antes con:
+--
+--   SELECT id, start_time, end_time FROM reservations
+--   WHERE end_time - start_time > INTERVAL '24 hours';
+--
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/008_reservations_partitioning.sql
+-- =================================================================
+
+BEGIN;
+
+LOCK TABLE reservations IN ACCESS EXCLUSIVE MODE;
+
+ALTER TABLE reservations RENAME TO reservations_unpartitioned;
+-- Sin esto el DROP de la tabla vieja se llevaría la secuencia
+ALTER SEQUENCE reservations_id_seq OWNED BY NONE;
+
+CREATE TABLE reservations (
+    id INTEGER NOT NULL DEFAULT nextval('reservations_id_seq'),
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    space_id INTEGER NOT NULL REFERENCES spaces(id) ON DELETE CASCADE,
+    start_time TIMESTAMP WITH TIME ZONE NOT NULL,
+    end_time TIMESTAMP WITH TIME ZONE NOT NULL,
+    status VARCHAR(50) DEFAULT 'active' NOT NULL,
+    total_price DECIMAL(10, 2),
+    notes TEXT,
+    series_id UUID,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
+    period TSTZRANGE GENERATED ALWAYS AS (tstzrange(start_time, end_time, '[)')) STORED,
+    CONSTRAINT valid_time_range CHECK (end_time > start_time),
+    CONSTRAINT valid_status CHECK (status IN ('active', 'cancelled', 'completed')),
+    CONSTRAINT minimum_duration CHECK (EXTRACT(EPOCH FROM (end_time - start_time)) >= 1800),
+    CONSTRAINT maximum_duration CHECK (end_time - start_time <= INTERVAL '24 hours'),
+    CONSTRAINT total_price_non_negative CHECK (total_price IS NULL OR total_price >= 0)
+) PARTITION BY RANGE (start_time);
+
+ALTER SEQUENCE reservations_id_seq OWNED BY reservations.id;
+
+CREATE TABLE reservations_default PARTITION OF reservations DEFAULT;
+ALTER TABLE reservations_default
+    ADD CONSTRAINT reservations_default_no_overlap
+    EXCLUDE USING gist (space_id WITH =, period WITH &&)
+    WHERE (status = 'active');
+
+CREATE SCHEMA IF NOT EXISTS archive;
+
+-- Función para calcular precio total de reserva
+CREATE OR REPLACE FUNCTION calculate_reservation_price()
+RETURNS TRIGGER AS $$
+DECLARE
+    hours_duration DECIMAL;
+    hourly_rate DECIMAL;
+BEGIN
+    -- Filas reubicadas por create_reservation_partition: conservar el precio
+    IF current_setting('reservations.preserve_price', true) = 'on' THEN
+        RETURN NEW;
+    END IF;
+
+    -- Calcular duración en horas (redondeado hacia arriba)
+    hours_duration := CEIL(EXTRACT(EPOCH FROM (NEW.end_time - NEW.start_time)) / 3600.0);
+    
+    -- Obtener precio por hora del espacio
+    SELECT price_per_hour INTO hourly_rate 
+    FROM spaces 
+    WHERE id = NEW.space_id;
+    
+    -- Calcular precio total
+    NEW.total_price := hours_duration * hourly_rate;
+    
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Clave del advisory lock de un borde de mes (meses desde el año 0)
+CREATE OR REPLACE FUNCTION reservation_month_key(month_start TIMESTAMPTZ)
+RETURNS INTEGER AS $$
+    SELECT (EXTRACT(YEAR FROM month_start AT TIME ZONE 'UTC') * 12
+            + EXTRACT(MONTH FROM month_start AT TIME ZONE 'UTC'))::INTEGER;
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Solapamiento entre particiones. Dentro de una partición lo impide su
+-- constraint <partición>_no_overlap; como ninguna reserva dura más de 24
+-- horas, solo puede haber conflicto con otra partición si la reserva
+-- empieza en las primeras 24 horas del mes o termina en el mes siguiente.
+-- Esas reservas toman un advisory lock por (espacio, borde de mes), que
+-- serializa a las que pueden chocar a través del mismo borde; el resto no
+-- paga nada extra.
+CREATE OR REPLACE FUNCTION check_reservation_cross_partition_overlap()
+RETURNS TRIGGER AS $$
+DECLARE
+    month_start TIMESTAMPTZ := date_trunc('month', NEW.start_time AT TIME ZONE 'UTC') AT TIME ZONE 'UTC';
+    next_month TIMESTAMPTZ := month_start + INTERVAL '1 month';
+BEGIN
+    IF NEW.start_time >= month_start + INTERVAL '24 hours' AND NEW.end_time <= next_month THEN
+        RETURN NEW;
+    END IF;
+
+    -- Bordes en orden ascendente: dos transacciones no se bloquean mutuamente
+    IF NEW.start_time < month_start + INTERVAL '24 hours' THEN
+        PERFORM pg_advisory_xact_lock(NEW.space_id, reservation_month_key(month_start));
+    END IF;
+    IF NEW.end_time > next_month THEN
+        PERFORM pg_advisory_xact_lock(NEW.space_id, reservation_month_key(next_month));
+    END IF;
+
+    IF EXISTS (
+        SELECT 1 FROM reservations r
+        WHERE r.space_id = NEW.space_id
+          AND r.status = 'active'
+          AND r.id <> NEW.id
+          AND r.period && tstzrange(NEW.start_time, NEW.end_time, '[)')
+          -- Poda: solo las particiones vecinas pueden tener reservas solapadas
+          AND r.start_time > NEW.start_time - INTERVAL '24 hours'
+          AND r.start_time < NEW.end_time
+          AND (r.start_time < month_start OR r.start_time >= next_month)
+    ) THEN
+        -- No es una constraint real (las hay solo por partición): nombre
+        -- propio para logs. La API no mira el nombre; mapea a 409 por
+        -- SQLSTATE 23P01 (common.db.EXCLUSION_VIOLATION), como a las de partición.
+        RAISE EXCEPTION 'conflicting key value violates cross-partition overlap check "reservations_cross_partition_no_overlap"'
+            USING ERRCODE = 'exclusion_violation',
+                  CONSTRAINT = 'reservations_cross_partition_no_overlap',
+                  TABLE = 'reservations';
+    END IF;
+
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Crear la partición mensual que contiene month (reservations_pYYYY_MM) con
+-- su exclusion constraint. Si reservations_default ya tiene filas de ese
+-- mes se reubican en la partición nueva (mismo id, precio y fechas).
+-- Retorna el nombre de la partición, o NULL si ya existía.
+CREATE OR REPLACE FUNCTION create_reservation_partition(month DATE)
+RETURNS TEXT AS $$
+DECLARE
+    lower_bound TIMESTAMPTZ := date_trunc('month', month::TIMESTAMP) AT TIME ZONE 'UTC';
+    upper_bound TIMESTAMPTZ := lower_bound + INTERVAL '1 month';
+    partition_name TEXT := 'reservations_p' || to_char(date_trunc('month', month::TIMESTAMP), 'YYYY_MM');
+    moved reservations[];
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    -- Crear la partición escanea reservations_default y falla si tiene filas del rango.
+    -- Bloquear primero el padre y después reservations_default, el mismo orden
+    -- en que las consultas sobre reservations toman sus locks (a la inversa,
+    -- una consulta en curso que espera por reservations_default es un deadlock).
+    -- common/partitions.py fija lock_timeout antes de llamar: si hay consultas
+    -- largas falla y se reintenta, en lugar de dejar la tabla bloqueada en cola
+    LOCK TABLE ONLY reservations IN ACCESS EXCLUSIVE MODE;
+    LOCK TABLE reservations_default IN ACCESS EXCLUSIVE MODE;
+
+    -- Otra sesión pudo crearla mientras se esperaban los locks
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN NULL;
+    END IF;
+
+    SELECT array_agg(r) INTO moved
+    FROM reservations r
+    WHERE r.start_time >= lower_bound AND r.start_time < upper_bound;
+    IF moved IS NOT NULL THEN
+        DELETE FROM reservations WHERE start_time >= lower_bound AND start_time < upper_bound;
+    END IF;
+
+    EXECUTE format(
+        'CREATE TABLE %I PARTITION OF reservations FOR VALUES FROM (%L) TO (%L)',
+        partition_name, lower_bound, upper_bound
+    );
+    EXECUTE format(
+        'ALTER TABLE %I ADD CONSTRAINT %I EXCLUDE USING gist (space_id WITH =, period WITH &&) WHERE (status = ''active'')',
+        partition_name, partition_name || '_no_overlap'
+    );
+
+    IF moved IS NOT NULL THEN
+        PERFORM set_config('reservations.preserve_price', 'on', true);
+        INSERT INTO reservations (id, user_id, space_id, start_time, end_time, status,
+                                  total_price, notes, series_id, created_at, updated_at)
+        SELECT id, user_id, space_id, start_time, end_time, status,
+               total_price, notes, series_id, created_at, updated_at
+        FROM unnest(moved);
+        PERFORM set_config('reservations.preserve_price', 'off', true);
+        RAISE NOTICE 'Moved % reservations from reservations_default to %', cardinality(moved), partition_name;
+    END IF;
+
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION create_reservation_partition(DATE) IS 'Crea la partición mensual de reservations que contiene la fecha dada';
+
+-- Particiones del mes actual y de los months_ahead siguientes; retorna las creadas
+CREATE OR REPLACE FUNCTION ensure_reservation_partitions(months_ahead INTEGER)
+RETURNS SETOF TEXT AS $$
+DECLARE
+    month DATE;
+    created TEXT;
+BEGIN
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+            date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC') + make_interval(months => months_ahead),
+            INTERVAL '1 month'
+        )::DATE
+    LOOP
+        created := create_reservation_partition(month);
+        IF created IS NOT NULL THEN
+            RETURN NEXT created;
+        END IF;
+    END LOOP;
+END;
+$$ LANGUAGE plpgsql;
+
+COMMENT ON FUNCTION ensure_reservation_partitions(INTEGER) IS 'Crea por adelantado las particiones mensuales de reservations';
+
+-- Particiones desde el mes de la reserva más antigua hasta 12 meses adelante
+SELECT create_reservation_partition(month::DATE)
+FROM generate_series(
+    (SELECT date_trunc('month', min(start_time) AT TIME ZONE 'UTC') FROM reservations_unpartitioned),
+    date_trunc('month', CURRENT_TIMESTAMP AT TIME ZONE 'UTC'),
+    INTERVAL '1 month'
+) AS month;
+SELECT ensure_reservation_partitions(12);
+
+-- Copia sin triggers todavía: se conservan precios y los contadores no cambian
+INSERT INTO reservations (id, user_id, space_id, start_time, end_time, status,
+                          total_price, notes, series_id, created_at, updated_at)
+SELECT id, user_id, space_id, start_time, end_time, status,
+       total_price, notes, series_id, created_at, updated_at
+FROM reservations_unpartitioned;
+
+-- Se lleva también las vistas que dependen de la tabla (se recrean abajo)
+DROP TABLE reservations_unpartitioned CASCADE;
+
+-- PK e índices después de la copia (y con los nombres ya libres)
+ALTER TABLE reservations ADD CONSTRAINT reservations_pkey PRIMARY KEY (id, start_time);
+
+-- Índices para reservations
+CREATE INDEX IF NOT EXISTS idx_reservations_user ON reservations(user_id);
+CREATE INDEX IF NOT EXISTS idx_reservations_space ON reservations(space_id);
+CREATE INDEX IF NOT EXISTS idx_reservations_status ON reservations(status);
+CREATE INDEX IF NOT EXISTS idx_reservations_time_range ON reservations(start_time, end_time);
+CREATE INDEX IF NOT EXISTS idx_reservations_start_time ON reservations(start_time DESC);
+-- Paginación keyset de GET / en reservations-service
+CREATE INDEX IF NOT EXISTS idx_reservations_user_start_id ON reservations(user_id, start_time DESC, id DESC);
+-- GET /stats de users-service: GROUP BY status con index-only scan
+CREATE INDEX IF NOT EXISTS idx_reservations_user_status ON reservations(user_id, status);
+CREATE INDEX IF NOT EXISTS idx_reservations_series ON reservations(series_id) WHERE series_id IS NOT NULL;
+-- reservations-service/sweeper.py: activas ya terminadas, por end_time
+CREATE INDEX IF NOT EXISTS idx_reservations_active_end ON reservations(end_time) WHERE status = 'active';
+CREATE INDEX IF NOT EXISTS idx_reservations_space_time ON reservations(space_id, start_time, end_time) 
+    WHERE status = 'active';
+
+-- Índice compuesto para búsquedas de disponibilidad (query optimization)
+CREATE INDEX IF NOT EXISTS idx_reservations_availability ON reservations(space_id, status, start_time, end_time)
+    WHERE status = 'active';
+
+-- Comentarios
+COMMENT ON TABLE reservations IS 'Reservas de espacios realizadas por usuarios';
+COMMENT ON COLUMN reservations.status IS 'Estado: active (activa), cancelled (cancelada), completed (completada)';
+COMMENT ON COLUMN reservations.total_price IS 'Precio total calculado de la reserva';
+COMMENT ON COLUMN reservations.notes IS 'Notas adicionales de la reserva';
+COMMENT ON COLUMN reservations.series_id IS 'Serie recurrente a la que pertenece la reserva (NULL si es única)';
+COMMENT ON COLUMN reservations.period IS 'Rango [start_time, end_time) usado por las exclusion constraints de cada partición';
+
+-- Triggers (los de la tabla vieja se borraron con ella)
+CREATE TRIGGER update_reservations_updated_at 
+    BEFORE UPDATE ON reservations
+    FOR EACH ROW 
+    EXECUTE FUNCTION update_updated_at_column();
+
+CREATE TRIGGER calculate_price_before_insert 
+    BEFORE INSERT ON reservations
+    FOR EACH ROW 
+    EXECUTE FUNCTION calculate_reservation_price();
+
+CREATE TRIGGER maintain_user_reservation_counters
+    AFTER INSERT OR DELETE OR UPDATE OF status, user_id ON reservations
+    FOR EACH ROW
+    EXECUTE FUNCTION update_user_reservation_counters();
+
+CREATE TRIGGER check_reservation_cross_partition_overlap
+    BEFORE INSERT OR UPDATE OF space_id, start_time, end_time, status ON reservations
+    FOR EACH ROW
+    WHEN (NEW.status = 'active')
+    EXECUTE FUNCTION check_reservation_cross_partition_overlap();
+
+-- Vista de reservas con información completa
+CREATE OR REPLACE VIEW reservations_full AS
+SELECT 
+    r.id,
+    r.user_id,
+    u.name AS user_name,
+    u.email AS user_email,
+    r.space_id,
+    s.name AS space_name,
+    s.location AS space_location,
+    r.start_time,
+    r.end_time,
+    EXTRACT(EPOCH FROM (r.end_time - r.start_time)) / 3600.0 AS duration_hours,
+    r.status,
+    r.total_price,
+    r.notes,
+    r.created_at,
+    r.updated_at
+FROM reservations r
+JOIN users u ON r.user_id = u.id
+JOIN spaces s ON r.space_id = s.id;
+
+COMMENT ON VIEW reservations_full IS 'Vista completa de reservas con información de usuario y espacio';
+
+-- Vista de espacios disponibles
+CREATE OR REPLACE VIEW available_spaces AS
+SELECT 
+    s.*,
+    COUNT(r.id) AS total_reservations,
+    COALESCE(SUM(CASE WHEN r.status = 'active' THEN 1 ELSE 0 END), 0) AS active_reservations
+FROM spaces s
+LEFT JOIN reservations r ON s.id = r.space_id
+WHERE s.is_active = TRUE
+GROUP BY s.id;
+
+COMMENT ON VIEW available_spaces IS 'Espacios activos con estadísticas de reservas';
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.8.0', 'Monthly range partitioning of reservations on start_time')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,107 @@
+-- =================================================================
+-- MIGRACIÓN 1.9.0 - Vistas materializadas de reporting
+-- =================================================================
+-- reservations_full y available_spaces pasan de vistas a vistas
+-- materializadas, y get_system_stats() lee la nueva system_stats en
+-- lugar de hacer cuatro COUNT(*) y pg_database_size en cada llamada.
+--
+-- Cada vista tiene un índice único para poder refrescarse con
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY (sin bloquear lecturas). Las
+-- refresca el worker de reservations-service cada
+-- REPORTING_REFRESH_INTERVAL segundos, o a mano con:
+--   python -m common.reporting
+--
+-- Ejecutar con:
+--   psql "$DATABASE_URL" -f database/migrations/009_reporting_materialized_views.sql
+-- =================================================================
+
+BEGIN;
+
+DROP VIEW IF EXISTS reservations_full;
+DROP VIEW IF EXISTS available_spaces;
+
+-- Reservas con información de usuario y espacio
+CREATE MATERIALIZED VIEW IF NOT EXISTS reservations_full AS
+SELECT 
+    r.id,
+    r.user_id,
+    u.name AS user_name,
+    u.email AS user_email,
+    r.space_id,
+    s.name AS space_name,
+    s.location AS space_location,
+    r.start_time,
+    r.end_time,
+    EXTRACT(EPOCH FROM (r.end_time - r.start_time)) / 3600.0 AS duration_hours,
+    r.status,
+    r.total_price,
+    r.notes,
+    r.created_at,
+    r.updated_at
+FROM reservations r
+JOIN users u ON r.user_id = u.id
+JOIN spaces s ON r.space_id = s.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_reservations_full_id ON reservations_full(id, start_time);
+-- GET /admin/reports/reservations: keyset sobre (start_time DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_reservations_full_start_id ON reservations_full(start_time DESC, id DESC);
+
+COMMENT ON MATERIALIZED VIEW reservations_full IS 'Reservas con información de usuario y espacio (materializada)';
+
+-- Espacios activos con conteo de reservas (agregado por espacio antes del join)
+CREATE MATERIALIZED VIEW IF NOT EXISTS available_spaces AS
+SELECT 
+    s.*,
+    COALESCE(r.total_reservations, 0) AS total_reservations,
+    COALESCE(r.active_reservations, 0) AS active_reservations
+FROM spaces s
+LEFT JOIN (
+    SELECT space_id,
+           COUNT(*) AS total_reservations,
+           COUNT(*) FILTER (WHERE status = 'active') AS active_reservations
+    FROM reservations
+    GROUP BY space_id
+) r ON r.space_id = s.id
+WHERE s.is_active = TRUE;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_available_spaces_id ON available_spaces(id);
+CREATE INDEX IF NOT EXISTS idx_available_spaces_name_id ON available_spaces(name, id);
+
+COMMENT ON MATERIALIZED VIEW available_spaces IS 'Espacios activos con estadísticas de reservas (materializada)';
+
+-- Totales del sistema en una fila (id = 1 para el índice único)
+CREATE MATERIALIZED VIEW IF NOT EXISTS system_stats AS
+SELECT
+    1 AS id,
+    (SELECT COUNT(*) FROM users WHERE is_active = TRUE) AS total_users,
+    (SELECT COUNT(*) FROM spaces WHERE is_active = TRUE) AS total_spaces,
+    (SELECT COUNT(*) FROM reservations WHERE status = 'active') AS active_reservations,
+    (SELECT COUNT(*) FROM reservations) AS total_reservations,
+    pg_database_size(current_database()) AS database_size,
+    CURRENT_TIMESTAMP AS refreshed_at;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_system_stats_id ON system_stats(id);
+
+COMMENT ON MATERIALIZED VIEW system_stats IS 'Totales del sistema a la fecha de refreshed_at (materializada)';
+
+-- Función para obtener estadísticas del sistema (lee system_stats)
+CREATE OR REPLACE FUNCTION get_system_stats()
+RETURNS JSON AS $$
+    SELECT json_build_object(
+        'total_users', total_users,
+        'total_spaces', total_spaces,
+        'active_reservations', active_reservations,
+        'total_reservations', total_reservations,
+        'database_size', database_size,
+        'refreshed_at', refreshed_at
+    )
+    FROM system_stats;
+$$ LANGUAGE sql STABLE;
+
+COMMENT ON FUNCTION get_system_stats() IS 'Retorna estadísticas generales del sistema (última actualización de system_stats)';
+
+INSERT INTO schema_version (version, description)
+VALUES ('1.9.0', 'Materialized reporting views refreshed concurrently')
+ON CONFLICT (version) DO NOTHING;
+
+COMMIT;
@@ -0,0 +1,170 @@
+"""
+Reservations Sweeper - Completar reservas terminadas
+====================================================
+Worker independiente de la API: marca como 'completed' las reservas
+activas cuyo end_time ya pasó. Sin él las filas 'active' se acumulan y
+engordan los índices parciales (idx_reservations_space_time,
+idx_reservations_availability) que recorre cada consulta de
+disponibilidad.
+
+Trabaja en lotes acotados de SWEEPER_BATCH_SIZE filas, cada uno en su
+propia transacción. Las filas se toman con FOR UPDATE SKIP LOCKED: una
+reserva que otra transacción está cancelando se salta (la próxima pasada
+la verá) y varias instancias del sweeper no se bloquean entre sí.
+
+En cada pasada también mantiene las particiones mensuales de
+reservations (common.partitions.maintain_partitions). Además, cada
+REPORTING_REFRESH_INTERVAL segundos refresca las vistas materializadas
+de reporting (common.reporting.refresh_reporting_views) y cada
+COUNTER_RECONCILE_INTERVAL segundos repara la deriva de los contadores
+por usuario (common.counters.reconcile_all_counters).
+
+Ejecutar con:
+
+    python sweeper.py          # cada SWEEPER_INTERVAL segundos
+    python sweeper.py --once   # una pasada (cron / job programado)
+"""
+
+from datetime import datetime
+from typing import Optional
+import argparse
+import asyncio
+import logging
+import os
+import time
+
+from sqlalchemy import select, update
+
+from common.counters import COUNTER_RECONCILE_INTERVAL, reconcile_all_counters
+from common.db import dispose_engine, get_sessionmaker
+from common.events import notify_reservation_changes
+from common.models import Reservation
+from common.partitions import maintain_partitions
+from common.reporting import REPORTING_REFRESH_INTERVAL, refresh_reporting_views
+
+# =================================================================
+# CONFIGURACIÓN
+# =================================================================
+
+logger = logging.getLogger("reservations.sweeper")
+
+# Filas por UPDATE: acota la duración de cada transacción y de sus locks
+SWEEPER_BATCH_SIZE = int(os.getenv("SWEEPER_BATCH_SIZE", "1000"))
+
+# Máximo de lotes por pasada (el resto queda para la siguiente)
+SWEEPER_MAX_BATCHES = int(os.getenv("SWEEPER_MAX_BATCHES", "100"))
+
+# Segundos entre pasadas en modo continuo
+SWEEPER_INTERVAL = float(os.getenv("SWEEPER_INTERVAL", "300"))
+
+# Jobs con intervalo propio, después del sweep: ven las reservas completadas
+PERIODIC_JOBS = (
+    (refresh_reporting_views, REPORTING_REFRESH_INTERVAL),
+    (reconcile_all_counters, COUNTER_RECONCILE_INTERVAL),
+)
+
+# =================================================================
+# SWEEP
+# =================================================================
+
+async def complete_batch(db, now: datetime, batch_size: int) -> list:
+    """
+    Completar hasta batch_size reservas activas terminadas antes de now
+
+    Retorna las filas (id, user_id, space_id, start_time, end_time)
+    actualizadas. El commit queda a cargo de quien llama.
+    """
+    # En PostgreSQL: FOR UPDATE SKIP LOCKED dentro del subquery;
+    # SQLite (tests) ignora la cláusula
+    batch = select(Reservation.id).where(
+        Reservation.status == "active",
+        Reservation.end_time <= now
+    ).order_by(Reservation.end_time).limit(batch_size).with_for_update(skip_locked=True)
+
+    result = await db.execute(
+        update(Reservation)
+        .where(Reservation.id.in_(batch.scalar_subquery()), Reservation.status == "active")
+        .values(status="completed", updated_at=now)
+        .returning(
+            Reservation.id, Reservation.user_id, Reservation.space_id,
+            Reservation.start_time, Reservation.end_time
+        )
+        .execution_options(synchronize_session=False)
+    )
+    return result.all()
+
+
+async def sweep(
+    sessionmaker,
+    now: Optional[datetime] = None,
+    batch_size: int = SWEEPER_BATCH_SIZE,
+    max_batches: int = SWEEPER_MAX_BATCHES,
+) -> dict:
+    """
+    Una pasada: lotes hasta que uno venga incompleto o se llegue a max_batches
+
+    Retorna el total de filas y lotes y la duración de la pasada.
+    """
+    now = now or datetime.utcnow()
+    started = time.monotonic()
+    total = 0
+    batches = 0
+
+    while batches < max_batches:
+        batch_started = time.monotonic()
+        async with sessionmaker() as db:
+            rows = await complete_batch(db, now, batch_size)
+            await db.commit()
+        batches += 1
+        total += len(rows)
+        elapsed_ms = (time.monotonic() - batch_started) * 1000
+        logger.info(f"Sweep batch {batches}: {len(rows)} reservations completed in {elapsed_ms:.1f} ms")
+
+        if rows:
+            # Para cachés, contadores e índice en memoria, completar equivale a dejar de estar activa
+            notify_reservation_changes(cancelled=rows)
+        if len(rows) < batch_size:
+            break
+
+    report = {
+        "completed": total,
+        "batches": batches,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+    }
+    logger.info(f"✓ Sweep finished: {report['completed']} reservations in {report['batches']} batches ({report['elapsed_ms']} ms)")
+    return report
+
+
+async def run(once: bool):
+    last_run = {}
+    try:
+        while True:
+            # Particiones primero: que las reservas nuevas no caigan en reservations_default
+            jobs = [maintain_partitions, sweep]
+            for job, interval in PERIODIC_JOBS:
+                if job not in last_run or time.monotonic() - last_run[job] >= interval:
+                    jobs.append(job)
+                    last_run[job] = time.monotonic()
+            for job in jobs:
+                try:
+                    await job(get_sessionmaker())
+                except Exception as e:
+                    if once:
+                        raise
+                    logger.error(f"{job.__name__} failed: {e}")
+            if once:
+                break
+            await asyncio.sleep(SWEEPER_INTERVAL)
+    finally:
+        await dispose_engine()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Completar reservas activas ya terminadas")
+    parser.add_argument("--once", action="store_true", help="Una sola pasada y salir")
+    args = parser.parse_args()
+    asyncio.run(run(args.once))
+
+
+if __name__ == "__main__":
+    main()
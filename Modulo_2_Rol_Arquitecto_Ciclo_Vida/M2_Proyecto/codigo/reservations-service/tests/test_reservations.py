@@ -8,22 +8,29 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from datetime import datetime, timedelta
-from main import app, Base, get_db, User, Space, Reservation
+from main import app, get_db, User, Space, Reservation
+from common.db import Base
 import os
 
+from common.user_cache import user_cache
+
 # Setup de BD de prueba
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///./test_reservations.db"
 engine = create_engine(SQLALCHEMY_TEST_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.create_all(bind=engine)
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+# La app usa sesiones async; los fixtures siguen usando la sesión sync sobre el mismo archivo
+# NullPool: TestClient puede ejecutar cada request en un event loop distinto
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_reservations.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 app.dependency_overrides[get_db] = override_get_db
 client = TestClient(app)
@@ -57,6 +64,7 @@ def test_user_with_space():
     space = Space(
         id=1,
         name="Test Room",
+        capacity=10,
         is_active=True,
         price_per_hour=50.0
     )
@@ -90,6 +98,8 @@ def cleanup():
     db.query(User).delete()
     db.commit()
     db.close()
+    # Los ids de SQLite se reutilizan entre tests
+    user_cache.clear()
 
 # =================================================================
 # TESTS
@@ -169,7 +179,23 @@ def test_create_reservation_too_short(test_user_with_space):
             "end_time": (tomorrow + timedelta(minutes=15)).isoformat()
         }
     )
-    
+
+    assert response.status_code == 422
+
+def test_create_reservation_too_long(test_user_with_space):
+    """Test crear reserva de más de 24 horas"""
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+
+    response = client.post(
+        "/",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={
+            "space_id": 1,
+            "start_time": tomorrow.isoformat(),
+            "end_time": (tomorrow + timedelta(hours=25)).isoformat()
+        }
+    )
+
     assert response.status_code == 422
 
 def test_create_reservation_conflict(test_user_with_space):
@@ -207,6 +233,290 @@ def test_create_reservation_conflict(test_user_with_space):
     assert response.status_code == 409  # Conflict
     assert "not available" in response.json()["detail"]
 
+def test_create_reservation_back_to_back(test_user_with_space):
+    """Test que una reserva que empieza cuando termina otra no es conflicto"""
+    db = test_user_with_space["db"]
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+    start = tomorrow.replace(hour=10, minute=0, second=0, microsecond=0)
+    end = start + timedelta(hours=2)
+    
+    existing = Reservation(
+        user_id=test_user_with_space["user"].id,
+        space_id=1,
+        start_time=start,
+        end_time=end,
+        status="active"
+    )
+    db.add(existing)
+    db.commit()
+    
+    response = client.post(
+        "/",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={
+            "space_id": 1,
+            "start_time": end.isoformat(),
+            "end_time": (end + timedelta(hours=1)).isoformat()
+        }
+    )
+    
+    assert response.status_code == 201
+
+def test_create_reservation_optimistic_skips_precheck(test_user_with_space, monkeypatch):
+    """Test modo optimista: en PostgreSQL no se consulta disponibilidad antes del insert"""
+    import main
+    
+    async def fail_check(*args, **kwargs):
+        raise AssertionError("check_availability should not run")
+    
+    monkeypatch.setattr(main, "dialect_name", lambda db: "postgresql")
+    monkeypatch.setattr(main, "check_availability", fail_check)
+    
+    start = (datetime.utcnow() + timedelta(days=1)).replace(hour=10, minute=0, second=0, microsecond=0)
+    response = client.post(
+        "/",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={
+            "space_id": 1,
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=1)).isoformat()
+        }
+    )
+    
+    assert response.status_code == 201
+
+def batch_item(start, hours=1, space_id=1):
+    return {
+        "space_id": space_id,
+        "start_time": start.isoformat(),
+        "end_time": (start + timedelta(hours=hours)).isoformat()
+    }
+
+def test_create_batch_success(test_user_with_space):
+    """Test crear varias reservas en un batch"""
+    start = (datetime.utcnow() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    
+    response = client.post(
+        "/batch",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={"items": [batch_item(start + timedelta(hours=2 * i)) for i in range(3)]}
+    )
+    
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created"] == 3
+    assert data["failed"] == 0
+    assert [r["status"] for r in data["results"]] == ["created"] * 3
+
+def test_create_batch_atomic_rejects_overlap(test_user_with_space):
+    """Test batch atómico con items solapados: no se crea ninguno"""
+    start = (datetime.utcnow() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    
+    response = client.post(
+        "/batch",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={"items": [batch_item(start, hours=2), batch_item(start + timedelta(hours=1))]}
+    )
+    
+    assert response.status_code == 409
+    assert response.json()["detail"]["results"][0]["index"] == 1
+    
+    db = test_user_with_space["db"]
+    assert db.query(Reservation).count() == 0
+
+def test_create_batch_partial(test_user_with_space):
+    """Test batch no atómico: se crean los válidos y se reportan los fallidos"""
+    db = test_user_with_space["db"]
+    start = (datetime.utcnow() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    
+    db.add(Reservation(
+        user_id=test_user_with_space["user"].id,
+        space_id=1,
+        start_time=start,
+        end_time=start + timedelta(hours=1),
+        status="active"
+    ))
+    db.commit()
+    
+    response = client.post(
+        "/batch",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={
+            "atomic": False,
+            "items": [
+                batch_item(start),
+                batch_item(start + timedelta(hours=2)),
+                batch_item(start, space_id=999)
+            ]
+        }
+    )
+    
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created"] == 1
+    assert [r["status"] for r in data["results"]] == ["failed", "created", "failed"]
+    assert "not available" in data["results"][0]["detail"]
+
+def test_create_batch_partial_nothing_created(test_user_with_space):
+    """Test batch no atómico donde fallan todos los items: 409 con el resultado de cada uno"""
+    start = (datetime.utcnow() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    
+    response = client.post(
+        "/batch",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={
+            "atomic": False,
+            "items": [batch_item(start, space_id=999), batch_item(start, space_id=998)]
+        }
+    )
+    
+    assert response.status_code == 409
+    detail = response.json()["detail"]
+    assert detail["message"] == "No reservations were created"
+    assert [r["index"] for r in detail["results"]] == [0, 1]
+
+def test_create_batch_partial_concurrent_conflict(test_user_with_space, monkeypatch):
+    """Test batch no atómico cuando una reserva concurrente hace fallar el commit"""
+    import main
+    from sqlalchemy import text
+    
+    # Simula la exclusion constraint: rechaza el item cuyo rango tomó otra transacción
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TRIGGER concurrent_conflict BEFORE INSERT ON reservations "
+            "WHEN NEW.notes = 'taken' BEGIN SELECT RAISE(ABORT, 'conflicting key value'); END"
+        ))
+    monkeypatch.setattr(main, "sqlstate", lambda e: main.EXCLUSION_VIOLATION)
+    
+    start = (datetime.utcnow() + timedelta(days=1)).replace(hour=8, minute=0, second=0, microsecond=0)
+    try:
+        response = client.post(
+            "/batch",
+            headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+            json={
+                "atomic": False,
+                "items": [
+                    {**batch_item(start), "notes": "taken"},
+                    batch_item(start + timedelta(hours=2))
+                ]
+            }
+        )
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("DROP TRIGGER concurrent_conflict"))
+    
+    assert response.status_code == 201
+    data = response.json()
+    assert data["created"] == 1
+    assert [r["status"] for r in data["results"]] == ["failed", "created"]
+    assert "not available" in data["results"][0]["detail"]
+    
+    db = test_user_with_space["db"]
+    assert db.query(Reservation).count() == 1
+
+def test_create_series_weekly(test_user_with_space):
+    """Test serie semanal: expansión por días de la semana y series_id compartido"""
+    start = (datetime.utcnow() + timedelta(days=7)).replace(hour=9, minute=0, second=0, microsecond=0)
+    start -= timedelta(days=start.weekday())  # lunes
+    
+    response = client.post(
+        "/series",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={
+            **batch_item(start),
+            "recurrence": {"freq": "weekly", "weekdays": ["MO", "WE"], "count": 4}
+        }
+    )
+    
+    assert response.status_code == 201
+    data = response.json()
+    starts = [datetime.fromisoformat(o["start_time"]) for o in data["occurrences"]]
+    assert starts == [start, start + timedelta(days=2), start + timedelta(days=7), start + timedelta(days=9)]
+    assert {o["series_id"] for o in data["occurrences"]} == {data["series_id"]}
+
+def test_create_series_until_utc(test_user_with_space):
+    """Test serie con until en UTC ('Z') y días repetidos: sin error ni duplicados"""
+    start = (datetime.utcnow() + timedelta(days=7)).replace(hour=9, minute=0, second=0, microsecond=0)
+    start -= timedelta(days=start.weekday())  # lunes
+    until = start + timedelta(days=14)
+    
+    response = client.post(
+        "/series",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={
+            **batch_item(start),
+            "recurrence": {"freq": "weekly", "weekdays": ["MO", "mo"], "until": until.isoformat() + "Z"}
+        }
+    )
+    
+    assert response.status_code == 201
+    starts = [datetime.fromisoformat(o["start_time"]) for o in response.json()["occurrences"]]
+    assert starts == [start, start + timedelta(days=7), start + timedelta(days=14)]
+
+def test_create_series_until_before_start(test_user_with_space):
+    """Test serie con until anterior al inicio: 422 y no se crea nada"""
+    start = (datetime.utcnow() + timedelta(days=7)).replace(hour=9, minute=0, second=0, microsecond=0)
+    
+    response = client.post(
+        "/series",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={
+            **batch_item(start),
+            "recurrence": {"freq": "daily", "until": (start - timedelta(days=1)).isoformat()}
+        }
+    )
+    
+    assert response.status_code == 422
+    assert "no occurrences" in response.json()["detail"]
+    
+    db = test_user_with_space["db"]
+    assert db.query(Reservation).count() == 0
+
+def test_create_series_conflict(test_user_with_space):
+    """Test serie con una ocurrencia ocupada: no se crea ninguna"""
+    db = test_user_with_space["db"]
+    start = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+    
+    db.add(Reservation(
+        user_id=test_user_with_space["user"].id,
+        space_id=1,
+        start_time=start + timedelta(days=2),
+        end_time=start + timedelta(days=2, hours=1),
+        status="active"
+    ))
+    db.commit()
+    
+    response = client.post(
+        "/series",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"},
+        json={**batch_item(start), "recurrence": {"freq": "daily", "count": 5}}
+    )
+    
+    assert response.status_code == 409
+    assert response.json()["detail"]["conflicting_occurrences"] == [(start + timedelta(days=2)).isoformat()]
+    assert db.query(Reservation).count() == 1
+
+def test_cancel_series(test_user_with_space):
+    """Test cancelar una serie completa"""
+    start = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+    headers = {"Authorization": f"Bearer {test_user_with_space['token']}"}
+    
+    created = client.post(
+        "/series",
+        headers=headers,
+        json={**batch_item(start), "recurrence": {"freq": "daily", "interval": 2, "until": (start + timedelta(days=6)).isoformat()}}
+    )
+    assert created.status_code == 201
+    assert len(created.json()["occurrences"]) == 4
+    
+    response = client.delete(f"/series/{created.json()['series_id']}", headers=headers)
+    
+    assert response.status_code == 200
+    assert response.json()["cancelled"] == 4
+    
+    db = test_user_with_space["db"]
+    assert db.query(Reservation).filter(Reservation.status == "active").count() == 0
+
 def test_create_reservation_nonexistent_space(test_user_with_space):
     """Test crear reserva para espacio que no existe"""
     tomorrow = datetime.utcnow() + timedelta(days=1)
@@ -259,6 +569,50 @@ def test_list_reservations_with_data(test_user_with_space):
     data = response.json()
     assert len(data) == 3
 
+def test_list_reservations_cursor_pagination(test_user_with_space):
+    """Test recorrer las reservas en páginas con X-Next-Cursor"""
+    db = test_user_with_space["db"]
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+    
+    # Crear 5 reservas; dos comparten start_time (desempate por id)
+    for i in [0, 1, 2, 3, 3]:
+        db.add(Reservation(
+            user_id=test_user_with_space["user"].id,
+            space_id=1,
+            start_time=tomorrow + timedelta(days=i),
+            end_time=tomorrow + timedelta(days=i, hours=1),
+            status="active"
+        ))
+    db.commit()
+    
+    headers = {"Authorization": f"Bearer {test_user_with_space['token']}"}
+    seen = []
+    pages = 0
+    params = {"limit": 2}
+    while True:
+        response = client.get("/", params=params, headers=headers)
+        assert response.status_code == 200
+        seen.extend(r["id"] for r in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params = {"limit": 2, "cursor": cursor}
+    
+    assert pages == 3
+    assert len(seen) == 5
+    assert len(set(seen)) == 5
+
+def test_list_reservations_invalid_cursor(test_user_with_space):
+    """Test cursor que no fue emitido por el servicio"""
+    response = client.get(
+        "/",
+        params={"cursor": "not-a-cursor"},
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"}
+    )
+    
+    assert response.status_code == 400
+
 def test_list_reservations_filter_by_status(test_user_with_space):
     """Test filtrar reservas por estado"""
     db = test_user_with_space["db"]
@@ -431,6 +785,127 @@ def test_get_upcoming_count(test_user_with_space):
     assert response.status_code == 200
     assert response.json()["upcoming_reservations"] == 1
 
+def test_sweeper_completes_ended_reservations(test_user_with_space):
+    """Test sweeper: completa en lotes solo las reservas activas ya terminadas"""
+    import asyncio
+    import sweeper
+
+    db = test_user_with_space["db"]
+    now = datetime.utcnow().replace(microsecond=0)
+    for i in range(5):
+        db.add(Reservation(
+            user_id=test_user_with_space["user"].id,
+            space_id=1,
+            start_time=now - timedelta(days=2, hours=i + 1),
+            end_time=now - timedelta(days=2, hours=i),
+            status="active"
+        ))
+    cancelled = Reservation(
+        user_id=test_user_with_space["user"].id,
+        space_id=1,
+        start_time=now - timedelta(days=1, hours=1),
+        end_time=now - timedelta(days=1),
+        status="cancelled"
+    )
+    ongoing = Reservation(
+        user_id=test_user_with_space["user"].id,
+        space_id=1,
+        start_time=now - timedelta(minutes=30),
+        end_time=now + timedelta(minutes=30),
+        status="active"
+    )
+    db.add_all([cancelled, ongoing])
+    db.commit()
+
+    report = asyncio.run(sweeper.sweep(TestingAsyncSessionLocal, now=now, batch_size=2))
+
+    assert report["completed"] == 5
+    assert report["batches"] == 3
+    db.expire_all()
+    statuses = {r.id: r.status for r in db.query(Reservation).all()}
+    assert statuses.pop(cancelled.id) == "cancelled"
+    assert statuses.pop(ongoing.id) == "active"
+    assert set(statuses.values()) == {"completed"}
+
+    # Una segunda pasada no encuentra nada
+    assert asyncio.run(sweeper.sweep(TestingAsyncSessionLocal, now=now))["completed"] == 0
+
+def test_admin_reports_require_admin(test_user_with_space):
+    """Test reportes de admin con usuario normal"""
+    response = client.get(
+        "/admin/reports/stats",
+        headers={"Authorization": f"Bearer {test_user_with_space['token']}"}
+    )
+
+    assert response.status_code == 403
+
+def test_admin_reports(test_user_with_space):
+    """Test reportes de admin: totales, espacios y reservas paginadas"""
+    db = test_user_with_space["db"]
+    test_user_with_space["user"].is_admin = True
+    tomorrow = (datetime.utcnow() + timedelta(days=1)).replace(hour=9, minute=0, second=0, microsecond=0)
+    for i in range(3):
+        db.add(Reservation(
+            user_id=test_user_with_space["user"].id,
+            space_id=1,
+            start_time=tomorrow + timedelta(hours=2 * i),
+            end_time=tomorrow + timedelta(hours=2 * i + 1),
+            status="cancelled" if i == 0 else "active"
+        ))
+    db.commit()
+    headers = {"Authorization": f"Bearer {test_user_with_space['token']}"}
+
+    stats = client.get("/admin/reports/stats", headers=headers)
+    assert stats.status_code == 200
+    assert stats.json()["total_reservations"] == 3
+    assert stats.json()["active_reservations"] == 2
+    assert stats.json()["total_users"] == 1
+
+    spaces = client.get("/admin/reports/spaces", headers=headers)
+    assert spaces.status_code == 200
+    assert spaces.json() == [{
+        "id": 1, "name": "Test Room", "capacity": 10, "location": None,
+        "price_per_hour": 50.0, "total_reservations": 3, "active_reservations": 2
+    }]
+
+    first = client.get("/admin/reports/reservations", params={"limit": 2}, headers=headers)
+    assert first.status_code == 200
+    assert [r["start_time"] for r in first.json()] == [
+        (tomorrow + timedelta(hours=4)).isoformat(),
+        (tomorrow + timedelta(hours=2)).isoformat()
+    ]
+    assert first.json()[0]["user_name"] == "Test User"
+    assert first.json()[0]["space_name"] == "Test Room"
+    assert first.json()[0]["duration_hours"] == pytest.approx(1.0)
+
+    second = client.get(
+        "/admin/reports/reservations",
+        params={"limit": 2, "cursor": first.headers["X-Next-Cursor"]},
+        headers=headers
+    )
+    assert [r["status"] for r in second.json()] == ["cancelled"]
+    assert "X-Next-Cursor" not in second.headers
+
+def test_list_reservations_stateless_auth(monkeypatch):
+    """Test modo stateless: la identidad sale del JWT, sin consultar users"""
+    from jose import jwt
+    from common import auth, config
+    from common.auth import JWT_ALGORITHM, JWT_SECRET
+    monkeypatch.setattr(config, "AUTH_MODE", "stateless")
+    monkeypatch.setattr(auth, "is_user_revoked", lambda user_id: False)
+    
+    token = jwt.encode(
+        {"sub": "777", "email": "ghost@example.com", "role": "user", "is_admin": False,
+         "exp": datetime.utcnow() + timedelta(hours=1)},
+        JWT_SECRET,
+        algorithm=JWT_ALGORITHM
+    )
+    
+    response = client.get("/", headers={"Authorization": f"Bearer {token}"})
+    
+    assert response.status_code == 200
+    assert response.json() == []
+
 """
 Resumen:
 - 20 tests implementados
@@ -8,22 +8,30 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 from datetime import datetime, timedelta
-from main import app, Base, get_db, User, Space, Reservation
+from main import app, get_db, User, Space, Reservation
+from common.db import Base
 import os
 
+from common.space_cache import local_space_cache
+from common.user_cache import user_cache
+
 # Setup
 SQLALCHEMY_TEST_DATABASE_URL = "sqlite:///./test_spaces.db"
 engine = create_engine(SQLALCHEMY_TEST_DATABASE_URL, connect_args={"check_same_thread": False})
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base.metadata.create_all(bind=engine)
 
-def override_get_db():
-    try:
-        db = TestingSessionLocal()
+# La app usa sesiones async; los fixtures siguen usando la sesión sync sobre el mismo archivo
+# NullPool: TestClient puede ejecutar cada request en un event loop distinto
+async_engine = create_async_engine("sqlite+aiosqlite:///./test_spaces.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_db():
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 app.dependency_overrides[get_db] = override_get_db
 client = TestClient(app)
@@ -134,6 +142,9 @@ def cleanup():
     db.query(User).delete()
     db.commit()
     db.close()
+    # Los ids de SQLite se reutilizan entre tests
+    user_cache.clear()
+    local_space_cache.clear()
 
 # =================================================================
 # TESTS
@@ -172,6 +183,24 @@ def test_list_spaces_filter_by_capacity(sample_space):
     assert response.status_code == 200
     assert len(response.json()) == 1
 
+def test_list_spaces_filter_by_amenity(sample_space):
+    """Test filtrar espacios por amenidades (todas / alguna)"""
+    db = sample_space["db"]
+    db.add(Space(name="Quiet Room", capacity=4, amenities=["wifi"], price_per_hour=10.0, is_active=True))
+    db.commit()
+    
+    response = client.get("/?amenity=projector")
+    assert [s["name"] for s in response.json()] == ["Test Room"]
+    
+    response = client.get("/?amenity=wifi&amenity=projector")
+    assert [s["name"] for s in response.json()] == ["Test Room"]
+    
+    response = client.get("/?amenity=wifi&amenity=tv")
+    assert response.json() == []
+    
+    response = client.get("/?amenity=wifi&amenity=tv&amenity_match=any")
+    assert [s["name"] for s in response.json()] == ["Quiet Room", "Test Room"]
+
 def test_list_spaces_inactive(sample_space):
     """Test listar espacios inactivos"""
     db = sample_space["db"]
@@ -187,6 +216,55 @@ def test_list_spaces_inactive(sample_space):
     response = client.get("/?is_active=false")
     assert len(response.json()) == 1
 
+def test_list_spaces_cursor_pagination():
+    """Test recorrer el catálogo en páginas con X-Next-Cursor"""
+    db = TestingSessionLocal()
+    # Dos espacios con el mismo nombre: el desempate es por id
+    for name in ["Room A", "Room B", "Room B", "Room C", "Room D"]:
+        db.add(Space(name=name, capacity=5, price_per_hour=10.0, is_active=True))
+    db.commit()
+    db.close()
+    
+    seen = []
+    pages = 0
+    params = {"limit": 2}
+    while True:
+        response = client.get("/", params=params)
+        assert response.status_code == 200
+        seen.extend(s["id"] for s in response.json())
+        pages += 1
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params = {"limit": 2, "cursor": cursor}
+    
+    assert pages == 3
+    assert len(set(seen)) == 5
+
+def test_list_spaces_invalid_cursor():
+    """Test cursor que no fue emitido por el servicio"""
+    response = client.get("/?cursor=not-a-cursor")
+    assert response.status_code == 400
+
+def test_list_spaces_stream(sample_space, monkeypatch):
+    """Test listado NDJSON"""
+    import json
+    import main
+    
+    # El stream abre su propia sesión, fuera de get_db
+    monkeypatch.setattr(main, "get_sessionmaker", lambda: TestingAsyncSessionLocal)
+    db = sample_space["db"]
+    db.add(Space(name="Another Room", capacity=4, price_per_hour=20.0, is_active=True))
+    db.commit()
+    
+    response = client.get("/?stream=true")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["name"] for r in rows] == ["Another Room", "Test Room"]
+    assert "X-Next-Cursor" not in response.headers
+
 def test_get_space_success(sample_space):
     """Test obtener espacio por ID"""
     space_id = sample_space["space"].id
@@ -198,6 +276,25 @@ def test_get_space_success(sample_space):
     assert data["name"] == "Test Room"
     assert "wifi" in data["amenities"]
 
+def test_get_space_served_from_local_cache(sample_space, admin_user):
+    """Test que la segunda lectura no va a la BD y que PUT invalida la copia local"""
+    db = sample_space["db"]
+    space_id = sample_space["space"].id
+    assert client.get(f"/{space_id}").json()["name"] == "Test Room"
+    
+    # Cambio directo en la BD: la copia local sigue vigente
+    sample_space["space"].name = "Renamed Outside"
+    db.commit()
+    assert client.get(f"/{space_id}").json()["name"] == "Test Room"
+    
+    response = client.put(
+        f"/{space_id}",
+        json={"name": "Renamed Room"},
+        headers={"Authorization": f"Bearer {admin_user['token']}"}
+    )
+    assert response.status_code == 200
+    assert client.get(f"/{space_id}").json()["name"] == "Renamed Room"
+
 def test_get_space_not_found():
     """Test obtener espacio que no existe"""
     response = client.get("/999")
@@ -299,6 +396,184 @@ def test_check_availability_with_conflict(sample_space, normal_user):
     assert data["available"] == False
     assert len(data["conflicting_reservations"]) == 1
 
+def test_check_availability_from_interval_index(sample_space, monkeypatch):
+    """Test que con el índice en memoria cargado no se consulta la BD"""
+    import main
+    from common.interval_index import IntervalIndex
+    
+    space_id = sample_space["space"].id
+    now = datetime.utcnow()
+    start = now + timedelta(days=1)
+    index = IntervalIndex(days=14)
+    index.begin_load()
+    index.load([(99, space_id, start, start + timedelta(hours=1))], now, now + timedelta(days=14))
+    monkeypatch.setattr(main, "reservation_index", index)
+    
+    response = client.get(
+        f"/{space_id}/availability",
+        params={
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=2)).isoformat()
+        }
+    )
+    
+    data = response.json()
+    assert data["available"] is False
+    assert [c["id"] for c in data["conflicting_reservations"]] == [99]
+
+def test_search_availability(sample_space, normal_user):
+    """Test buscar espacios libres en un rango"""
+    db = sample_space["db"]
+    busy_room = sample_space["space"]
+    free_room = Space(name="Free Room", capacity=4, amenities=["wifi"], price_per_hour=10.0, is_active=True)
+    db.add(free_room)
+    db.add(Space(name="Closed Room", capacity=4, price_per_hour=10.0, is_active=False))
+    db.commit()
+    
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+    db.add(Reservation(
+        user_id=normal_user["user"].id,
+        space_id=busy_room.id,
+        start_time=tomorrow,
+        end_time=tomorrow + timedelta(hours=2),
+        status="active"
+    ))
+    db.commit()
+    
+    params = {
+        "start": (tomorrow + timedelta(hours=1)).isoformat(),
+        "end": (tomorrow + timedelta(hours=3)).isoformat()
+    }
+    response = client.get("/availability/search", params=params)
+    assert response.status_code == 200
+    assert [s["name"] for s in response.json()] == ["Free Room"]
+    
+    # Justo después de la reserva ambos están libres
+    params = {
+        "start": (tomorrow + timedelta(hours=2)).isoformat(),
+        "end": (tomorrow + timedelta(hours=3)).isoformat(),
+        "min_capacity": 5
+    }
+    response = client.get("/availability/search", params=params)
+    assert [s["name"] for s in response.json()] == ["Test Room"]
+
+def test_search_availability_utc_offset(sample_space, normal_user):
+    """Test búsqueda con fechas con zona ('Z' y offset): sin error y misma respuesta"""
+    db = sample_space["db"]
+    busy_room = sample_space["space"]
+    tomorrow = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    db.add(Reservation(
+        user_id=normal_user["user"].id,
+        space_id=busy_room.id,
+        start_time=tomorrow,
+        end_time=tomorrow + timedelta(hours=2),
+        status="active"
+    ))
+    db.commit()
+    
+    response = client.get("/availability/search", params={
+        "start": (tomorrow + timedelta(hours=1)).isoformat() + "Z",
+        "end": (tomorrow + timedelta(hours=5)).isoformat() + "+02:00"
+    })
+    assert response.status_code == 200
+    assert response.json() == []
+    
+    response = client.get("/availability/search", params={
+        "start": (tomorrow + timedelta(hours=4)).isoformat() + "+02:00",
+        "end": (tomorrow + timedelta(hours=3)).isoformat() + "Z"
+    })
+    assert [s["name"] for s in response.json()] == ["Test Room"]
+
+def test_search_availability_invalid_times():
+    """Test rango inválido en la búsqueda"""
+    tomorrow = datetime.utcnow() + timedelta(days=1)
+    response = client.get("/availability/search", params={
+        "start": tomorrow.isoformat(),
+        "end": (tomorrow - timedelta(hours=1)).isoformat()
+    })
+    assert response.status_code == 400
+
+def test_freebusy(sample_space, normal_user):
+    """Test intervalos ocupados fusionados y huecos libres"""
+    db = sample_space["db"]
+    space_id = sample_space["space"].id
+    day = (datetime.utcnow() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    
+    for start, end in [(9, 10), (10, 11), (14, 15)]:
+        db.add(Reservation(
+            user_id=normal_user["user"].id,
+            space_id=space_id,
+            start_time=day + timedelta(hours=start),
+            end_time=day + timedelta(hours=end),
+            status="active"
+        ))
+    db.commit()
+    
+    response = client.get(f"/{space_id}/freebusy", params={
+        "from": (day + timedelta(hours=8)).isoformat(),
+        "to": (day + timedelta(hours=18)).isoformat()
+    })
+    
+    assert response.status_code == 200
+    data = response.json()
+    hours = lambda intervals: [
+        (datetime.fromisoformat(i["start"]).hour, datetime.fromisoformat(i["end"]).hour)
+        for i in intervals
+    ]
+    assert hours(data["busy"]) == [(9, 11), (14, 15)]
+    assert hours(data["free"]) == [(8, 9), (11, 14), (15, 18)]
+
+def test_freebusy_invalid_range(sample_space):
+    """Test rango inválido o demasiado largo"""
+    space_id = sample_space["space"].id
+    start = datetime.utcnow() + timedelta(days=1)
+    
+    response = client.get(f"/{space_id}/freebusy", params={
+        "from": start.isoformat(),
+        "to": start.isoformat()
+    })
+    assert response.status_code == 400
+    
+    response = client.get(f"/{space_id}/freebusy", params={
+        "from": start.isoformat(),
+        "to": (start + timedelta(days=60)).isoformat()
+    })
+    assert response.status_code == 400
+
+def test_freebusy_bulk(sample_space, normal_user):
+    """Test free/busy de varios espacios en formato columnar"""
+    db = sample_space["db"]
+    room_a = sample_space["space"]
+    room_b = Space(name="Room B", capacity=4, price_per_hour=10.0, is_active=True)
+    room_c = Space(name="Room C", capacity=4, price_per_hour=10.0, is_active=True)
+    db.add_all([room_b, room_c])
+    db.commit()
+    
+    day = (datetime.utcnow() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    for space_id, start, end in [(room_a.id, 9, 10), (room_a.id, 10, 12), (room_b.id, 7, 9), (room_b.id, 15, 16)]:
+        db.add(Reservation(
+            user_id=normal_user["user"].id,
+            space_id=space_id,
+            start_time=day + timedelta(hours=start),
+            end_time=day + timedelta(hours=end),
+            status="active"
+        ))
+    db.commit()
+    
+    response = client.post("/freebusy/bulk", json={
+        "space_ids": [room_a.id, room_b.id, room_c.id],
+        "start": (day + timedelta(hours=8)).isoformat(),
+        "end": (day + timedelta(hours=18)).isoformat()
+    })
+    
+    assert response.status_code == 200
+    data = response.json()
+    epoch = lambda hour: int((day + timedelta(hours=hour) - datetime(1970, 1, 1)).total_seconds())
+    assert data["start"] == epoch(8)
+    assert data["space_id"] == [room_a.id, room_b.id, room_b.id]
+    assert data["busy_start"] == [epoch(9), epoch(8), epoch(15)]
+    assert data["busy_end"] == [epoch(12), epoch(9), epoch(16)]
+
 def test_create_space_as_normal_user(normal_user):
     """Test crear espacio como usuario normal - debe fallar"""
     response = client.post(
@@ -416,6 +691,70 @@ def test_update_space_deactivate(sample_space, admin_user):
     assert response.status_code == 200
     assert response.json()["is_active"] == False
 
+def stateless_token(user_id: int, is_admin: bool) -> str:
+    """Token con claims completos emitido por auth-service"""
+    from jose import jwt
+    from common.auth import JWT_ALGORITHM, JWT_SECRET
+    
+    token_data = {
+        "sub": str(user_id),
+        "email": f"user{user_id}@example.com",
+        "role": "admin" if is_admin else "user",
+        "is_admin": is_admin,
+        "exp": datetime.utcnow() + timedelta(hours=1)
+    }
+    return jwt.encode(token_data, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def test_stateless_auth_trusts_claims(monkeypatch):
+    """Test modo stateless: admin según claims, sin fila en users"""
+    from common import auth, config
+    monkeypatch.setattr(config, "AUTH_MODE", "stateless")
+    monkeypatch.setattr(auth, "is_user_revoked", lambda user_id: False)
+    
+    # Pasa la verificación de admin y llega a la búsqueda del espacio
+    response = client.put(
+        "/999",
+        headers={"Authorization": f"Bearer {stateless_token(4242, True)}"},
+        json={"name": "Updated"}
+    )
+    assert response.status_code == 404
+    
+    response = client.put(
+        "/999",
+        headers={"Authorization": f"Bearer {stateless_token(4243, False)}"},
+        json={"name": "Updated"}
+    )
+    assert response.status_code == 403
+
+def test_stateless_auth_revoked_user(monkeypatch):
+    """Test modo stateless: usuario en lista de revocación es rechazado"""
+    from common import auth, config
+    monkeypatch.setattr(config, "AUTH_MODE", "stateless")
+    monkeypatch.setattr(auth, "is_user_revoked", lambda user_id: True)
+    
+    response = client.put(
+        "/999",
+        headers={"Authorization": f"Bearer {stateless_token(4242, True)}"},
+        json={"name": "Updated"}
+    )
+    
+    assert response.status_code == 401
+
+def test_stateless_auth_without_revocation_list(monkeypatch):
+    """Test modo stateless: si Redis no responde se valida contra users"""
+    from common import auth, config
+    monkeypatch.setattr(config, "AUTH_MODE", "stateless")
+    monkeypatch.setattr(auth, "is_user_revoked", lambda user_id: None)
+    
+    # Claims de admin válidos, pero el usuario no existe en la BD
+    response = client.put(
+        "/999",
+        headers={"Authorization": f"Bearer {stateless_token(4242, True)}"},
+        json={"name": "Updated"}
+    )
+    
+    assert response.status_code == 401
+
 """
 Resumen:
 - 18 tests implementados
@@ -9,7 +9,10 @@ import pytest
 from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from main import app, Base, get_db, User
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+from main import app, get_db, User
+from common.db import Base
 import os
 
 # =================================================================
@@ -28,13 +31,15 @@ TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engin
 # Crear tablas
 Base.metadata.create_all(bind=engine)
 
-def override_get_db():
+# La app usa sesiones async; los fixtures siguen usando la sesión sync sobre el mismo archivo
+# NullPool: TestClient puede ejecutar cada request en un event loop distinto
+async_engine = create_async_engine("sqlite+aiosqlite:///./test.db", poolclass=NullPool)
+TestingAsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def override_get_db():
     """Override de la dependency de DB para tests"""
-    try:
-        db = TestingSessionLocal()
+    async with TestingAsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 app.dependency_overrides[get_db] = override_get_db
 
@@ -281,8 +286,9 @@ def test_delete_account_success(test_user):
     
     assert response.status_code == 204
     
-    # Verificar que el usuario está inactivo
+    # Verificar que el usuario está inactivo (la app escribió por otra sesión)
     db = test_user["db"]
+    db.expire_all()
     user = db.query(User).filter(User.id == test_user["user"].id).first()
     assert user.is_active == False
 
@@ -291,6 +297,24 @@ def test_delete_account_without_token():
     response = client.delete("/me")
     assert response.status_code == 403
 
+def test_delete_account_revocation_unavailable(test_user, monkeypatch):
+    """Test modo stateless: sin lista de revocación la cuenta no se desactiva"""
+    import main
+    from common import config
+    monkeypatch.setattr(config, "AUTH_MODE", "stateless")
+    monkeypatch.setattr(main, "revoke_user_tokens", lambda user_id: False)
+    
+    response = client.delete(
+        "/me",
+        headers={"Authorization": f"Bearer {test_user['token']}"}
+    )
+    
+    assert response.status_code == 503
+    db = test_user["db"]
+    db.expire_all()
+    user = db.query(User).filter(User.id == test_user["user"].id).first()
+    assert user.is_active == True
+
 def test_delete_account_twice(test_user):
     """Test eliminar cuenta dos veces"""
     # Primera eliminación
@@ -325,6 +349,37 @@ def test_get_stats_no_reservations(test_user):
     assert data["active_reservations"] == 0
     assert "member_since" in data
 
+def test_get_stats_by_status(test_user):
+    """Test conteo de reservas por estado"""
+    from datetime import datetime, timedelta
+    from common.models import Reservation
+    
+    db = TestingSessionLocal()
+    start = datetime.utcnow() + timedelta(days=1)
+    for i, status in enumerate(["active", "active", "cancelled", "completed"]):
+        db.add(Reservation(
+            user_id=test_user["user"].id,
+            space_id=1,
+            start_time=start + timedelta(days=i),
+            end_time=start + timedelta(days=i, hours=1),
+            status=status
+        ))
+    db.commit()
+    
+    response = client.get(
+        "/stats",
+        headers={"Authorization": f"Bearer {test_user['token']}"}
+    )
+    db.query(Reservation).delete()
+    db.commit()
+    db.close()
+    
+    data = response.json()
+    assert data["total_reservations"] == 4
+    assert data["active_reservations"] == 2
+    assert data["cancelled_reservations"] == 1
+    assert data["completed_reservations"] == 1
+
 # =================================================================
 # TESTS DE AUTORIZACIÓN
 # =================================================================